@@ -1,105 +1,361 @@
 # web_app.py - 完整优化版本
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 import os
+import json
+import logging
 import requests
 import base64
-import tempfile
+import contextvars
+import io
+import multiprocessing
 import uuid
 from datetime import datetime
 from dotenv import load_dotenv
 import time
+import queue
+import threading
+from utils.http_session import (github_get, github_download, cache_stats, quota_stats, graphql_quota_stats, rate_limiter,
+                                graphql_rate_limiter, GITHUB_API_URL)
+from utils.github_graphql import GraphQLError, RepoBatchLoader, fetch_repos, graphql_enabled, graphql_stats, record_fallback
+from utils.rate_limiter import RateLimitExceeded
+from utils.report_cache import ReportCache, SingleFlight, normalize_repo_key
+from utils.batch import CALLS_PER_REPO, run_batch
+from utils.repo_archive import ArchiveError, RepoArchiver, create_archive_source
+from utils.languages import NON_CODE
+from utils.incremental import (INCREMENTAL_ANALYSIS, code_unchanged, readme_unchanged, source_fingerprint,
+                               record_refresh, incremental_stats)
+from utils.job_queue import JobQueue
+from utils.watchlist import (Watchlist, WATCHLIST_INTERVAL, WATCHLIST_MIN_INTERVAL, WATCHLIST_QUOTA_RESERVE,
+                             WATCHLIST_SCHEDULER)
+from utils.report_store import ReportStore, REPORT_STORE_ARTIFACT_MAX_BYTES
+from utils.history import MetricHistory, HISTORY_ENABLED
+from utils.exporters import get_exporter, render_export, iter_chunks
+from utils.ai_analyzer import AIAnalyzer, llm_cache_stats
+from utils.llm_gateway import get_llm_gateway, llm_gateway_stats
+from utils.tiered_analysis import ANALYSIS_LATENCY_BUDGET, Enricher, expected_llm_latency, plan_tiers
+from utils.metrics import (registry, stage, start_trace, current_trace, end_trace, trace_requested, server_timing,
+                           endpoint_label, http_requests, http_duration, http_in_flight)
+from utils.structured_log import setup_logging, start_request, bind, current_request_id, log_debug, log_stats
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # 加载环境变量
 load_dotenv()
 
+# 日志经异步队列以JSON输出（LOG_LEVEL / LOG_FORMAT），每条带上 request_id 和 report_id
+setup_logging()
+logger = logging.getLogger('app')
+
 app = Flask(__name__)
 
 # 配置请求超时
 REQUEST_TIMEOUT = 30  # 30秒超时
 
+# 并发获取GitHub数据的共享线程池（所有请求共用，限制总并发数）
+FETCH_MAX_WORKERS = int(os.getenv('FETCH_MAX_WORKERS', '16'))
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix='github-fetch')
+
+# 完整报告缓存（同一仓库在TTL内直接复用分析结果）
+REPORT_CACHE_TTL = int(os.getenv('REPORT_CACHE_TTL', '300'))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv('REPORT_CACHE_MAX_ENTRIES', '1000'))
+report_cache = ReportCache(ttl=REPORT_CACHE_TTL, max_entries=REPORT_CACHE_MAX_ENTRIES)
+report_flight = SingleFlight()
+
+# 服务端报告存储：导出时按report_id读取，不再由浏览器回传整份报告
+report_store = ReportStore()
+
+# 仓库指标历史：每次分析记录星标/Fork/问题数，报告中附带增长趋势
+history = MetricHistory()
+
+# 批量分析配置
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '16'))
+BATCH_MAX_REPOS = int(os.getenv('BATCH_MAX_REPOS', '500'))
+BATCH_MAX_QUOTA_WAIT = int(os.getenv('BATCH_MAX_QUOTA_WAIT', '60'))  # 配额不足时最多等待的秒数
+
+# 流式分析配置：LLM在后台线程生成，空闲时定期发送心跳，避免长时间生成被当作超时
+SSE_KEEPALIVE_INTERVAL = int(os.getenv('SSE_KEEPALIVE_INTERVAL', '15'))
+STREAM_MAX_WORKERS = int(os.getenv('STREAM_MAX_WORKERS', '16'))
+stream_executor = ThreadPoolExecutor(max_workers=STREAM_MAX_WORKERS, thread_name_prefix='llm-stream')
+_llm_analyzer = None
+_llm_lock = threading.Lock()
+
+def validate_repo_url(repo_url):
+    """校验GitHub链接，返回错误信息；合法时返回None"""
+    if not repo_url:
+        return '请输入GitHub仓库链接'
+    if not repo_url.startswith('https://github.com/') or repo_url.count('/') < 4:
+        return 'GitHub链接格式不正确，应为: https://github.com/用户名/仓库名'
+    return None
+
+def parse_repo_url(repo_url):
+    """从GitHub链接中提取 owner 和仓库名"""
+    parts = repo_url.strip('/').split('/')
+    repo_name = parts[-1][:-4] if parts[-1].endswith('.git') else parts[-1]
+    return parts[-2], repo_name
+
+def repo_info_from_payload(repo_data):
+    """把GitHub /repos 接口返回的数据整理成报告使用的仓库信息"""
+    return {
+        'name': repo_data['name'],
+        'full_name': repo_data['full_name'],
+        'description': repo_data.get('description', '无描述'),
+        'html_url': repo_data['html_url'],
+        'language': repo_data.get('language', '未知'),
+        'stars': repo_data['stargazers_count'],
+        'forks': repo_data['forks_count'],
+        'open_issues': repo_data['open_issues_count'],
+        'created_at': repo_data['created_at'][:10],
+        'updated_at': repo_data['updated_at'][:10],
+        'pushed_at': repo_data.get('pushed_at')
+    }
+
+def decode_readme(readme_data):
+    """解码GitHub /readme 接口返回的Base64内容"""
+    with stage('readme_decode'):
+        return base64.b64decode(readme_data.get('content', '')).decode('utf-8')
+
 class GitHubClient:
     def __init__(self):
-        self.token = os.getenv('GITHUB_TOKEN')
-        if self.token:
-            self.headers = {
-                'Authorization': f'token {self.token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-        else:
-            self.headers = {'Accept': 'application/vnd.github.v3+json'}
+        # 认证令牌由配额调度器按剩余额度选择（GITHUB_TOKENS / GITHUB_TOKEN）
+        self.headers = {'Accept': 'application/vnd.github.v3+json'}
     
     def get_repo_info(self, repo_url):
         try:
-            parts = repo_url.strip('/').split('/')
-            if len(parts) < 4:
+            if len(repo_url.strip('/').split('/')) < 4:
                 return None, "GitHub链接格式不正确"
                 
-            owner = parts[-2]
-            repo_name = parts[-1]
+            owner, repo_name = parse_repo_url(repo_url)
             
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}"
             
-            print(f"🔍 请求GitHub API: {api_url}")
+            log_debug(logger, "请求GitHub API", url=api_url)
             
             # 添加超时设置
-            response = requests.get(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            with stage('github_repo'):
+                response = github_get(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
-                repo_data = response.json()
-                return {
-                    'name': repo_data['name'],
-                    'full_name': repo_data['full_name'],
-                    'description': repo_data.get('description', '无描述'),
-                    'html_url': repo_data['html_url'],
-                    'language': repo_data.get('language', '未知'),
-                    'stars': repo_data['stargazers_count'],
-                    'forks': repo_data['forks_count'],
-                    'open_issues': repo_data['open_issues_count'],
-                    'created_at': repo_data['created_at'][:10],
-                    'updated_at': repo_data['updated_at'][:10]
-                }, None
+                return repo_info_from_payload(response.json()), None
             else:
                 error_msg = f"GitHub API错误: {response.status_code} - {response.text}"
-                print(error_msg)
+                logger.warning(error_msg)
                 return None, error_msg
                 
+        except RateLimitExceeded:
+            raise  # 配额耗尽由上层统一返回429
         except requests.exceptions.Timeout:
             error_msg = "请求GitHub API超时，请稍后重试"
-            print(error_msg)
+            logger.warning(error_msg)
             return None, error_msg
         except requests.exceptions.ConnectionError:
             error_msg = "网络连接错误，请检查网络连接"
-            print(error_msg)
+            logger.warning(error_msg)
             return None, error_msg
         except Exception as e:
             error_msg = f"获取仓库信息失败: {str(e)}"
-            print(error_msg)
+            logger.warning(error_msg)
             return None, error_msg
 
     def get_readme(self, owner, repo_name):
+        readme, error = self.get_readme_blob(owner, repo_name)
+        return readme['text'], error
+
+    def get_readme_blob(self, owner, repo_name):
+        """README文本及其blob SHA（增量分析据此判断README是否变化）；没有README时SHA为None"""
+        try:
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/readme"
+            with stage('github_readme'):
+                response = github_get(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            
+            if response.status_code == 200:
+                readme_data = response.json()
+                return {'text': decode_readme(readme_data), 'sha': readme_data.get('sha')}, None
+            return {'text': "无README", 'sha': None}, None
+        except Exception as e:
+            return {'text': "无README", 'sha': None}, f"获取README失败: {str(e)}"
+
+    def get_languages(self, owner, repo_name):
         try:
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}/readme"
-            response = requests.get(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/languages"
+            with stage('github_languages'):
+                response = github_get(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
-                content = response.json().get('content', '')
-                decoded_content = base64.b64decode(content).decode('utf-8')
-                return decoded_content, None
-            return "无README", None
+                return response.json(), None
+            return {}, f"获取语言统计失败: {response.status_code}"
         except Exception as e:
-            return "无README", f"获取README失败: {str(e)}"
+            return {}, f"获取语言统计失败: {str(e)}"
+
+    def get_head_sha(self, owner, repo_name):
+        """默认分支最新提交的SHA（只返回SHA文本；响应可用ETag重新验证）"""
+        try:
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/commits/HEAD"
+            with stage('github_head'):
+                response = github_get(api_url, headers={'Accept': 'application/vnd.github.sha'}, timeout=REQUEST_TIMEOUT)
+            
+            if response.status_code == 200:
+                return response.text.strip(), None
+            return None, f"获取最新提交失败: {response.status_code}"
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return None, f"获取最新提交失败: {str(e)}"
+
+    def open_tarball(self, owner, repo_name, ref):
+        """打开指定提交的tarball下载（流式响应，由调用方逐块读取后关闭）"""
+        try:
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/tarball/{ref}"
+            response = github_download(api_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response, None
+            response.close()
+            return None, f"下载仓库归档失败: {response.status_code}"
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return None, f"下载仓库归档失败: {str(e)}"
+
+# 进程内共享的GitHub客户端（底层复用同一个连接池）
+github_client = GitHubClient()
+
+# 深度分析（depth=code）：下载仓库归档到磁盘缓存并计算代码统计
+repo_archiver = RepoArchiver(create_archive_source(github_client))
+ANALYSIS_DEPTHS = ('metadata', 'code')
+
+def _timed_call(func, *args):
+    """执行一次调用并记录耗时"""
+    start = time.time()
+    value, error = func(*args)
+    return value, error, round(time.time() - start, 3)
+
+def fetch_repo_data_graphql(github_client, owner, repo_name, loader=None):
+    """用一个GraphQL查询获取仓库信息、README和语言统计（批量分析时由loader按组查询）
+
+    README不在常见文件名中时再用REST /readme 接口补取；整个查询失败时抛出GraphQLError。
+    """
+    start_time = time.time()
+    with stage('github_graphql'):
+        data = loader.load(owner, repo_name, timeout=REQUEST_TIMEOUT) if loader is not None else None
+        if data is None:
+            data = fetch_repos([(owner, repo_name)], timeout=REQUEST_TIMEOUT)[(owner, repo_name)]
+    timings = {'graphql': round(time.time() - start_time, 3)}
+    if 'error' in data:
+        timings['fetch_total'] = timings['graphql']
+        return {'repo_info': None, 'readme': "无README", 'languages': {}}, {'repo_info': data['error']}, timings
+    
+    results = {'repo_info': repo_info_from_payload(data['repo']), 'readme': data['readme'],
+               'languages': data['languages']}
+    results['source'] = source_fingerprint(results['repo_info'], data['head_sha'], data['readme_sha'])
+    errors = {}
+    if results['readme'] is None:
+        record_fallback('readme')
+        readme, error, timings['readme'] = _timed_call(github_client.get_readme_blob, owner, repo_name)
+        results['readme'], results['source']['readme_sha'] = readme['text'], readme['sha']
+        if error:
+            errors['readme'] = error
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
+
+def fetch_repo_data(github_client, repo_url, owner, repo_name, loader=None):
+    """获取仓库信息、README和语言统计
+
+    启用GraphQL时用一个查询取回全部数据，查询失败或GraphQL配额不足时退回REST：
+    三个REST调用并发发出，每个调用独立超时、独立处理失败。
+    """
+    if graphql_enabled():
+        try:
+            return fetch_repo_data_graphql(github_client, owner, repo_name, loader)
+        except (GraphQLError, RateLimitExceeded) as e:
+            record_fallback('query')
+            logger.warning("GraphQL获取失败，改用REST接口", extra={'repo': f'{owner}/{repo_name}', 'error': str(e)})
+    
+    start_time = time.time()
+    results, errors, timings = _fetch_concurrently({
+        'repo_info': (github_client.get_repo_info, (repo_url,), None),
+        'readme': (github_client.get_readme_blob, (owner, repo_name), {'text': "无README", 'sha': None}),
+        'languages': (github_client.get_languages, (owner, repo_name), {}),
+    }, start_time)
+    readme = results.pop('readme')
+    results['readme'] = readme['text']
+    results['source'] = source_fingerprint(results['repo_info'], readme_sha=readme['sha'])
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
+
+def _fetch_concurrently(calls, start_time):
+    """并发执行 {名称: (函数, 参数, 失败时的默认值)}，返回 (结果, 错误, 耗时)"""
+    # 在复制的上下文中执行，各调用的阶段耗时记入本次请求的trace
+    futures = {
+        name: fetch_executor.submit(contextvars.copy_context().run, _timed_call, func, *args)
+        for name, (func, args, _) in calls.items()
+    }
+    
+    results, errors, timings = {}, {}, {}
+    for name, future in futures.items():
+        default = calls[name][2]
+        # 所有调用同时发出，各自从发出时刻起最多等待 REQUEST_TIMEOUT
+        remaining = max(0, start_time + REQUEST_TIMEOUT - time.time())
+        try:
+            value, error, elapsed = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            value, error, elapsed = default, f"{name} 请求超时", round(time.time() - start_time, 3)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            value, error, elapsed = default, f"{name} 请求失败: {str(e)}", round(time.time() - start_time, 3)
+        results[name] = value if value is not None else default
+        timings[name] = elapsed
+        if error:
+            errors[name] = error
+    return results, errors, timings
+
+def fetch_changes(github_client, repo_url, owner, repo_name, previous_source, loader=None):
+    """增量分析的获取：只取判断变化所需的数据，返回值与 fetch_repo_data 相同，未获取的部分不在结果中
+
+    GraphQL一个查询就能取回全部输入（包括HEAD和README的SHA），直接使用；REST先只取仓库信息，
+    pushed_at变化时再查询HEAD提交，HEAD也变化（或上次没有记录）时才获取README和语言统计。
+    """
+    if graphql_enabled():
+        try:
+            return fetch_repo_data_graphql(github_client, owner, repo_name, loader)
+        except (GraphQLError, RateLimitExceeded) as e:
+            record_fallback('query')
+            logger.warning("GraphQL获取失败，改用REST接口", extra={'repo': f'{owner}/{repo_name}', 'error': str(e)})
+    
+    start_time = time.time()
+    timings, errors = {}, {}
+    repo_info, error, timings['repo_info'] = _timed_call(github_client.get_repo_info, repo_url)
+    if error:
+        timings['fetch_total'] = round(time.time() - start_time, 3)
+        return {'repo_info': None}, {'repo_info': error}, timings
+    results = {'repo_info': repo_info, 'source': source_fingerprint(repo_info)}
+    if not code_unchanged(previous_source, results['source']):
+        head_sha, error, timings['head'] = _timed_call(github_client.get_head_sha, owner, repo_name)
+        results['source']['head_sha'] = head_sha
+        if error:
+            errors['head'] = error
+    if not code_unchanged(previous_source, results['source']):
+        changed, changed_errors, changed_timings = _fetch_concurrently({
+            'readme': (github_client.get_readme_blob, (owner, repo_name), {'text': "无README", 'sha': None}),
+            'languages': (github_client.get_languages, (owner, repo_name), {}),
+        }, time.time())
+        results['readme'], results['source']['readme_sha'] = changed['readme']['text'], changed['readme']['sha']
+        results['languages'] = changed['languages']
+        errors.update(changed_errors)
+        timings.update(changed_timings)
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
 
 # 智能分析器 - 使用模拟数据确保可靠性
 class SmartAIAnalyzer:
-    def analyze_repo(self, repo_info, readme_content):
+    def analyze_repo(self, repo_info, readme_content, code_stats=None):
         try:
             # 模拟AI分析 - 快速返回结果
-            analysis = self._generate_smart_analysis(repo_info, readme_content)
+            analysis = self._generate_smart_analysis(repo_info, readme_content, code_stats)
             return analysis, None
         except Exception as e:
             return None, f"AI分析失败: {str(e)}"
     
-    def _generate_smart_analysis(self, repo_info, readme_content):
+    def _generate_smart_analysis(self, repo_info, readme_content, code_stats=None):
         """生成智能分析报告"""
         stars = repo_info['stars']
         forks = repo_info['forks']
@@ -111,7 +367,7 @@ class SmartAIAnalyzer:
         activity = "非常活跃" if forks > 500 else "活跃" if forks > 100 else "一般" if forks > 10 else "较低"
         
         # 技术栈分析
-        tech_stack = self._analyze_tech_stack(language, readme_content)
+        tech_stack = self._analyze_tech_stack(language, readme_content, code_stats)
         
         # 学习价值评估
         learning_value = self._assess_learning_value(stars, forks, issues)
@@ -144,8 +400,8 @@ class SmartAIAnalyzer:
 """
         return analysis
     
-    def _analyze_tech_stack(self, language, readme_content):
-        """分析技术栈"""
+    def _analyze_tech_stack(self, language, readme_content, code_stats=None):
+        """分析技术栈；有代码统计（深度分析）时按实际代码行数和依赖清单补充语言构成与框架"""
         tech_mapping = {
             'JavaScript': '前端开发、Web应用',
             'Python': '数据分析、机器学习、Web后端',
@@ -158,7 +414,24 @@ class SmartAIAnalyzer:
         }
         
         description = tech_mapping.get(language, "通用软件开发")
-        return f"- **主要语言**: {language} - {description}\n- **应用领域**: {description}\n- **技术生态**: 丰富的开源库和框架支持"
+        if not code_stats:
+            return f"- **主要语言**: {language} - {description}\n- **应用领域**: {description}\n- **技术生态**: 丰富的开源库和框架支持"
+        
+        code_languages = {name: counts for name, counts in code_stats['languages'].items()
+                          if name not in NON_CODE and counts['code']}
+        total_code = sum(counts['code'] for counts in code_languages.values()) or 1
+        composition = '、'.join(f"{name} {counts['code'] / total_code:.1%}" for name, counts in list(code_languages.items())[:5])
+        comment_ratio = code_stats['comment'] / max(code_stats['code'] + code_stats['comment'], 1)
+        lines = [
+            f"- **主要语言**: {language} - {description}",
+            f"- **语言构成**（按代码行）: {composition or '未识别到代码文件'}",
+            f"- **代码规模**: {code_stats['files']:,} 个文件，代码 {code_stats['code']:,} 行，注释 {code_stats['comment']:,} 行（注释率 {comment_ratio:.1%}）",
+            f"- **框架与库**: {'、'.join(code_stats['frameworks']) or '未从依赖清单中识别到常见框架'}",
+        ]
+        if code_stats['manifests']:
+            manifests = '、'.join(f"`{manifest['path']}`（{len(manifest['dependencies'])} 个依赖）" for manifest in code_stats['manifests'][:5])
+            lines.append(f"- **依赖清单**: {manifests}")
+        return "\n".join(lines)
     
     def _assess_learning_value(self, stars, forks, issues):
         """评估学习价值"""
@@ -199,77 +472,418 @@ class SmartAIAnalyzer:
             
         return "\n".join([f"- {rec}" for rec in recs])
 
-# 导出功能
-def generate_pdf(data):
-    from fpdf import FPDF
-    
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    repo_info = data['repo_info']
-    
-    pdf.set_font("Arial", size=16, style='B')
-    pdf.cell(200, 10, txt=f"GitHub仓库分析报告 - {repo_info['full_name']}", ln=True, align='C')
-    pdf.ln(10)
-    
-    pdf.set_font("Arial", size=12, style='B')
-    pdf.cell(200, 10, txt="📊 基本信息", ln=True)
-    pdf.set_font("Arial", size=10)
-    
-    info_text = f"""
-仓库名称: {repo_info['full_name']}
-描述: {repo_info['description']}
-主要语言: {repo_info['language']}
-星标数: {repo_info['stars']}
-Fork数: {repo_info['forks']}
-未解决问题: {repo_info['open_issues']}
-创建时间: {repo_info['created_at']}
-最后更新: {repo_info['updated_at']}
-分析时间: {data['analyzed_at']}
+# 分析流程
+class AnalysisError(Exception):
+    """分析流程中的可预期错误，携带返回给客户端的HTTP状态码"""
+    def __init__(self, message, status_code=500, timings=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.timings = timings
+
+def run_analysis(repo_url, owner, repo_name, loader=None):
+    """执行完整的 获取→分析 流程，返回报告字典"""
+    start_time = time.time()
+    ai_analyzer = SmartAIAnalyzer()
+    
+    # 并发获取仓库信息、README和语言统计
+    fetched, fetch_errors, timings = fetch_repo_data(github_client, repo_url, owner, repo_name, loader)
+    if 'repo_info' in fetch_errors:
+        raise AnalysisError(fetch_errors['repo_info'], 400, timings)
+    repo_info = fetched['repo_info']
+    readme_content = fetched['readme']
+    for name, error in fetch_errors.items():
+        logger.warning(error, extra={'call': name})  # 记录错误但不中断流程
+    
+    # AI分析
+    with stage('analysis'):
+        ai_analysis, ai_error = ai_analyzer.analyze_repo(repo_info, readme_content)
+    if ai_error:
+        raise AnalysisError(ai_error, 500)
+    
+    return build_report(fetched, ai_analysis, timings, start_time)
+
+def build_report(fetched, ai_analysis, timings, start_time):
+    """组装返回给客户端的报告"""
+    # 计算处理时间
+    processing_time = round(time.time() - start_time, 2)
+    
+    return {
+        'report_id': str(uuid.uuid4())[:8],
+        'repo_info': fetched['repo_info'],
+        'languages': fetched['languages'],
+        'ai_analysis': ai_analysis,
+        'analysis_tier': 'heuristic',
+        'analyzed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'processing_time': processing_time,
+        'timings': timings,
+        'source': fetched.get('source')
+    }
+
+def refresh_report(previous, repo_url, owner, repo_name, loader=None):
+    """增量分析：以该仓库上一份报告为基线，只重新获取、计算输入有变化的部分，返回新报告"""
+    start_time = time.time()
+    fetched, fetch_errors, timings = fetch_changes(github_client, repo_url, owner, repo_name,
+                                                   previous.get('source') or {}, loader)
+    if 'repo_info' in fetch_errors:
+        raise AnalysisError(fetch_errors['repo_info'], 400, timings)
+    for name, error in fetch_errors.items():
+        logger.warning(error, extra={'call': name})
+    with stage('analysis'):
+        return build_refreshed_report(previous, fetched, timings, start_time)
+
+def build_refreshed_report(previous, fetched, timings, start_time):
+    """合并增量获取的数据和基线报告
+
+    代码没有变化时沿用语言统计、代码统计和LLM分析，只更新仓库的数字；代码变化但README没有变化时
+    沿用LLM分析；README变化时重新生成模板分析（之后按分级分析的流程补充LLM分析）。
+    模板分析只依赖本地数据，总是按最新的数字重新生成。
     """
+    old_source = previous.get('source') or {}
+    same_code = code_unchanged(old_source, fetched['source'])
+    same_readme = same_code or readme_unchanged(old_source, fetched['source'])
+    source = dict(old_source, pushed_at=fetched['source']['pushed_at']) if same_code else fetched['source']
+    if same_code and fetched['source'].get('head_sha'):
+        source['head_sha'] = fetched['source']['head_sha']  # 补上REST初次分析时没有记录的HEAD
+    reused, changed = [], ['repo_info']
     
-    pdf.multi_cell(0, 8, txt=info_text)
-    pdf.ln(5)
+    fetched = dict(fetched, source=source)
+    if same_code and 'languages' not in fetched:
+        fetched['languages'] = previous['languages']
+        reused.append('languages')
+    code_stats = previous.get('code_stats')
+    if not same_code or not code_stats or 'error' in code_stats:
+        code_stats = None
+    if not same_code:
+        changed.append('code')
+    if not same_readme:
+        changed.append('readme')
+    
+    if same_readme and previous.get('analysis_tier') == 'llm':
+        ai_analysis, analysis_tier = previous['ai_analysis'], 'llm'
+        reused.append('ai_analysis')
+    else:
+        ai_analysis, ai_error = SmartAIAnalyzer().analyze_repo(fetched['repo_info'], fetched.get('readme'), code_stats)
+        if ai_error:
+            raise AnalysisError(ai_error, 500)
+        analysis_tier = 'heuristic'
+    
+    report = build_report(fetched, ai_analysis, timings, start_time)
+    report['analysis_tier'] = analysis_tier
+    if code_stats is not None:
+        report['code_stats'] = code_stats
+        reused.append('code_stats')
+    report['incremental'] = {'previous_report_id': previous['report_id'], 'reused': reused, 'changed': changed}
+    record_refresh('unchanged' if same_code else 'code' if same_readme else 'readme')
+    return report
+
+def record_history(key, report):
+    """记录本次分析观察到的指标，返回附带增长趋势（trend）的报告"""
+    if not HISTORY_ENABLED:
+        return report
+    with stage('history'):
+        history.append(key, time.time(), report['repo_info'])
+        return dict(report, trend=history.trend(key))
+
+def get_report(repo_url, owner, repo_name, loader=None, refresh=False):
+    """优先读取报告缓存和关注列表预先生成的报告；未命中时合并同一仓库的并发请求，只执行一次分析流程
+
+    refresh=True 时跳过两者重新检查仓库（关注列表的定期刷新）
+    """
+    key = normalize_repo_key(owner, repo_name)
+    if not refresh:
+        cached = report_cache.get(key)
+        if cached is not None:
+            return dict(cached, cache_status='hit')
+        watched = watchlist.report(key)
+        if watched is not None:
+            return dict(watched, cache_status='watchlist')
     
-    pdf.set_font("Arial", size=12, style='B')
-    pdf.cell(200, 10, txt="🤖 AI分析报告", ln=True)
-    pdf.set_font("Arial", size=10)
-    pdf.multi_cell(0, 8, txt=data['ai_analysis'])
+    def pipeline():
+        previous = report_store.latest(key) if INCREMENTAL_ANALYSIS else None
+        if previous is not None and previous.get('source'):
+            result = refresh_report(previous, repo_url, owner, repo_name, loader)
+        else:
+            record_refresh('full')
+            result = run_analysis(repo_url, owner, repo_name, loader)
+        result = record_history(key, result)
+        report_cache.set(key, result)
+        with stage('report_store'):
+            report_store.put(result)
+            if not refresh:
+                watchlist.store(key, result)  # 关注仓库的报告过旧时由这里补上，定期刷新完成后另行保存
+        return result
     
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    pdf.output(temp_file.name)
-    return temp_file.name
+    result, shared = report_flight.do(key, pipeline)
+    return dict(result, cache_status='coalesced' if shared else 'miss')
 
-def generate_markdown(data):
-    repo_info = data['repo_info']
+def get_llm_analyzer():
+    """延迟创建进程内共享的LLM分析器；未配置LLM后端（如缺少ZHIPUAI_API_KEY）时返回None"""
+    global _llm_analyzer
+    if get_llm_gateway() is None:
+        return None
+    if _llm_analyzer is None:
+        with _llm_lock:
+            if _llm_analyzer is None:
+                _llm_analyzer = AIAnalyzer()
+    return _llm_analyzer if _llm_analyzer.gateway else None
+
+def stream_analysis_text(repo_info, readme_content):
+    """逐段产出分析文本：已配置LLM时流式调用AI，否则按行输出模板分析结果"""
+    llm_analyzer = get_llm_analyzer()
+    if llm_analyzer is not None:
+        yield from llm_analyzer.analyze_repo_stream(repo_info, readme_content)
+        return
     
-    md_content = f"""# GitHub仓库分析报告 - {repo_info['full_name']}
+    analysis, error = SmartAIAnalyzer().analyze_repo(repo_info, readme_content)
+    if error:
+        raise RuntimeError(error)
+    yield from analysis.splitlines(keepends=True)
+
+def enrich_report(report, deadline=None):
+    """用LLM分析替换报告中的模板分析，返回新报告；失败时抛出异常"""
+    llm_analyzer = get_llm_analyzer()
+    if llm_analyzer is None:
+        raise RuntimeError("AI分析器未正确初始化，请检查配置")
+    owner, repo_name = report['repo_info']['full_name'].split('/', 1)
+    llm_start = time.time()
+    readme_content = github_client.get_readme(owner, repo_name)[0]
+    with stage('llm'):
+        ai_analysis = ''.join(llm_analyzer.analyze_repo_stream(report['repo_info'], readme_content, deadline))
+    return dict(report, ai_analysis=ai_analysis, analysis_tier='llm',
+                timings=dict(report['timings'], llm=round(time.time() - llm_start, 3)))
 
-## 📊 基本信息
+def save_report(report):
+    """更新报告缓存、报告存储和关注列表（补充分析的进度和结果都通过这里写回）"""
+    key = normalize_repo_key(*report['repo_info']['full_name'].split('/', 1))
+    report_cache.set(key, report)
+    report_store.put(report)
+    watchlist.store(key, report)
 
-- **仓库名称**: {repo_info['full_name']}
-- **描述**: {repo_info['description'] or '无描述'}
-- **主要语言**: {repo_info['language']}
-- **星标数**: {repo_info['stars']}
-- **Fork数**: {repo_info['forks']}
-- **未解决问题**: {repo_info['open_issues']}
-- **创建时间**: {repo_info['created_at']}
-- **最后更新**: {repo_info['updated_at']}
+def background_enrich(report):
+    """后台补充分析：完成或失败后写回报告，客户端轮询 /report/<id> 即可取得LLM分析"""
+    start_request(report_id=report['report_id'])
+    try:
+        result = dict(enrich_report(report), enrichment={'status': 'done'})
+    except Exception as e:
+        logger.warning("AI补充分析失败，保留模板分析结果", extra={'error': str(e)})
+        result = dict(report, enrichment={'status': 'failed', 'error': str(e)})
+    save_report(result)
+    return result
 
-## 🤖 AI分析报告
+enricher = Enricher(background_enrich)
 
-{data['ai_analysis']}
+def parse_depth(data):
+    """读取请求中的 depth（metadata 或 code），返回 (分析深度, 错误信息)"""
+    depth = data.get('depth', 'metadata')
+    if depth not in ANALYSIS_DEPTHS:
+        return None, f"depth 必须是 {' / '.join(ANALYSIS_DEPTHS)} 之一"
+    return depth, None
 
----
+def get_code_stats(owner, repo_name):
+    """获取仓库HEAD提交的代码统计；同一仓库的并发请求只下载、统计一次"""
+    key = 'code:' + normalize_repo_key(owner, repo_name)
+    with stage('code_stats'):
+        stats, _ = report_flight.do(key, lambda: repo_archiver.code_stats(owner, repo_name))
+    return stats
 
-*分析时间: {data['analyzed_at']}*
-"""
+def add_code_stats(report):
+    """深度分析：在报告中加入代码统计并写回报告缓存和存储；获取归档失败时只在本次结果中附上错误"""
+    if 'code_stats' in report and 'error' not in report['code_stats']:
+        return report
+    owner, repo_name = report['repo_info']['full_name'].split('/', 1)
+    try:
+        code_stats = get_code_stats(owner, repo_name)
+    except ArchiveError as e:
+        logger.warning("代码统计失败", extra={'repo': f'{owner}/{repo_name}', 'error': str(e)})
+        return dict(report, code_stats={'error': str(e)})
+    stored = {key: value for key, value in report.items() if key != 'cache_status'}
+    stored['code_stats'] = code_stats
+    if stored.get('source') and not stored['source'].get('head_sha'):
+        stored['source'] = dict(stored['source'], head_sha=code_stats['ref'])
+    if stored.get('analysis_tier') == 'heuristic':
+        # 模板分析按代码统计重新生成技术栈部分；LLM分析保持不变
+        ai_analysis, error = SmartAIAnalyzer().analyze_repo(stored['repo_info'], None, code_stats)
+        if not error:
+            stored['ai_analysis'] = ai_analysis
+    save_report(stored)
+    return dict(stored, cache_status=report.get('cache_status'))
+
+def parse_latency_budget(data):
+    """读取请求中的 latency_budget（秒），返回 (预算, 错误信息)"""
+    try:
+        return float(data.get('latency_budget', ANALYSIS_LATENCY_BUDGET)), None
+    except (TypeError, ValueError):
+        return None, 'latency_budget 必须是数字（秒）'
+
+def pending_enrichment(report):
+    return {'status': 'pending', 'status_url': f"/report/{report['report_id']}"}
+
+def start_enrichment(report, remaining, enrich=True):
+    """分级分析：模板分析已经完成，按剩余预算决定LLM分析合并进本次响应还是转入后台
+    
+    返回 (Future或None, 最多等待的秒数)
+    """
+    if report.get('analysis_tier') == 'llm' or report.get('enrichment', {}).get('status') == 'failed':
+        return None, 0
+    plan = plan_tiers(remaining, bool(enrich) and get_llm_analyzer() is not None,
+                      expected_llm_latency(get_llm_gateway()))
+    if plan is None:
+        enricher.record('heuristic_only')
+        return None, 0
     
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.md')
-    with open(temp_file.name, 'w', encoding='utf-8') as f:
-        f.write(md_content)
-    return temp_file.name
+    stored = {key: value for key, value in report.items() if key != 'cache_status'}
+    if not enricher.is_pending(report['report_id']):
+        # 先标记为进行中，轮询的客户端据此判断是否还要继续等待
+        save_report(dict(stored, enrichment=pending_enrichment(report)))
+    future = enricher.submit(report['report_id'], stored)
+    return future, (remaining if plan == 'inline' else 0)
+
+def finish_enrichment(report, future, enriched):
+    """LLM分析在预算内完成时返回合并后的报告，否则返回模板分析并附上后台任务的状态地址"""
+    if future is None:
+        return report
+    if enriched is not None:
+        # 在预算内失败时响应中只有模板分析
+        failed = enriched.get('enrichment', {}).get('status') == 'failed'
+        enricher.record('heuristic_only' if failed else 'inline')
+        return dict(enriched, cache_status=report.get('cache_status'))
+    enricher.record('deferred')
+    return dict(report, enrichment=pending_enrichment(report))
+
+def run_job(job_id, payload):
+    """后台任务：获取仓库数据并生成报告；已配置LLM时用AI分析替换模板分析"""
+    repo_url = payload['repo_url']
+    # 沿用提交任务的请求的 request_id，任务日志和提交请求的日志可以对应起来
+    start_request(payload.get('request_id'), report_id=job_id)
+    owner, repo_name = parse_repo_url(repo_url)
+    report = get_report(repo_url, owner, repo_name)
+    if payload.get('depth') == 'code':
+        report = add_code_stats(report)
+    
+    if report.get('analysis_tier') != 'llm' and get_llm_analyzer() is not None:
+        try:
+            report = enrich_report(report)
+        except Exception as e:
+            logger.warning("AI分析失败，使用模板分析结果", extra={'error': str(e)})
+    
+    report = dict(report, report_id=job_id)
+    report.pop('enrichment', None)
+    report_store.put(report)
+    return report
+
+# 后台分析任务队列：工作线程数即每个进程的LLM并发上限
+job_queue = JobQueue(run_job)
+
+def refresh_watched(entry):
+    """关注列表的定期刷新：跳过报告缓存重新检查仓库（增量分析只获取有变化的部分），按关注时的深度补充代码统计，
+    已配置LLM时补充LLM分析，返回保存到关注列表的报告"""
+    start_request(repo=entry['repo'])
+    owner, repo_name = parse_repo_url(entry['repo_url'])
+    report = get_report(entry['repo_url'], owner, repo_name, refresh=True)
+    if entry['depth'] == 'code':
+        report = add_code_stats(report)
+    report = {key: value for key, value in report.items() if key != 'cache_status'}
+    
+    if report.get('analysis_tier') != 'llm' and get_llm_analyzer() is not None:
+        try:
+            report = enrich_report(report)
+            save_report(report)
+        except Exception as e:
+            logger.warning("AI分析失败，使用模板分析结果", extra={'error': str(e)})
+    return report
+
+def watchlist_quota():
+    """关注列表领取刷新前确认剩余配额，保留配额上限的 WATCHLIST_QUOTA_RESERVE 比例给交互请求（上限未知时不保留）"""
+    limiter = graphql_rate_limiter if graphql_enabled() else rate_limiter
+    limit = sum(quota['limit'] or 0 for quota in limiter.snapshot()['tokens'])
+    return limiter.wait_available(CALLS_PER_REPO + int(limit * WATCHLIST_QUOTA_RESERVE), max_wait=0)
+
+def parse_watch_request(data):
+    """读取关注请求中的 interval（秒，默认 WATCHLIST_INTERVAL）和 depth，返回 (间隔, 深度, 错误信息)"""
+    try:
+        interval = int(data.get('interval', WATCHLIST_INTERVAL))
+    except (TypeError, ValueError):
+        return None, None, 'interval 必须是整数（秒）'
+    if interval < WATCHLIST_MIN_INTERVAL:
+        return None, None, f'interval 不能小于 {WATCHLIST_MIN_INTERVAL} 秒'
+    depth, depth_error = parse_depth(data)
+    return interval, depth, depth_error
+
+# 关注列表：到期的仓库由每个进程的 WATCHLIST_WORKERS 个线程刷新，配额不足时暂停
+watchlist = Watchlist(refresh_watched, quota=watchlist_quota)
+if WATCHLIST_SCHEDULER and multiprocessing.parent_process() is None:
+    watchlist.start()  # 以 python app.py 运行时代码统计子进程会重新导入本模块，子进程中不启动调度
+
+def with_trace(result):
+    """本次请求被抽中记录时，把分阶段耗时（秒）附在返回结果中"""
+    trace = current_trace()
+    return dict(result, trace=dict(trace)) if trace is not None else result
+
+def trace_response(result):
+    with stage('serialize'):
+        return jsonify(with_trace(result))
+
+def sse_event(event, data):
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 各组件已有的统计信息同时通过 /metrics 导出
+registry.register_stats('report_cache', report_cache.stats, counters=('hits', 'misses'), gauges=('entries',))
+registry.register_stats('report_flight', report_flight.stats, counters=('executed', 'coalesced'), gauges=('in_flight',))
+registry.register_stats('github_cache', cache_stats, counters=('hits', 'misses', 'not_modified'),
+                        gauges=('entries', 'bytes'))
+registry.register_stats('github_quota', quota_stats, gauges=('waiting',))
+registry.register_stats('github_graphql', graphql_stats, counters=('queries', 'repos', 'query_fallbacks', 'readme_fallbacks'))
+registry.register_stats('llm_cache', llm_cache_stats, counters=('hits', 'misses', 'saved_seconds'),
+                        gauges=('entries', 'bytes'))
+registry.register_stats('llm_gateway', llm_gateway_stats,
+                        counters=('completed', 'errors', 'cancelled', 'retries', 'timeouts'),
+                        gauges=('max_concurrency', 'queue_depth', 'in_flight'), histograms=('latency', 'queue_wait'))
+registry.register_stats('enrichment', enricher.stats,
+                        counters=('submitted', 'coalesced', 'completed', 'failed', 'inline', 'deferred', 'heuristic_only'),
+                        gauges=('pending',))
+registry.register_stats('jobs', job_queue.stats, gauges=('workers', 'queued', 'running', 'done', 'error'))
+registry.register_stats('report_store', report_store.stats, counters=('artifact_hits', 'artifact_misses'),
+                        gauges=('reports', 'report_bytes', 'artifacts', 'artifact_bytes'))
+registry.register_stats('repo_archive', repo_archiver.cache.stats,
+                        counters=('hits', 'archive_hits', 'downloads', 'evictions'), gauges=('entries', 'bytes'))
+registry.register_stats('watchlist', watchlist.stats, counters=('refreshed', 'failed', 'quota_pauses', 'served'),
+                        gauges=('workers', 'entries', 'due', 'running', 'lag'))
+registry.register_stats('history', history.stats, counters=('appends', 'compacted_chunks'),
+                        gauges=('chunks', 'points', 'bytes'))
+registry.register_stats('incremental', incremental_stats, counters=('unchanged', 'code', 'readme', 'full'))
+registry.register_stats('log', log_stats, counters=('dropped',), gauges=('queued',))
+
+@app.before_request
+def start_request_metrics():
+    """记录请求开始时间和在途数，并按抽样比例决定是否记录本次请求的分阶段耗时"""
+    g.request_start = time.time()
+    g.in_flight_endpoint = endpoint_label(request)
+    http_in_flight.inc(endpoint=g.in_flight_endpoint)
+    start_trace(trace_requested(request.headers))
+    start_request(request.headers.get('X-Request-ID'), debug=trace_requested(request.headers))
+    if WATCHLIST_SCHEDULER:
+        watchlist.start()  # gunicorn --preload 时导入阶段启动的线程不会带到fork出的worker中
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = endpoint_label(request)
+    http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    http_duration.observe(time.time() - g.request_start, endpoint=endpoint)
+    trace = current_trace()
+    if trace:
+        response.headers['Server-Timing'] = server_timing(trace)
+    response.headers['X-Request-ID'] = current_request_id()
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # 流式响应（stream_with_context）结束时teardown会再执行一次，只减一次在途数
+    endpoint = g.pop('in_flight_endpoint', None)
+    if endpoint is not None:
+        http_in_flight.dec(endpoint=endpoint)
+    end_trace()
 
 # Flask路由 - 优化错误处理
 @app.route('/')
@@ -279,63 +893,278 @@ def index():
 @app.route('/analyze', methods=['POST'])
 def analyze_repo():
     """分析GitHub仓库 - 优化版本"""
-    start_time = time.time()
-    
     data = request.get_json()
     repo_url = data.get('repo_url')
     
-    if not repo_url:
-        return jsonify({'error': '请输入GitHub仓库链接'}), 400
-    
     # 验证GitHub链接格式
-    if not repo_url.startswith('https://github.com/') or repo_url.count('/') < 4:
-        return jsonify({'error': 'GitHub链接格式不正确，应为: https://github.com/用户名/仓库名'}), 400
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        return jsonify({'error': url_error}), 400
+    budget, budget_error = parse_latency_budget(data)
+    if budget_error:
+        return jsonify({'error': budget_error}), 400
+    depth, depth_error = parse_depth(data)
+    if depth_error:
+        return jsonify({'error': depth_error}), 400
+    
+    # 异步模式：加入后台队列，立即返回报告ID，客户端轮询 /report/<id>
+    if data.get('async'):
+        report_id = job_queue.submit({'repo_url': repo_url, 'request_id': current_request_id(), 'depth': depth})
+        bind(report_id=report_id)
+        logger.info("已加入分析队列", extra={'repo_url': repo_url})
+        return jsonify({'report_id': report_id, 'status': 'queued',
+                        'status_url': f'/report/{report_id}'}), 202
     
     try:
-        github_client = GitHubClient()
-        ai_analyzer = SmartAIAnalyzer()
+        log_debug(logger, "开始分析", repo_url=repo_url)
+        start_time = time.time()
         
-        print(f"🔄 开始分析: {repo_url}")
+        owner, repo_name = parse_repo_url(repo_url)
+        result = get_report(repo_url, owner, repo_name)
+        if depth == 'code':
+            result = add_code_stats(result)
         
-        # 获取仓库信息（带错误处理）
-        repo_info, repo_error = github_client.get_repo_info(repo_url)
-        if repo_error:
-            return jsonify({'error': repo_error}), 400
+        # 分级分析：模板分析已就绪；LLM分析能在预算内完成就等待合并，否则转入后台
+        future, wait = start_enrichment(result, budget - (time.time() - start_time), data.get('enrich', True))
+        enriched = None
+        if future is not None and wait > 0:
+            try:
+                enriched = future.result(timeout=wait)
+            except FutureTimeoutError:
+                pass
+        result = finish_enrichment(result, future, enriched)
         
-        # 提取owner和repo_name
-        parts = repo_url.strip('/').split('/')
-        owner = parts[-2]
-        repo_name = parts[-1]
+        bind(report_id=result['report_id'])
+        logger.info("分析完成", extra={'repo_url': repo_url, 'processing_time': result['processing_time'],
+                                       'cache_status': result['cache_status'], 'analysis_tier': result['analysis_tier']})
+        return trace_response(result)
         
-        # 获取README（快速返回，不阻塞）
-        readme_content, readme_error = github_client.get_readme(owner, repo_name)
-        if readme_error:
-            print(f"⚠️ {readme_error}")  # 记录错误但不中断流程
-        
-        # AI分析
-        ai_analysis, ai_error = ai_analyzer.analyze_repo(repo_info, readme_content)
-        if ai_error:
-            return jsonify({'error': ai_error}), 500
+    except RateLimitExceeded as e:
+        logger.warning(str(e), extra={'repo_url': repo_url, 'retry_after': e.retry_after})
+        return jsonify({'error': str(e), 'retry_after': e.retry_after}), 429, {'Retry-After': str(e.retry_after)}
+    except AnalysisError as e:
+        logger.warning(e.message, extra={'repo_url': repo_url, 'status_code': e.status_code})
+        body = {'error': e.message}
+        if e.timings:
+            body['timings'] = e.timings
+        return jsonify(with_trace(body)), e.status_code
+    except Exception as e:
+        error_msg = f'分析过程中出现错误: {str(e)}'
+        logger.exception(error_msg, extra={'repo_url': repo_url})
+        return jsonify({'error': error_msg}), 500
+
+def analyze_for_batch(repo_url, loader=None):
+    """批量分析中的单个仓库，复用报告缓存与请求合并"""
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        raise AnalysisError(url_error, 400)
+    owner, repo_name = parse_repo_url(repo_url)
+    return get_report(repo_url, owner, repo_name, loader)
+
+def batch_loader(repo_urls):
+    """启用GraphQL时为批量分析创建loader：每 GRAPHQL_BATCH_SIZE 个仓库合并成一个查询"""
+    if not graphql_enabled():
+        return None
+    return RepoBatchLoader([parse_repo_url(url) for url in repo_urls
+                            if isinstance(url, str) and validate_repo_url(url) is None])
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """批量分析仓库，每完成一个就以NDJSON流式返回一行结果"""
+    data = request.get_json() or {}
+    repo_urls = data.get('repo_urls')
+    
+    if not isinstance(repo_urls, list) or not repo_urls:
+        return jsonify({'error': '请提供 repo_urls 列表'}), 400
+    if len(repo_urls) > BATCH_MAX_REPOS:
+        return jsonify({'error': f'单次最多分析 {BATCH_MAX_REPOS} 个仓库'}), 400
+    
+    try:
+        concurrency = int(data.get('concurrency', BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency 必须是整数'}), 400
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    logger.info("开始批量分析", extra={'repos': len(repo_urls), 'concurrency': concurrency})
+    loader = batch_loader(repo_urls)
+    
+    def generate():
+        # GraphQL模式下每个仓库不再固定消耗3次REST调用，配额不足时查询自动退回REST，不需要提交前检查
+        for item in run_batch(repo_urls, lambda repo_url: analyze_for_batch(repo_url, loader),
+                              concurrency=concurrency, quota=rate_limiter if loader is None else None,
+                              max_quota_wait=BATCH_MAX_QUOTA_WAIT):
+            yield json.dumps(item, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/analyze/stream')
+def analyze_stream():
+    """流式分析仓库：先推送仓库信息，再通过SSE逐段推送AI生成的报告"""
+    repo_url = request.args.get('repo_url', '').strip()
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        return jsonify({'error': url_error}), 400
+    
+    def generate():
+        start_time = time.time()
+        owner, repo_name = parse_repo_url(repo_url)
+        log_debug(logger, "开始流式分析", repo_url=repo_url)
         
-        # 计算处理时间
-        processing_time = round(time.time() - start_time, 2)
+        try:
+            fetched, fetch_errors, timings = fetch_repo_data(github_client, repo_url, owner, repo_name)
+        except RateLimitExceeded as e:
+            yield sse_event('analysis_error', {'error': str(e), 'retry_after': e.retry_after})
+            return
+        if 'repo_info' in fetch_errors:
+            yield sse_event('analysis_error', {'error': fetch_errors['repo_info'], 'timings': timings})
+            return
+        for name, error in fetch_errors.items():
+            logger.warning(error, extra={'call': name})
         
-        # 返回结果
-        result = {
+        meta = {
             'report_id': str(uuid.uuid4())[:8],
-            'repo_info': repo_info,
-            'ai_analysis': ai_analysis,
+            'repo_info': fetched['repo_info'],
+            'languages': fetched['languages'],
             'analyzed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'processing_time': processing_time
+            'timings': timings
         }
+        meta = record_history(normalize_repo_key(owner, repo_name), meta)
+        bind(report_id=meta['report_id'])
+        yield sse_event('meta', meta)
         
-        print(f"✅ 分析完成: {repo_url} (耗时: {processing_time}s)")
-        return jsonify(result)
+        # 在后台线程消费LLM流，主循环负责转发和发送心跳
+        chunks = queue.Queue()
+        cancelled = threading.Event()
         
-    except Exception as e:
-        error_msg = f'分析过程中出现错误: {str(e)}'
-        print(f"❌ {error_msg}")
-        return jsonify({'error': error_msg}), 500
+        def produce():
+            try:
+                for text in stream_analysis_text(fetched['repo_info'], fetched['readme']):
+                    if cancelled.is_set():
+                        return
+                    chunks.put(('token', text))
+                chunks.put(('done', None))
+            except Exception as e:
+                chunks.put(('error', str(e)))
+        
+        stream_executor.submit(produce)
+        first_token_time = None
+        analysis_parts = []
+        try:
+            while True:
+                try:
+                    kind, payload = chunks.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield sse_event('ping', {'elapsed': round(time.time() - start_time, 2)})
+                    continue
+                
+                if kind == 'token':
+                    if first_token_time is None:
+                        first_token_time = round(time.time() - start_time, 2)
+                    analysis_parts.append(payload)
+                    yield sse_event('token', {'text': payload})
+                elif kind == 'error':
+                    logger.error("AI分析失败", extra={'repo_url': repo_url, 'error': payload})
+                    yield sse_event('analysis_error', {'error': f'AI分析失败: {payload}'})
+                    return
+                else:
+                    processing_time = round(time.time() - start_time, 2)
+                    logger.info("流式分析完成", extra={'repo_url': repo_url, 'time_to_first_token': first_token_time,
+                                                    'processing_time': processing_time})
+                    report_store.put(dict(meta, source=fetched['source'], ai_analysis=''.join(analysis_parts),
+                                          processing_time=processing_time,
+                                          analysis_tier='llm' if get_llm_analyzer() is not None else 'heuristic'))
+                    yield sse_event('done', {
+                        'processing_time': processing_time,
+                        'time_to_first_token': first_token_time
+                    })
+                    return
+        finally:
+            # 客户端断开时通知后台线程停止消费LLM流
+            cancelled.set()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/report/<report_id>')
+def report_status(report_id):
+    """查询后台分析任务: queued / running / done（含报告） / error"""
+    job = job_queue.get(report_id)
+    if job is None:
+        # 同步或流式分析生成的报告直接从报告存储读取
+        report = report_store.get(report_id)
+        if report is None:
+            return jsonify({'error': '报告不存在或已过期'}), 404
+        job = {'report_id': report_id, 'status': 'done', 'result': report}
+    return jsonify(job)
+
+@app.route('/watchlist', methods=['GET', 'POST'])
+def watchlist_entries():
+    """GET 列出关注的仓库及刷新状态；POST 加入或修改关注（repo_url 或 repo_urls，可选 interval 和 depth）"""
+    if request.method == 'GET':
+        try:
+            limit, offset = int(request.args.get('limit', 100)), int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit 和 offset 必须是整数'}), 400
+        return jsonify({'entries': watchlist.entries(max(1, min(limit, 1000)), max(0, offset))})
+    
+    data = request.get_json() or {}
+    repo_urls = data.get('repo_urls') or [data.get('repo_url')]
+    if not isinstance(repo_urls, list):
+        return jsonify({'error': '请提供 repo_url 或 repo_urls 列表'}), 400
+    for repo_url in repo_urls:
+        url_error = validate_repo_url(repo_url)
+        if url_error:
+            return jsonify({'error': url_error, 'repo_url': repo_url}), 400
+    interval, depth, error = parse_watch_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    entries = [watchlist.add(normalize_repo_key(*parse_repo_url(repo_url)), repo_url, interval, depth)
+               for repo_url in repo_urls]
+    logger.info("已加入关注列表", extra={'repos': len(entries), 'interval': interval})
+    return jsonify({'entries': entries}), 201
+
+@app.route('/watchlist/<owner>/<repo_name>', methods=['GET', 'DELETE'])
+def watched_report(owner, repo_name):
+    """GET 返回关注仓库预先生成的报告，不访问GitHub；DELETE 取消关注"""
+    key = normalize_repo_key(owner, repo_name)
+    if request.method == 'DELETE':
+        if not watchlist.remove(key):
+            return jsonify({'error': '仓库不在关注列表中'}), 404
+        return jsonify({'repo': key, 'status': 'removed'})
+    
+    report = watchlist.report(key)
+    if report is not None:
+        return jsonify(dict(report, cache_status='watchlist'))
+    entry = watchlist.get(key)
+    if entry is None:
+        return jsonify({'error': '仓库不在关注列表中'}), 404
+    # 已关注但还没有完成刷新（或刷新已经停滞太久）
+    return jsonify(dict(entry, status='pending')), 202
+
+def parse_history_range(args):
+    """读取历史查询的 start、end（Unix时间戳，秒）或 days（最近N天），以及 max_points，返回 (参数, 错误信息)"""
+    try:
+        start, end = (float(args[name]) if args.get(name) else None for name in ('start', 'end'))
+        if args.get('days'):
+            start = time.time() - float(args['days']) * 86400
+        max_points = int(args.get('max_points', 0)) or None
+    except ValueError:
+        return None, 'start、end、days 必须是数字，max_points 必须是整数'
+    return {'start': start, 'end': end, 'max_points': max_points}, None
+
+@app.route('/history/<owner>/<repo_name>')
+def repo_history(owner, repo_name):
+    """仓库星标/Fork/问题数的历史（列式）和增长趋势，只读本地历史，不访问GitHub"""
+    key = normalize_repo_key(owner, repo_name)
+    params, error = parse_history_range(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    trend = history.trend(key)
+    if trend['first_seen'] is None:
+        return jsonify({'error': '没有该仓库的历史数据'}), 404
+    series = history.range(key, **params)
+    return jsonify({'repo': key, 'points': len(series['ts']), 'series': series, 'trend': trend})
 
 @app.route('/health')
 def health_check():
@@ -343,28 +1172,70 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'service': 'GitHub Repo AI Analyst'
+        'service': 'GitHub Repo AI Analyst',
+        'github_cache': cache_stats(),
+        'github_quota': quota_stats(),
+        'github_graphql': dict(graphql_stats(), quota=graphql_quota_stats()),
+        'report_cache': dict(report_cache.stats(), **report_flight.stats()),
+        'llm_cache': llm_cache_stats(),
+        'llm_gateway': llm_gateway_stats(),
+        'enrichment': enricher.stats(),
+        'jobs': job_queue.stats(),
+        'report_store': report_store.stats(),
+        'repo_archive': repo_archiver.cache.stats(),
+        'watchlist': watchlist.stats(),
+        'history': history.stats(),
+        'incremental': incremental_stats(),
+        'log': log_stats()
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus格式的监控指标：各阶段耗时、缓存命中、上游状态码和在途数"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def export_response(exporter, report, fileobj, size):
+    """把导出内容按块流式返回给客户端"""
+    return Response(stream_with_context(iter_chunks(fileobj)), mimetype=exporter.mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={exporter.filename(report)}',
+                             'Content-Length': str(size)})
+
 @app.route('/export/<format_type>', methods=['POST'])
 def export_report(format_type):
-    """导出报告"""
+    """导出客户端提交的报告（兼容旧版前端；新版前端使用按report_id导出的GET接口）"""
     data = request.get_json()
     
+    exporter = get_exporter(format_type)
+    if exporter is None:
+        return jsonify({'error': '暂不支持该格式'}), 400
+    
     try:
-        if format_type == 'pdf':
-            pdf_file = generate_pdf(data)
-            return send_file(pdf_file, as_attachment=True, 
-                           download_name=f"github_report_{data['repo_info']['name']}.pdf")
-        
-        elif format_type == 'markdown':
-            md_file = generate_markdown(data)
-            return send_file(md_file, as_attachment=True,
-                           download_name=f"github_report_{data['repo_info']['name']}.md")
+        fileobj, size = render_export(data, format_type)
+        return export_response(exporter, data, fileobj, size)
+    except Exception as e:
+        return jsonify({'error': f'导出失败: {str(e)}'}), 500
+
+@app.route('/export/<report_id>/<format_type>')
+def export_stored_report(report_id, format_type):
+    """按report_id导出报告；同一报告同一格式只渲染一次，之后直接返回缓存的文件"""
+    exporter = get_exporter(format_type)
+    if exporter is None:
+        return jsonify({'error': '暂不支持该格式'}), 400
+    
+    report = report_store.get(report_id)
+    if report is None:
+        return jsonify({'error': '报告不存在或已过期'}), 404
+    
+    try:
+        content = report_store.get_artifact(report_id, format_type)
+        if content is not None:
+            return export_response(exporter, report, io.BytesIO(content), len(content))
         
-        else:
-            return jsonify({'error': '暂不支持该格式'}), 400
-            
+        fileobj, size = render_export(report, format_type)
+        if size <= REPORT_STORE_ARTIFACT_MAX_BYTES:
+            report_store.put_artifact(report_id, format_type, fileobj.read())
+            fileobj.seek(0)
+        return export_response(exporter, report, fileobj, size)
     except Exception as e:
         return jsonify({'error': f'导出失败: {str(e)}'}), 500
 
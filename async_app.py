@@ -0,0 +1,682 @@
+# async_app.py - 异步服务模式（Quart + httpx），路由和返回结果与 app.py 保持一致
+# 启动: hypercorn async_app:app --bind 0.0.0.0:5000
+# 同步模式下每个在途分析都占住一个gunicorn worker；异步模式下等待GitHub和LLM时不占用worker，
+# 单个进程即可同时处理上百个分析请求。
+from quart import Quart, render_template, request, jsonify, Response, g
+import asyncio
+import io
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+
+from app import (SmartAIAnalyzer, AnalysisError, REQUEST_TIMEOUT, BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY,
+                 BATCH_MAX_REPOS, BATCH_MAX_QUOTA_WAIT, SSE_KEEPALIVE_INTERVAL, report_cache, build_report,
+                 decode_readme, repo_info_from_payload, validate_repo_url, parse_repo_url, get_llm_analyzer,
+                 sse_event, job_queue, report_store, enricher, parse_latency_budget, start_enrichment,
+                 finish_enrichment, with_trace, batch_loader, parse_depth, add_code_stats, repo_archiver,
+                 build_refreshed_report, watchlist, parse_watch_request, history, record_history,
+                 parse_history_range)
+from utils.ai_analyzer import llm_cache_stats
+from utils.llm_gateway import llm_gateway_stats
+from utils.structured_log import start_request, bind, current_request_id, log_stats
+from utils.metrics import (registry, stage, start_trace, current_trace, end_trace, trace_requested, server_timing,
+                           endpoint_label, http_requests, http_duration, http_in_flight)
+from utils.async_http import async_github_get, get_async_client, close_async_client
+from utils.batch import CALLS_PER_REPO
+from utils.exporters import get_exporter, render_export, iter_chunks
+from utils.github_graphql import GraphQLError, afetch_repos, graphql_enabled, graphql_stats, record_fallback
+from utils.incremental import INCREMENTAL_ANALYSIS, code_unchanged, source_fingerprint, record_refresh, incremental_stats
+from utils.http_session import GITHUB_API_URL, cache_stats, quota_stats, graphql_quota_stats, rate_limiter
+from utils.rate_limiter import RateLimitExceeded
+from utils.report_cache import AsyncSingleFlight, normalize_repo_key
+from utils.report_store import REPORT_STORE_ARTIFACT_MAX_BYTES
+from utils.watchlist import WATCHLIST_SCHEDULER
+
+app = Quart(__name__)
+logger = logging.getLogger('async_app')
+
+GITHUB_HEADERS = {'Accept': 'application/vnd.github.v3+json'}
+report_flight = AsyncSingleFlight()
+registry.register_stats('report_flight', report_flight.stats, counters=('executed', 'coalesced'), gauges=('in_flight',))
+
+
+class AsyncGitHubClient:
+    """GitHubClient 的异步版本，返回值约定相同: (结果, 错误信息)"""
+
+    async def get_repo_info(self, owner, repo_name):
+        api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}"
+        try:
+            with stage('github_repo'):
+                response = await async_github_get(api_url, headers=GITHUB_HEADERS, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return repo_info_from_payload(response.json()), None
+            return None, f"GitHub API错误: {response.status_code} - {response.text}"
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return None, f"获取仓库信息失败: {str(e)}"
+
+    async def get_readme(self, owner, repo_name):
+        readme, error = await self.get_readme_blob(owner, repo_name)
+        return readme['text'], error
+
+    async def get_readme_blob(self, owner, repo_name):
+        api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/readme"
+        try:
+            with stage('github_readme'):
+                response = await async_github_get(api_url, headers=GITHUB_HEADERS, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                readme_data = response.json()
+                return {'text': decode_readme(readme_data), 'sha': readme_data.get('sha')}, None
+            return {'text': "无README", 'sha': None}, None
+        except Exception as e:
+            return {'text': "无README", 'sha': None}, f"获取README失败: {str(e)}"
+
+    async def get_languages(self, owner, repo_name):
+        api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/languages"
+        try:
+            with stage('github_languages'):
+                response = await async_github_get(api_url, headers=GITHUB_HEADERS, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response.json(), None
+            return {}, f"获取语言统计失败: {response.status_code}"
+        except Exception as e:
+            return {}, f"获取语言统计失败: {str(e)}"
+
+    async def get_head_sha(self, owner, repo_name):
+        api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/commits/HEAD"
+        try:
+            with stage('github_head'):
+                response = await async_github_get(api_url, headers={'Accept': 'application/vnd.github.sha'},
+                                                  timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response.text.strip(), None
+            return None, f"获取最新提交失败: {response.status_code}"
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return None, f"获取最新提交失败: {str(e)}"
+
+
+github_client = AsyncGitHubClient()
+
+
+async def _timed_call(coro):
+    start = time.time()
+    value, error = await asyncio.wait_for(coro, timeout=REQUEST_TIMEOUT)
+    return value, error, round(time.time() - start, 3)
+
+
+async def fetch_repo_data_graphql(owner, repo_name, loader=None):
+    """与 app.fetch_repo_data_graphql 相同：一个GraphQL查询取回全部数据，缺少README时用REST补取"""
+    start_time = time.time()
+    with stage('github_graphql'):
+        data = await loader.aload(owner, repo_name, timeout=REQUEST_TIMEOUT) if loader is not None else None
+        if data is None:
+            data = (await afetch_repos([(owner, repo_name)], timeout=REQUEST_TIMEOUT))[(owner, repo_name)]
+    timings = {'graphql': round(time.time() - start_time, 3)}
+    if 'error' in data:
+        timings['fetch_total'] = timings['graphql']
+        return {'repo_info': None, 'readme': "无README", 'languages': {}}, {'repo_info': data['error']}, timings
+
+    results = {'repo_info': repo_info_from_payload(data['repo']), 'readme': data['readme'],
+               'languages': data['languages']}
+    results['source'] = source_fingerprint(results['repo_info'], data['head_sha'], data['readme_sha'])
+    errors = {}
+    if results['readme'] is None:
+        record_fallback('readme')
+        readme, error, timings['readme'] = await _timed_call(github_client.get_readme_blob(owner, repo_name))
+        results['readme'], results['source']['readme_sha'] = readme['text'], readme['sha']
+        if error:
+            errors['readme'] = error
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
+
+
+async def fetch_repo_data(owner, repo_name, loader=None):
+    """获取仓库信息、README和语言统计，GraphQL优先与失败处理均与 app.fetch_repo_data 相同"""
+    if graphql_enabled():
+        try:
+            return await fetch_repo_data_graphql(owner, repo_name, loader)
+        except (GraphQLError, RateLimitExceeded) as e:
+            record_fallback('query')
+            logger.warning("GraphQL获取失败，改用REST接口", extra={'repo': f'{owner}/{repo_name}', 'error': str(e)})
+
+    start_time = time.time()
+    results, errors, timings = await _fetch_concurrently({
+        'repo_info': (github_client.get_repo_info(owner, repo_name), None),
+        'readme': (github_client.get_readme_blob(owner, repo_name), {'text': "无README", 'sha': None}),
+        'languages': (github_client.get_languages(owner, repo_name), {}),
+    }, start_time)
+    readme = results.pop('readme')
+    results['readme'] = readme['text']
+    results['source'] = source_fingerprint(results['repo_info'], readme_sha=readme['sha'])
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
+
+
+async def _fetch_concurrently(calls, start_time):
+    """并发执行 {名称: (协程, 失败时的默认值)}，返回 (结果, 错误, 耗时)"""
+    outcomes = await asyncio.gather(*(_timed_call(coro) for coro, _ in calls.values()), return_exceptions=True)
+
+    results, errors, timings = {}, {}, {}
+    for (name, (_, default)), outcome in zip(calls.items(), outcomes):
+        if isinstance(outcome, RateLimitExceeded):
+            raise outcome
+        if isinstance(outcome, asyncio.TimeoutError):
+            value, error, elapsed = default, f"{name} 请求超时", round(time.time() - start_time, 3)
+        elif isinstance(outcome, Exception):
+            value, error, elapsed = default, f"{name} 请求失败: {str(outcome)}", round(time.time() - start_time, 3)
+        else:
+            value, error, elapsed = outcome
+        results[name] = value if value is not None else default
+        timings[name] = elapsed
+        if error:
+            errors[name] = error
+    return results, errors, timings
+
+
+async def fetch_changes(owner, repo_name, previous_source, loader=None):
+    """增量分析的获取，与 app.fetch_changes 相同：REST按 仓库信息 → HEAD提交 → README和语言统计 逐级检查"""
+    if graphql_enabled():
+        try:
+            return await fetch_repo_data_graphql(owner, repo_name, loader)
+        except (GraphQLError, RateLimitExceeded) as e:
+            record_fallback('query')
+            logger.warning("GraphQL获取失败，改用REST接口", extra={'repo': f'{owner}/{repo_name}', 'error': str(e)})
+
+    start_time = time.time()
+    timings, errors = {}, {}
+    repo_info, error, timings['repo_info'] = await _timed_call(github_client.get_repo_info(owner, repo_name))
+    if error:
+        timings['fetch_total'] = round(time.time() - start_time, 3)
+        return {'repo_info': None}, {'repo_info': error}, timings
+    results = {'repo_info': repo_info, 'source': source_fingerprint(repo_info)}
+    if not code_unchanged(previous_source, results['source']):
+        head_sha, error, timings['head'] = await _timed_call(github_client.get_head_sha(owner, repo_name))
+        results['source']['head_sha'] = head_sha
+        if error:
+            errors['head'] = error
+    if not code_unchanged(previous_source, results['source']):
+        changed, changed_errors, changed_timings = await _fetch_concurrently({
+            'readme': (github_client.get_readme_blob(owner, repo_name), {'text': "无README", 'sha': None}),
+            'languages': (github_client.get_languages(owner, repo_name), {}),
+        }, time.time())
+        results['readme'], results['source']['readme_sha'] = changed['readme']['text'], changed['readme']['sha']
+        results['languages'] = changed['languages']
+        errors.update(changed_errors)
+        timings.update(changed_timings)
+    timings['fetch_total'] = round(time.time() - start_time, 3)
+    return results, errors, timings
+
+
+async def run_analysis(owner, repo_name, loader=None):
+    """执行完整的 获取→分析 流程，返回报告字典"""
+    start_time = time.time()
+    fetched, fetch_errors, timings = await fetch_repo_data(owner, repo_name, loader)
+    if 'repo_info' in fetch_errors:
+        raise AnalysisError(fetch_errors['repo_info'], 400, timings)
+    for name, error in fetch_errors.items():
+        logger.warning(error, extra={'call': name})
+
+    with stage('analysis'):
+        ai_analysis, ai_error = SmartAIAnalyzer().analyze_repo(fetched['repo_info'], fetched['readme'])
+    if ai_error:
+        raise AnalysisError(ai_error, 500)
+    return build_report(fetched, ai_analysis, timings, start_time)
+
+
+async def refresh_report(previous, owner, repo_name, loader=None):
+    """增量分析：只重新获取、计算输入有变化的部分，合并规则与 app.build_refreshed_report 相同"""
+    start_time = time.time()
+    fetched, fetch_errors, timings = await fetch_changes(owner, repo_name, previous.get('source') or {}, loader)
+    if 'repo_info' in fetch_errors:
+        raise AnalysisError(fetch_errors['repo_info'], 400, timings)
+    for name, error in fetch_errors.items():
+        logger.warning(error, extra={'call': name})
+    with stage('analysis'):
+        return build_refreshed_report(previous, fetched, timings, start_time)
+
+
+async def get_report(owner, repo_name, loader=None):
+    """优先读取报告缓存和关注列表预先生成的报告；未命中时合并同一仓库的并发请求"""
+    key = normalize_repo_key(owner, repo_name)
+    cached = report_cache.get(key)
+    if cached is not None:
+        return dict(cached, cache_status='hit')
+    watched = await asyncio.to_thread(watchlist.report, key)
+    if watched is not None:
+        return dict(watched, cache_status='watchlist')
+
+    async def pipeline():
+        previous = await asyncio.to_thread(report_store.latest, key) if INCREMENTAL_ANALYSIS else None
+        if previous is not None and previous.get('source'):
+            result = await refresh_report(previous, owner, repo_name, loader)
+        else:
+            record_refresh('full')
+            result = await run_analysis(owner, repo_name, loader)
+        result = await asyncio.to_thread(record_history, key, result)
+        report_cache.set(key, result)
+        with stage('report_store'):
+            await asyncio.to_thread(report_store.put, result)
+            await asyncio.to_thread(watchlist.store, key, result)
+        return result
+
+    result, shared = await report_flight.do(key, pipeline)
+    return dict(result, cache_status='coalesced' if shared else 'miss')
+
+
+async def analyze_for_batch(repo_url, loader=None):
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        raise AnalysisError(url_error, 400)
+    return await get_report(*parse_repo_url(repo_url), loader)
+
+
+async def stream_analysis_text(repo_info, readme_content):
+    """逐段产出分析文本：已配置LLM时异步流式调用AI，否则按行输出模板分析结果"""
+    llm_analyzer = get_llm_analyzer()
+    if llm_analyzer is not None:
+        async for text in llm_analyzer.analyze_repo_stream_async(repo_info, readme_content, get_async_client()):
+            yield text
+        return
+
+    analysis, error = SmartAIAnalyzer().analyze_repo(repo_info, readme_content)
+    if error:
+        raise RuntimeError(error)
+    for line in analysis.splitlines(keepends=True):
+        yield line
+
+
+@app.after_serving
+async def shutdown():
+    await close_async_client()
+
+
+@app.before_request
+async def start_request_metrics():
+    g.request_start = time.time()
+    g.in_flight_endpoint = endpoint_label(request)
+    http_in_flight.inc(endpoint=g.in_flight_endpoint)
+    start_trace(trace_requested(request.headers))
+    start_request(request.headers.get('X-Request-ID'), debug=trace_requested(request.headers))
+    if WATCHLIST_SCHEDULER:
+        watchlist.start()  # 定期刷新在线程中运行同步的分析流程
+
+
+@app.after_request
+async def record_request_metrics(response):
+    endpoint = endpoint_label(request)
+    http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    http_duration.observe(time.time() - g.request_start, endpoint=endpoint)
+    trace = current_trace()
+    if trace:
+        response.headers['Server-Timing'] = server_timing(trace)
+    response.headers['X-Request-ID'] = current_request_id()
+    return response
+
+
+@app.teardown_request
+async def finish_request_metrics(error=None):
+    endpoint = g.pop('in_flight_endpoint', None)
+    if endpoint is not None:
+        http_in_flight.dec(endpoint=endpoint)
+    end_trace()
+
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+
+@app.route('/analyze', methods=['POST'])
+async def analyze_repo():
+    """分析GitHub仓库 - 异步版本"""
+    data = await request.get_json()
+    repo_url = data.get('repo_url')
+
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        return jsonify({'error': url_error}), 400
+    budget, budget_error = parse_latency_budget(data)
+    if budget_error:
+        return jsonify({'error': budget_error}), 400
+    depth, depth_error = parse_depth(data)
+    if depth_error:
+        return jsonify({'error': depth_error}), 400
+
+    # 异步模式：加入后台队列（与同步模式共用同一个任务队列），立即返回报告ID
+    if data.get('async'):
+        report_id = await asyncio.to_thread(job_queue.submit, {'repo_url': repo_url, 'request_id': current_request_id(),
+                                                               'depth': depth})
+        bind(report_id=report_id)
+        logger.info("已加入分析队列", extra={'repo_url': repo_url})
+        return jsonify({'report_id': report_id, 'status': 'queued',
+                        'status_url': f'/report/{report_id}'}), 202
+
+    try:
+        start_time = time.time()
+        owner, repo_name = parse_repo_url(repo_url)
+        result = await get_report(owner, repo_name)
+        if depth == 'code':
+            # 下载归档和逐块统计都是阻塞操作，在线程中执行
+            result = await asyncio.to_thread(add_code_stats, result)
+
+        # 分级分析：与同步模式共用后台补充分析；等待超时只放弃等待，不取消后台任务
+        future, wait = await asyncio.to_thread(start_enrichment, result, budget - (time.time() - start_time),
+                                               data.get('enrich', True))
+        enriched = None
+        if future is not None and wait > 0:
+            try:
+                enriched = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), wait)
+            except asyncio.TimeoutError:
+                pass
+        result = finish_enrichment(result, future, enriched)
+        bind(report_id=result['report_id'])
+        logger.info("分析完成", extra={'repo_url': repo_url, 'processing_time': result['processing_time'],
+                                       'cache_status': result['cache_status'], 'analysis_tier': result['analysis_tier']})
+        with stage('serialize'):
+            return jsonify(with_trace(result))
+    except RateLimitExceeded as e:
+        return jsonify({'error': str(e), 'retry_after': e.retry_after}), 429, {'Retry-After': str(e.retry_after)}
+    except AnalysisError as e:
+        body = {'error': e.message}
+        if e.timings:
+            body['timings'] = e.timings
+        return jsonify(with_trace(body)), e.status_code
+    except Exception as e:
+        error_msg = f'分析过程中出现错误: {str(e)}'
+        logger.exception(error_msg, extra={'repo_url': repo_url})
+        return jsonify({'error': error_msg}), 500
+
+
+@app.route('/analyze/batch', methods=['POST'])
+async def analyze_batch():
+    """批量分析仓库，每完成一个就以NDJSON流式返回一行结果"""
+    data = await request.get_json() or {}
+    repo_urls = data.get('repo_urls')
+
+    if not isinstance(repo_urls, list) or not repo_urls:
+        return jsonify({'error': '请提供 repo_urls 列表'}), 400
+    if len(repo_urls) > BATCH_MAX_REPOS:
+        return jsonify({'error': f'单次最多分析 {BATCH_MAX_REPOS} 个仓库'}), 400
+    try:
+        concurrency = int(data.get('concurrency', BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency 必须是整数'}), 400
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+    loader = batch_loader(repo_urls)
+
+    async def analyze_one(index, repo_url):
+        async with semaphore:
+            # 提交前确认剩余配额，不足时等待重置（GraphQL模式下配额不足时自动退回REST，不需要检查）
+            if loader is None:
+                available = await asyncio.to_thread(rate_limiter.wait_available, CALLS_PER_REPO, BATCH_MAX_QUOTA_WAIT)
+                if not available:
+                    return {'index': index, 'repo_url': repo_url, 'status': 'error',
+                            'error': 'GitHub API配额不足，请稍后重试'}
+            try:
+                report = await analyze_for_batch(repo_url, loader)
+                return {'index': index, 'repo_url': repo_url, 'status': 'ok', 'report': report}
+            except Exception as e:
+                return {'index': index, 'repo_url': repo_url, 'status': 'error', 'error': str(e)}
+
+    async def generate():
+        tasks = [asyncio.ensure_future(analyze_one(index, url)) for index, url in enumerate(repo_urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + '\n'
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/analyze/stream')
+async def analyze_stream():
+    """流式分析仓库：先推送仓库信息，再通过SSE逐段推送AI生成的报告"""
+    repo_url = request.args.get('repo_url', '').strip()
+    url_error = validate_repo_url(repo_url)
+    if url_error:
+        return jsonify({'error': url_error}), 400
+
+    async def generate():
+        start_time = time.time()
+        owner, repo_name = parse_repo_url(repo_url)
+        try:
+            fetched, fetch_errors, timings = await fetch_repo_data(owner, repo_name)
+        except RateLimitExceeded as e:
+            yield sse_event('analysis_error', {'error': str(e), 'retry_after': e.retry_after})
+            return
+        if 'repo_info' in fetch_errors:
+            yield sse_event('analysis_error', {'error': fetch_errors['repo_info'], 'timings': timings})
+            return
+
+        meta = {
+            'report_id': str(uuid.uuid4())[:8],
+            'repo_info': fetched['repo_info'],
+            'languages': fetched['languages'],
+            'analyzed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timings': timings
+        }
+        meta = await asyncio.to_thread(record_history, normalize_repo_key(owner, repo_name), meta)
+        yield sse_event('meta', meta)
+
+        first_token_time = None
+        analysis_parts = []
+        chunks = stream_analysis_text(fetched['repo_info'], fetched['readme']).__aiter__()
+        pending = None
+        try:
+            while True:
+                pending = pending or asyncio.ensure_future(chunks.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=SSE_KEEPALIVE_INTERVAL)
+                if not done:
+                    yield sse_event('ping', {'elapsed': round(time.time() - start_time, 2)})
+                    continue
+                try:
+                    text = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+                if first_token_time is None:
+                    first_token_time = round(time.time() - start_time, 2)
+                analysis_parts.append(text)
+                yield sse_event('token', {'text': text})
+        except Exception as e:
+            logger.error("AI分析失败", extra={'repo_url': repo_url, 'error': str(e)})
+            yield sse_event('analysis_error', {'error': f'AI分析失败: {str(e)}'})
+            return
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+        processing_time = round(time.time() - start_time, 2)
+        logger.info("流式分析完成", extra={'repo_url': repo_url, 'time_to_first_token': first_token_time,
+                                        'processing_time': processing_time})
+        await asyncio.to_thread(report_store.put, dict(meta, source=fetched['source'],
+                                                       ai_analysis=''.join(analysis_parts),
+                                                       processing_time=processing_time,
+                                                       analysis_tier='llm' if get_llm_analyzer() is not None else 'heuristic'))
+        yield sse_event('done', {
+            'processing_time': processing_time,
+            'time_to_first_token': first_token_time
+        })
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/report/<report_id>')
+async def report_status(report_id):
+    """查询后台分析任务: queued / running / done（含报告） / error"""
+    job = await asyncio.to_thread(job_queue.get, report_id)
+    if job is None:
+        report = await asyncio.to_thread(report_store.get, report_id)
+        if report is None:
+            return jsonify({'error': '报告不存在或已过期'}), 404
+        job = {'report_id': report_id, 'status': 'done', 'result': report}
+    return jsonify(job)
+
+
+@app.route('/watchlist', methods=['GET', 'POST'])
+async def watchlist_entries():
+    """GET 列出关注的仓库及刷新状态；POST 加入或修改关注（repo_url 或 repo_urls，可选 interval 和 depth）"""
+    if request.method == 'GET':
+        try:
+            limit, offset = int(request.args.get('limit', 100)), int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit 和 offset 必须是整数'}), 400
+        return jsonify({'entries': await asyncio.to_thread(watchlist.entries, max(1, min(limit, 1000)), max(0, offset))})
+
+    data = await request.get_json() or {}
+    repo_urls = data.get('repo_urls') or [data.get('repo_url')]
+    if not isinstance(repo_urls, list):
+        return jsonify({'error': '请提供 repo_url 或 repo_urls 列表'}), 400
+    for repo_url in repo_urls:
+        url_error = validate_repo_url(repo_url)
+        if url_error:
+            return jsonify({'error': url_error, 'repo_url': repo_url}), 400
+    interval, depth, error = parse_watch_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    def add_all():
+        return [watchlist.add(normalize_repo_key(*parse_repo_url(repo_url)), repo_url, interval, depth)
+                for repo_url in repo_urls]
+
+    entries = await asyncio.to_thread(add_all)
+    logger.info("已加入关注列表", extra={'repos': len(entries), 'interval': interval})
+    return jsonify({'entries': entries}), 201
+
+
+@app.route('/watchlist/<owner>/<repo_name>', methods=['GET', 'DELETE'])
+async def watched_report(owner, repo_name):
+    """GET 返回关注仓库预先生成的报告，不访问GitHub；DELETE 取消关注"""
+    key = normalize_repo_key(owner, repo_name)
+    if request.method == 'DELETE':
+        if not await asyncio.to_thread(watchlist.remove, key):
+            return jsonify({'error': '仓库不在关注列表中'}), 404
+        return jsonify({'repo': key, 'status': 'removed'})
+
+    report = await asyncio.to_thread(watchlist.report, key)
+    if report is not None:
+        return jsonify(dict(report, cache_status='watchlist'))
+    entry = await asyncio.to_thread(watchlist.get, key)
+    if entry is None:
+        return jsonify({'error': '仓库不在关注列表中'}), 404
+    return jsonify(dict(entry, status='pending')), 202
+
+
+@app.route('/history/<owner>/<repo_name>')
+async def repo_history(owner, repo_name):
+    """仓库星标/Fork/问题数的历史（列式）和增长趋势，只读本地历史，不访问GitHub"""
+    key = normalize_repo_key(owner, repo_name)
+    params, error = parse_history_range(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    trend = await asyncio.to_thread(history.trend, key)
+    if trend['first_seen'] is None:
+        return jsonify({'error': '没有该仓库的历史数据'}), 404
+    series = await asyncio.to_thread(history.range, key, **params)
+    return jsonify({'repo': key, 'points': len(series['ts']), 'series': series, 'trend': trend})
+
+
+@app.route('/health')
+async def health_check():
+    """健康检查端点"""
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'service': 'GitHub Repo AI Analyst',
+        'mode': 'async',
+        'github_cache': cache_stats(),
+        'github_quota': quota_stats(),
+        'github_graphql': dict(graphql_stats(), quota=graphql_quota_stats()),
+        'report_cache': dict(report_cache.stats(), **report_flight.stats()),
+        'llm_cache': await asyncio.to_thread(llm_cache_stats),
+        'llm_gateway': llm_gateway_stats(),
+        'enrichment': enricher.stats(),
+        'jobs': await asyncio.to_thread(job_queue.stats),
+        'report_store': await asyncio.to_thread(report_store.stats),
+        'repo_archive': await asyncio.to_thread(repo_archiver.cache.stats),
+        'watchlist': await asyncio.to_thread(watchlist.stats),
+        'history': await asyncio.to_thread(history.stats),
+        'incremental': incremental_stats(),
+        'log': log_stats()
+    })
+
+
+@app.route('/metrics')
+async def metrics():
+    """Prometheus格式的监控指标（部分统计需要读取SQLite，在线程中生成）"""
+    return Response(await asyncio.to_thread(registry.render), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def export_response(exporter, report, fileobj, size):
+    """按块流式返回导出内容，读取放在线程中进行（大文件可能已转存到磁盘）"""
+    async def generate():
+        chunks = iter_chunks(fileobj)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+
+    return Response(generate(), mimetype=exporter.mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={exporter.filename(report)}',
+                             'Content-Length': str(size)})
+
+
+@app.route('/export/<format_type>', methods=['POST'])
+async def export_report(format_type):
+    """导出客户端提交的报告（渲染在线程中进行，不阻塞事件循环）"""
+    data = await request.get_json()
+
+    exporter = get_exporter(format_type)
+    if exporter is None:
+        return jsonify({'error': '暂不支持该格式'}), 400
+
+    try:
+        fileobj, size = await asyncio.to_thread(render_export, data, format_type)
+        return export_response(exporter, data, fileobj, size)
+    except Exception as e:
+        return jsonify({'error': f'导出失败: {str(e)}'}), 500
+
+
+@app.route('/export/<report_id>/<format_type>')
+async def export_stored_report(report_id, format_type):
+    """按report_id导出报告，复用已缓存的渲染结果"""
+    exporter = get_exporter(format_type)
+    if exporter is None:
+        return jsonify({'error': '暂不支持该格式'}), 400
+
+    report = await asyncio.to_thread(report_store.get, report_id)
+    if report is None:
+        return jsonify({'error': '报告不存在或已过期'}), 404
+
+    try:
+        content = await asyncio.to_thread(report_store.get_artifact, report_id, format_type)
+        if content is not None:
+            return export_response(exporter, report, io.BytesIO(content), len(content))
+
+        fileobj, size = await asyncio.to_thread(render_export, report, format_type)
+        if size <= REPORT_STORE_ARTIFACT_MAX_BYTES:
+            content = await asyncio.to_thread(fileobj.read)
+            fileobj.seek(0)
+            await asyncio.to_thread(report_store.put_artifact, report_id, format_type, content)
+        return export_response(exporter, report, fileobj, size)
+    except Exception as e:
+        return jsonify({'error': f'导出失败: {str(e)}'}), 500
+
+
+if __name__ == '__main__':
+    print("🚀 启动GitHub Repo AI分析师 Web版 (异步模式)")
+    print("📱 请在浏览器中访问: http://localhost:5000")
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,92 @@
+# benchmarks/bench_async.py - 对比同步gunicorn worker与异步hypercorn在上游慢响应时的吞吐量
+# 用法: python -m benchmarks.bench_async [--requests 200] [--concurrency 100] [--latency 0.5] [--workers 4]
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stub_github import StubGitHub
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, env):
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"服务启动失败: {' '.join(command)}")
+
+
+def run_load(port, total, concurrency, prefix):
+    """并发请求 total 个不同仓库（避免命中报告缓存），返回 (成功数, 耗时, 每个请求的延迟)"""
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+    def call(index):
+        start = time.time()
+        response = session.post(f'http://127.0.0.1:{port}/analyze',
+                                json={'repo_url': f'https://github.com/{prefix}/repo{index}'}, timeout=120)
+        return response.status_code, time.time() - start
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(total)))
+    elapsed = time.time() - start
+    return sum(1 for status, _ in results if status == 200), elapsed, sorted(latency for _, latency in results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟GitHub每次调用的延迟（秒）')
+    parser.add_argument('--workers', type=int, default=4, help='两种模式使用相同的进程数')
+    args = parser.parse_args()
+
+    with StubGitHub(latency=args.latency) as stub:
+        env = dict(os.environ, GITHUB_API_URL=stub.base_url, GITHUB_CACHE_BACKEND='none',
+                   ZHIPUAI_API_KEY='', GITHUB_TOKEN='', GITHUB_TOKENS='')
+        servers = {
+            'gunicorn (同步worker)': ['gunicorn', '-w', str(args.workers), 'app:app'],
+            'hypercorn (异步)': ['hypercorn', '-w', str(args.workers), 'async_app:app'],
+        }
+
+        print(f"=== 同步 vs 异步 ({args.requests} 个请求, 并发 {args.concurrency}, "
+              f"上游延迟 {args.latency}s, {args.workers} 个进程) ===")
+        results = {}
+        for name, command in servers.items():
+            port = free_port()
+            bind = ['--bind', f'127.0.0.1:{port}']
+            process = start_server([sys.executable, '-m'] + command + bind, port, env)
+            try:
+                ok, elapsed, latencies = run_load(port, args.requests, args.concurrency, prefix=f'bench{port}')
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+            results[name] = args.requests / elapsed
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{name:<24} 成功 {ok}/{args.requests}  吞吐 {results[name]:7.1f} req/s  "
+                  f"p50 {p50:.2f}s  p95 {p95:.2f}s")
+
+        sync_rps, async_rps = results.values()
+        print(f"异步模式吞吐为同步模式的 {async_rps / sync_rps:.1f} 倍")
+
+
+if __name__ == '__main__':
+    main()
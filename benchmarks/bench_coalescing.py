@@ -0,0 +1,73 @@
+# benchmarks/bench_coalescing.py - 突发并发请求同一仓库时，验证上游只被调用一次
+# 用法: python -m benchmarks.bench_coalescing [--burst 50] [--latency 0.3]
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from benchmarks.stub_github import StubGitHub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--burst', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    with StubGitHub(latency=args.latency) as stub, tempfile.TemporaryDirectory(prefix='bench_coalescing_') as workdir:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'GITHUB_CACHE_BACKEND': 'none',  # 只验证报告层的缓存与合并
+            # 使用空的报告存储等，之前运行留下的报告不会作为增量分析的基线被复用
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+            'WATCHLIST_PATH': os.path.join(workdir, 'watchlist.sqlite3'),
+            'HISTORY_PATH': os.path.join(workdir, 'history.sqlite3'),
+        })
+        import app
+
+        # 统计分析器实际运行次数
+        pipeline_runs = Counter()
+        original = app.SmartAIAnalyzer.analyze_repo
+
+        def counted(self, *args, **kwargs):
+            pipeline_runs['analyzer'] += 1
+            return original(self, *args, **kwargs)
+
+        app.SmartAIAnalyzer.analyze_repo = counted
+
+        statuses = Counter()
+        barrier = threading.Barrier(args.burst)
+
+        def worker():
+            client = app.app.test_client()
+            barrier.wait()
+            response = client.post('/analyze', json={'repo_url': 'https://github.com/Octo/Demo'})
+            statuses[(response.status_code, response.get_json().get('cache_status'))] += 1
+
+        print(f"=== 请求合并基准测试 ({args.burst} 个并发请求, 上游延迟 {args.latency}s) ===")
+        start = time.time()
+        threads = [threading.Thread(target=worker) for _ in range(args.burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+        # 突发结束后再请求一次，应直接命中报告缓存
+        app.app.test_client().post('/analyze', json={'repo_url': 'https://github.com/octo/demo.git'})
+
+        repo_calls = stub.paths['/repos/Octo/Demo']
+        print(f"响应分布: {dict(statuses)}")
+        print(f"上游GitHub调用: {dict(stub.paths)}")
+        print(f"分析器运行次数: {pipeline_runs['analyzer']}")
+        print(f"总耗时: {elapsed:.3f}s")
+        assert repo_calls == 1, f"上游仓库接口被调用了 {repo_calls} 次"
+        assert pipeline_runs['analyzer'] == 1, f"分析流程执行了 {pipeline_runs['analyzer']} 次"
+        print("✅ 突发请求下上游调用保持为 1")
+
+
+if __name__ == '__main__':
+    main()
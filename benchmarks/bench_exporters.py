@@ -0,0 +1,78 @@
+# benchmarks/bench_exporters.py - 测量各导出格式的渲染吞吐量，并与旧的"写临时文件再读回"方式对比
+# 用法: python -m benchmarks.bench_exporters [--seconds 1.0]
+import argparse
+import os
+import tempfile
+import time
+
+from utils.exporters import EXPORTERS, EXPORT_SPOOL_MAX_BYTES, iter_chunks, render_export
+
+
+def make_report(analysis_lines):
+    """构造一份分析文本约有 analysis_lines 行的报告"""
+    lines = ['# 🚀 octo/demo 深度分析报告', '', '## 📊 项目概览']
+    lines += [f"- **第 {i} 条**: 这是一个使用 Python 开发的开源项目，拥有 12,345 个星标" for i in range(analysis_lines)]
+    return {
+        'report_id': 'bench001',
+        'repo_info': {'name': 'demo', 'full_name': 'octo/demo', 'description': 'Benchmark repository',
+                      'language': 'Python', 'stars': 12345, 'forks': 678, 'open_issues': 42,
+                      'created_at': '2020-01-01', 'updated_at': '2024-06-01'},
+        'languages': {'Python': 80000},
+        'ai_analysis': '\n'.join(lines),
+        'analyzed_at': '2024-06-01 12:00:00',
+    }
+
+
+def measure(func, seconds):
+    """在 seconds 秒内重复调用 func，返回 (每秒次数, 最后一次的字节数)"""
+    count, size = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        size = func()
+        count += 1
+    return count / (time.perf_counter() - start), size
+
+
+def export_in_memory(report, format_type):
+    """新的导出方式：渲染到内存缓冲区并按块读出"""
+    fileobj, size = render_export(report, format_type)
+    sent = sum(len(chunk) for chunk in iter_chunks(fileobj))
+    assert sent == size
+    return size
+
+
+def export_via_temp_file(report, format_type):
+    """旧的导出方式：写入 NamedTemporaryFile，再由 send_file 从磁盘读回（旧版不会删除该文件，这里删除以免污染磁盘）"""
+    fileobj, _ = render_export(report, format_type)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.' + EXPORTERS[format_type].extension)
+    with temp_file:
+        temp_file.write(fileobj.read())
+    fileobj.close()
+    with open(temp_file.name, 'rb') as f:
+        size = sum(len(chunk) for chunk in iter(lambda: f.read(64 * 1024), b''))
+    os.remove(temp_file.name)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=1.0, help='每项测量的持续时间')
+    args = parser.parse_args()
+
+    reports = {'普通报告': make_report(20), '大报告': make_report(20000)}
+    print(f"=== 导出吞吐量 (内存缓冲上限 {EXPORT_SPOOL_MAX_BYTES // 1024} KB，超出后转存临时文件) ===")
+    print(f"{'格式':<10}{'报告':<10}{'大小':>12}{'内存 次/秒':>14}{'临时文件 次/秒':>18}{'内存 MB/s':>12}")
+    for format_type in EXPORTERS:
+        for label, report in reports.items():
+            if format_type == 'pdf' and label == '大报告':
+                seconds = max(args.seconds, 2.0)  # fpdf渲染大文档较慢，多测一会儿
+            else:
+                seconds = args.seconds
+            memory_rate, size = measure(lambda: export_in_memory(report, format_type), seconds)
+            disk_rate, _ = measure(lambda: export_via_temp_file(report, format_type), seconds)
+            print(f"{format_type:<10}{label:<10}{size / 1024:>10.1f}KB{memory_rate:>14.1f}{disk_rate:>18.1f}"
+                  f"{memory_rate * size / 1024 / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
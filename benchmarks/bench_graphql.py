@@ -0,0 +1,74 @@
+# benchmarks/bench_graphql.py - 获取仓库数据的GitHub请求数：REST（每个仓库3个接口）对比GraphQL（单个查询/批量查询）
+# 用法: python -m benchmarks.bench_graphql [--repos 60] [--concurrency 4] [--latency 0.05]
+#       同时检查GraphQL失败时退回REST、以及两条路径生成的报告内容一致
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureGitHub
+
+FIXTURES = ('tinyhttp', 'datapipe', 'zh-notes', 'megaframework', 'noreadme')
+
+
+def comparable(repo_url, report):
+    """去掉每次分析都会变化的字段，仓库名换回fixture名，便于比较两条路径的结果"""
+    analysis = '\n'.join(line for line in report['ai_analysis'].splitlines() if '分析时间' not in line)
+    name = repo_url.rsplit('/', 1)[1]
+    text = json.dumps([report['repo_info'], report['languages'], analysis], ensure_ascii=False, sort_keys=True)
+    return text.replace(name, name.rsplit('-', 1)[0])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05, help='桩服务器每个请求的固定延迟（秒）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_graphql_')
+    with FixtureGitHub(latency=args.latency) as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'GITHUB_FETCH_MODE': 'graphql',
+            'LLM_BACKEND': 'fake',
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        })
+        import app
+        from utils import github_graphql
+
+        client = app.app.test_client()
+
+        def run(label, mode, suffix, batch):
+            github_graphql.GITHUB_FETCH_MODE = mode
+            stub.stats.clear()
+            urls = [f'https://github.com/bench/{FIXTURES[i % len(FIXTURES)]}-{suffix}{i}' for i in range(args.repos)]
+            start = time.perf_counter()
+            if batch:
+                response = client.post('/analyze/batch', json={'repo_urls': urls, 'concurrency': args.concurrency})
+                reports = {item['repo_url']: item['report'] for item in map(json.loads, response.get_data(as_text=True).splitlines())
+                           if item['status'] == 'ok'}
+            else:
+                reports = {url: client.post('/analyze', json={'repo_url': url, 'enrich': False}).get_json() for url in urls}
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {stub.stats['requests']} 个GitHub请求（{stub.stats['requests'] / args.repos:.2f}/仓库, "
+                  f"GraphQL查询 {stub.stats['graphql_queries']}）  成功 {len(reports)}/{args.repos}  耗时 {elapsed:.2f}s")
+            return {index: comparable(url, reports[url]) for index, url in enumerate(urls) if url in reports}
+
+        print(f"=== 获取 {args.repos} 个仓库（桩服务器延迟 {args.latency * 1000:.0f} ms/请求） ===")
+        rest = run("REST   逐个 /analyze", 'rest', 'r', batch=False)
+        graphql = run("GraphQL 逐个 /analyze", 'graphql', 'g', batch=False)
+        run("REST   /analyze/batch", 'rest', 'rb', batch=True)
+        run(f"GraphQL /analyze/batch（每个查询 {github_graphql.GRAPHQL_BATCH_SIZE} 个仓库）", 'graphql', 'gb', batch=True)
+        print(f"两条路径的报告内容一致: {rest == graphql}")
+
+        # GraphQL接口出错时每个仓库退回3个REST请求
+        stub.graphql_status = 502
+        run("GraphQL 出错时退回REST", 'graphql', 'f', batch=False)
+        print(f"GraphQL统计: {github_graphql.graphql_stats()}")
+
+
+if __name__ == '__main__':
+    main()
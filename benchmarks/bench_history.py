@@ -0,0 +1,136 @@
+# benchmarks/bench_history.py - 指标历史：向列式历史存储写入数百万个数据点，统计追加和范围查询的延迟、
+# 每个数据点占用的空间（与每个点一行的SQLite表对比），以及降采样前后的数据量和查询延迟
+# 用法: python -m benchmarks.bench_history [--repos 100] [--points 20000] [--step 1800]
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from utils.history import MetricHistory
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summary(latencies):
+    return f"p50 {statistics.median(latencies) * 1000:.3f} ms  p99 {percentile(latencies, 0.99) * 1000:.3f} ms"
+
+
+def file_size(path):
+    """检查点之后数据库文件的大小（字节）"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return os.path.getsize(path)
+
+
+def query_latencies(query, repos, queries, rng):
+    latencies, points = [], 0
+    for _ in range(queries):
+        repo = rng.choice(repos)
+        t0 = time.perf_counter()
+        points += query(repo)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, points / queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--points', type=int, default=20000, help='每个仓库的数据点数')
+    parser.add_argument('--step', type=int, default=1800, help='相邻两次观察的间隔（秒）')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_history_')
+    path = os.path.join(workdir, 'history.sqlite3')
+    history = MetricHistory(path)
+    history._last_compact = float('inf')  # 写入期间不降采样，单独统计
+    rng = random.Random(0)
+    repos = [f'owner{i}/repo{i}' for i in range(args.repos)]
+    now = time.time()
+    first = now - args.points * args.step
+    total = args.repos * args.points
+    print(f"=== 写入 {total:,} 个数据点（{args.repos} 个仓库 × {args.points} 次观察，间隔 {args.step}s，"
+          f"覆盖 {args.points * args.step / 86400:.0f} 天） ===")
+
+    # 对比用：每个数据点一行、按 (仓库, 时间) 建索引的表
+    naive_path = os.path.join(workdir, 'naive.sqlite3')
+    naive = sqlite3.connect(naive_path)
+    naive.execute('PRAGMA journal_mode=WAL')
+    naive.execute('CREATE TABLE points (repo TEXT NOT NULL, ts INTEGER NOT NULL, stars INTEGER NOT NULL, '
+                  'forks INTEGER NOT NULL, open_issues INTEGER NOT NULL)')
+    naive.execute('CREATE INDEX points_repo_ts ON points (repo, ts)')
+
+    values = {repo: [rng.randint(0, 50000), rng.randint(0, 5000), rng.randint(0, 500)] for repo in repos}
+    latencies = []
+    for i in range(args.points):
+        ts = int(first + i * args.step)
+        naive_rows = []
+        for repo in repos:
+            counts = values[repo]
+            counts[0] += rng.randint(0, 5)
+            counts[1] += rng.random() < 0.2
+            counts[2] = max(0, counts[2] + rng.randint(-1, 1))
+            info = {'stars': counts[0], 'forks': counts[1], 'open_issues': counts[2]}
+            t0 = time.perf_counter()
+            history.append(repo, ts, info)
+            latencies.append(time.perf_counter() - t0)
+            naive_rows.append((repo, ts, *counts))
+        with naive:
+            naive.executemany('INSERT INTO points VALUES (?, ?, ?, ?, ?)', naive_rows)
+    print(f"追加: {summary(latencies)}  吞吐 {total / sum(latencies):,.0f} 点/秒（单线程，每次追加一个事务）")
+
+    stats = history.stats()
+    size, naive_size = file_size(path), file_size(naive_path)
+    print("\n=== 空间占用 ===")
+    print(f"列式历史: 文件 {size / 2 ** 20:7.1f} MiB  {size / total:5.1f} 字节/点  （{stats['chunks']} 个数据块，"
+          f"列数据 {stats['bytes'] / total:.1f} 字节/点）")
+    print(f"每点一行: 文件 {naive_size / 2 ** 20:7.1f} MiB  {naive_size / total:5.1f} 字节/点")
+
+    def naive_range(repo, start=0):
+        rows = naive.execute('SELECT ts, stars, forks, open_issues FROM points WHERE repo = ? AND ts >= ? ORDER BY ts',
+                             (repo, start)).fetchall()
+        return len(rows)
+
+    print(f"\n=== 范围查询（随机仓库，{args.queries} 次） ===")
+    for label, query in (
+        ("近30天", lambda repo: len(history.range(repo, now - 30 * 86400, now)['ts'])),
+        ("全部历史", lambda repo: len(history.range(repo)['ts'])),
+        ("全部历史 max_points=500", lambda repo: len(history.range(repo, max_points=500)['ts'])),
+        ("增长趋势 trend()", lambda repo: history.trend(repo, now)['observations']),
+        ("对比 每点一行 近30天", lambda repo: naive_range(repo, now - 30 * 86400)),
+        ("对比 每点一行 全部历史", naive_range),
+    ):
+        latencies, points = query_latencies(query, repos, args.queries, rng)
+        print(f"{label:<24}: {summary(latencies)}  平均 {points:,.0f} 个点")
+
+    print("\n=== 降采样（原始数据保留7天，每小时数据保留90天） ===")
+    compacted, start = -1, time.perf_counter()
+    while compacted != history.stats()['compacted_chunks']:
+        compacted = history.stats()['compacted_chunks']
+        history._last_compact = 0
+        history._compact()
+    elapsed = time.perf_counter() - start
+    after = history.stats()
+    size = file_size(path)
+    print(f"降采样 {after['compacted_chunks']} 个数据块用时 {elapsed:.1f}s: 数据点 {stats['points']:,} -> {after['points']:,}  "
+          f"数据块 {stats['chunks']} -> {after['chunks']}  文件（VACUUM前） {size / 2 ** 20:.1f} MiB")
+    for label, query in (
+        ("近30天", lambda repo: len(history.range(repo, now - 30 * 86400, now)['ts'])),
+        ("全部历史", lambda repo: len(history.range(repo)['ts'])),
+        ("增长趋势 trend()", lambda repo: history.trend(repo, now)['observations']),
+    ):
+        latencies, points = query_latencies(query, repos, args.queries, rng)
+        print(f"{label:<24}: {summary(latencies)}  平均 {points:,.0f} 个点")
+    repo = repos[0]
+    print(f"{repo} 的增长趋势: {history.trend(repo, now)['changes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_http_pool.py - 对比每次新建连接与共享连接池的开销
+# 用法: python -m benchmarks.bench_http_pool [--requests 200] [--threads 8] [--no-tls]
+import argparse
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib3.exceptions import InsecureRequestWarning
+
+from benchmarks.stub_github import StubGitHub
+from utils.http_session import create_session
+
+
+def run(get, url, total, threads):
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: get(url, timeout=10, verify=False).status_code, range(total)))
+    return time.time() - start
+
+
+def bench(label, get, total, threads, tls):
+    with StubGitHub(tls=tls) as stub:
+        url = f"{stub.base_url}/repos/octo/demo"
+        elapsed = run(get, url, total, threads)
+        print(f"{label:<16} 请求数: {stub.stats['requests']:<5} 新建连接: {stub.stats['connections']:<5} "
+              f"总耗时: {elapsed:.3f}s  平均: {elapsed / total * 1000:.2f}ms")
+        return stub.stats['connections'], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--no-tls', action='store_true')
+    args = parser.parse_args()
+    tls = not args.no_tls
+    warnings.simplefilter('ignore', InsecureRequestWarning)
+
+    print(f"=== 连接池基准测试 ({'HTTPS' if tls else 'HTTP'}, {args.requests} 请求, {args.threads} 线程) ===")
+    plain_conns, plain_time = bench('requests.get', requests.get, args.requests, args.threads, tls)
+    session = create_session(pool_size=args.threads)
+    pooled_conns, pooled_time = bench('共享Session', session.get, args.requests, args.threads, tls)
+
+    print(f"连接数减少: {plain_conns} → {pooled_conns}，耗时缩短 {(1 - pooled_time / plain_time) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
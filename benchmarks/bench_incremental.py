@@ -0,0 +1,82 @@
+# benchmarks/bench_incremental.py - 增量分析：模拟每晚刷新一批已分析过的仓库（少数有新提交、个别修改了README），
+# 对比增量分析与完整重新分析发出的GitHub请求数和LLM调用数
+# 用法: python -m benchmarks.bench_incremental [--repos 100] [--pushed 0.1] [--readme 0.03] [--starred 0.3]
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureGitHub
+
+FIXTURES = ('tinyhttp', 'datapipe', 'zh-notes', 'megaframework', 'noreadme')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--pushed', type=float, default=0.1, help='有新提交（README不变）的仓库比例')
+    parser.add_argument('--readme', type=float, default=0.03, help='修改了README的仓库比例')
+    parser.add_argument('--starred', type=float, default=0.3, help='只有星标数变化的仓库比例')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_incremental_')
+    with FixtureGitHub() as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'GITHUB_FETCH_MODE': 'rest',
+            'LLM_BACKEND': 'fake',
+            'ZHIPUAI_API_KEY': 'stub.key',
+            'LLM_CACHE_ENABLED': 'false',  # 只统计增量分析本身省下的LLM调用
+            'LLM_FAKE_LATENCY': '0.05',
+            'LLM_FAKE_TOKENS_PER_SECOND': '0',
+            'GITHUB_CACHE_FRESH': '0',  # 隔夜刷新时GitHub响应缓存早已过了直接命中的时间，每次都要重新验证
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+            'LOG_LEVEL': 'WARNING',
+        })
+        import app
+        from utils import github_graphql
+        from utils.llm_gateway import llm_gateway_stats
+
+        client = app.app.test_client()
+
+        def refresh(label, urls, incremental):
+            app.INCREMENTAL_ANALYSIS = incremental
+            app.report_cache._entries.clear()  # 模拟报告缓存已过期（隔夜）
+            stub.stats.clear()
+            llm_before = llm_gateway_stats().get('completed', 0)
+            start = time.perf_counter()
+            for url in urls:
+                response = client.post('/analyze', json={'repo_url': url, 'latency_budget': 60})
+                assert response.status_code == 200, response.get_json()
+            elapsed = time.perf_counter() - start
+            llm_calls = llm_gateway_stats().get('completed', 0) - llm_before
+            print(f"{label}: GitHub请求 {stub.stats['requests']:4d}（{stub.stats['requests'] / len(urls):.2f}/仓库, "
+                  f"其中304 {stub.stats['not_modified']}）  LLM调用 {llm_calls:3d}  耗时 {elapsed:.2f}s")
+            return stub.stats['requests'], llm_calls
+
+        for mode in ('rest', 'graphql'):
+            github_graphql.GITHUB_FETCH_MODE = mode
+            urls = [f'https://github.com/nightly-{mode}/{FIXTURES[i % len(FIXTURES)]}-{i}' for i in range(args.repos)]
+            print(f"=== {mode.upper()}: {args.repos} 个仓库 ===")
+            refresh("首次分析", urls, incremental=True)
+
+            rng = random.Random(0)
+            names = [url.rsplit('/', 2)[1:] for url in urls]
+            for owner, repo in rng.sample(names, int(args.repos * args.pushed)):
+                stub.push(owner, repo)
+            for owner, repo in rng.sample(names, int(args.repos * args.readme)):
+                stub.push(owner, repo, readme=True)
+            for owner, repo in rng.sample(names, int(args.repos * args.starred)):
+                stub.star(owner, repo, rng.randint(1, 50))
+
+            requests_incremental, llm_incremental = refresh("隔夜刷新（增量分析）", urls, incremental=True)
+            requests_full, llm_full = refresh("隔夜刷新（完整重新分析）", urls, incremental=False)
+            print(f"增量分析节省: GitHub请求 {1 - requests_incremental / requests_full:.0%}, "
+                  f"LLM调用 {1 - llm_incremental / max(llm_full, 1):.0%}")
+        print(f"增量分析统计: {app.incremental_stats()}")
+
+
+if __name__ == '__main__':
+    main()
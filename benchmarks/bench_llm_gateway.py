@@ -0,0 +1,102 @@
+# benchmarks/bench_llm_gateway.py - 用本地LLM桩服务器验证LLM网关：并发上限、连接复用、429/5xx重试和截止时间
+# 用法: python -m benchmarks.bench_llm_gateway
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from benchmarks.stub_llm import StubLLM
+from utils.llm_backends import ZhipuBackend
+from utils.llm_gateway import LLMGateway, LLMTimeout
+
+
+def messages(i):
+    return [{'role': 'user', 'content': f'prompt {i}'}]
+
+
+def scenario_concurrency_limit():
+    print("\n[1] 40个并发调用，网关并发上限4，每次生成0.2秒")
+    with StubLLM(llm_latency=0.2) as stub:
+        gateway = LLMGateway(ZhipuBackend('stub.key', base_url=stub.base_url), max_concurrency=4)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            replies = list(pool.map(lambda i: gateway.complete(messages(i), model='glm-4'), range(40)))
+        elapsed = time.time() - start
+        stats = gateway.stats()
+        print(f"    成功: {len(replies)}  桩服务器同时处理的最大调用数: {stub.stats['llm_max_active']}  "
+              f"建立的连接数: {stub.stats['connections']}  耗时: {elapsed:.2f}s")
+        print(f"    排队等待直方图: {stats['queue_wait']}")
+        assert stub.stats['llm_max_active'] <= 4
+        assert stub.stats['connections'] <= 4, "连接应当被复用"
+        assert elapsed >= 1.9
+
+
+def scenario_retry():
+    print("\n[2] 前三次调用依次返回 429、503、502，网关应带抖动重试后成功")
+    with StubLLM(llm_latency=0.05) as stub:
+        gateway = LLMGateway(ZhipuBackend('stub.key', base_url=stub.base_url), backoff=0.1)
+        stub.fail_next(429, 503, 502)
+        reply = gateway.complete(messages(0), model='glm-4')
+        print(f"    回答: {reply[:12]}...  桩服务器收到调用: {stub.stats['llm_calls']}  网关重试: {gateway.stats()['retries']}")
+        assert stub.stats['llm_calls'] == 4 and gateway.stats()['retries'] == 3
+
+        stub.fail_next(400)
+        try:
+            gateway.complete(messages(1), model='glm-4')
+            raise AssertionError("400不应重试并且应当抛出异常")
+        except Exception as e:
+            print(f"    400错误不重试，直接抛出: {type(e).__name__}")
+
+
+def scenario_deadline():
+    print("\n[3] 生成需要2秒，截止时间0.5秒：排队中的和进行中的调用都应按时失败")
+    with StubLLM(llm_latency=2.0) as stub:
+        gateway = LLMGateway(ZhipuBackend('stub.key', base_url=stub.base_url), max_concurrency=1)
+
+        def call(i):
+            start = time.time()
+            try:
+                gateway.complete(messages(i), deadline=gateway.deadline(0.5), model='glm-4')
+                return 'ok', time.time() - start
+            except LLMTimeout:
+                return 'timeout', time.time() - start
+            except Exception as e:
+                return type(e).__name__, time.time() - start
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(call, range(3)))
+        print(f"    结果: {[(kind, round(elapsed, 2)) for kind, elapsed in results]}")
+        assert all(kind != 'ok' and elapsed < 1.0 for kind, elapsed in results)
+
+
+def scenario_async_stream():
+    print("\n[4] 异步流式调用与同步调用共用并发上限，并在首段内容前重试")
+    with StubLLM(llm_latency=0.2) as stub:
+        gateway = LLMGateway(ZhipuBackend('stub.key', base_url=stub.base_url), max_concurrency=2, backoff=0.05)
+        stub.fail_next(503)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                async def one(i):
+                    return ''.join([text async for text in gateway.stream_async(messages(i), client, model='glm-4')])
+                return await asyncio.gather(*(one(i) for i in range(6)))
+
+        start = time.time()
+        replies = asyncio.run(run())
+        print(f"    成功: {len(replies)}  最大并发: {stub.stats['llm_max_active']}  耗时: {time.time() - start:.2f}s  "
+              f"网关统计: { {k: v for k, v in gateway.stats().items() if k not in ('latency', 'queue_wait')} }")
+        assert all(replies) and stub.stats['llm_max_active'] <= 2
+
+
+def main():
+    print("=== LLM网关测试 ===")
+    scenario_concurrency_limit()
+    scenario_retry()
+    scenario_deadline()
+    scenario_async_stream()
+    print("\n✅ 所有场景通过")
+
+
+if __name__ == '__main__':
+    main()
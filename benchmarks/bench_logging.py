@@ -0,0 +1,139 @@
+# benchmarks/bench_logging.py - 每个请求的日志开销：原来的 print（无缓冲stdout，逐行同步写）对比异步队列的结构化日志
+# 用法: python -m benchmarks.bench_logging [--requests 20000] [--threads 16] [--sink file|pipe] [--pipe-rate 256]
+#       --sink pipe 时stdout是一个按 --pipe-rate KB/s 读取的管道，模拟跟不上的日志采集进程
+import argparse
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from utils.structured_log import AsyncLogHandler, JsonFormatter, SampledDebugFilter, bind, log_debug, start_request
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# 慢速读取管道并统计字节数的子进程
+SLOW_READER = """
+import sys, time
+rate, total = float(sys.argv[1]) * 1024, 0
+while True:
+    chunk = sys.stdin.buffer.read1(4096)
+    if not chunk:
+        break
+    total += len(chunk)
+    time.sleep(len(chunk) / rate)
+print(total)
+"""
+
+
+class Sink:
+    """与gunicorn下常见的 PYTHONUNBUFFERED=1 相同：每次write直接写到文件描述符"""
+
+    def __init__(self, kind, path, pipe_rate):
+        self.reader = None
+        if kind == 'pipe':
+            self.reader = subprocess.Popen([sys.executable, '-c', SLOW_READER, str(pipe_rate)],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            raw = self.reader.stdin
+        else:
+            raw = open(path, 'wb', buffering=0)
+        self.path = path
+        self.stream = io.TextIOWrapper(raw, encoding='utf-8', write_through=True)
+
+    def close(self):
+        """关闭并返回写出的字节数"""
+        self.stream.close()
+        if self.reader is not None:
+            total = int(self.reader.stdout.read())
+            self.reader.wait()
+            return total
+        return os.path.getsize(self.path)
+
+
+def print_request(stream, index):
+    """原来每个 /analyze 请求输出的几行"""
+    repo_url = f'https://github.com/bench/repo{index}'
+    print(f"🔄 开始分析: {repo_url}", file=stream)
+    print(f"🔍 请求GitHub API: https://api.github.com/repos/bench/repo{index}", file=stream)
+    print(f"✅ 分析完成: {repo_url} (耗时: 0.12s, 缓存: miss, 分析: heuristic)", file=stream)
+
+
+def log_request(logger, index):
+    """现在的写法：两条按请求抽样的DEBUG日志和一条带字段的INFO日志"""
+    repo_url = f'https://github.com/bench/repo{index}'
+    start_request()
+    log_debug(logger, "开始分析", repo_url=repo_url)
+    log_debug(logger, "请求GitHub API", url=f'https://api.github.com/repos/bench/repo{index}')
+    bind(report_id=f'{index:08x}')
+    logger.info("分析完成", extra={'repo_url': repo_url, 'processing_time': 0.12, 'cache_status': 'miss',
+                                   'analysis_tier': 'heuristic'})
+
+
+def run(emit, requests, threads):
+    """多个线程同时模拟请求，返回 (每个请求在请求线程中的耗时列表, 总耗时)"""
+    latencies = [[] for _ in range(threads)]
+
+    def worker(slot):
+        for index in range(slot, requests, threads):
+            start = time.perf_counter()
+            emit(index)
+            latencies[slot].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return [latency for slot in latencies for latency in slot], time.perf_counter() - start
+
+
+def report(label, latencies, elapsed, requests, size):
+    print(f"{label}: 平均 {sum(latencies) / len(latencies) * 1e6:.1f} µs/请求  p99 {percentile(latencies, 0.99) * 1e6:.1f} µs  "
+          f"max {max(latencies) * 1000:.1f} ms  总耗时 {elapsed:.2f}s  输出 {size / requests:.0f} 字节/请求")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--debug-sample-rate', type=float, default=0.0)
+    parser.add_argument('--sink', choices=('file', 'pipe'), default='file')
+    parser.add_argument('--pipe-rate', type=float, default=256, help='管道读取速度（KB/s）')
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_logging_')
+    sink_label = '文件' if args.sink == 'file' else f'{args.pipe_rate:.0f} KB/s 的管道'
+    print(f"=== 每请求日志开销 ({args.requests} 个请求, {args.threads} 个线程, 输出到{sink_label}) ===")
+
+    sink = Sink(args.sink, os.path.join(workdir, 'print.log'), args.pipe_rate)
+    latencies, elapsed = run(lambda index: print_request(sink.stream, index), args.requests, args.threads)
+    report("print（之前）", latencies, elapsed, args.requests, sink.close())
+
+    import utils.structured_log as structured_log
+    structured_log.LOG_DEBUG_SAMPLE_RATE = args.debug_sample_rate
+    sink = Sink(args.sink, os.path.join(workdir, 'json.log'), args.pipe_rate)
+    handler = AsyncLogHandler(sink.stream)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SampledDebugFilter(logging.INFO))
+    logger = logging.getLogger('bench_logging')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    latencies, elapsed = run(lambda index: log_request(logger, index), args.requests, args.threads)
+    drain_start = time.perf_counter()
+    handler.flush()
+    handler.close()
+    drain = time.perf_counter() - drain_start
+    report(f"异步JSON日志（之后，DEBUG抽样 {args.debug_sample_rate:.0%}）", latencies, elapsed, args.requests, sink.close())
+    print(f"    请求结束后写线程又用了 {drain:.2f}s 写完积压的日志；队列满丢弃 {handler.dropped} 条（上限 LOG_QUEUE_SIZE={handler.maxsize}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_metrics.py - 分阶段计时与 /metrics 的开销：stage() 单次耗时、抽样开关对缓存命中请求的影响、指标输出耗时
+# 用法: python -m benchmarks.bench_metrics [--requests 2000]
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureGitHub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_metrics_')
+    with FixtureGitHub() as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'LLM_BACKEND': 'fake',
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        })
+        import app
+        from utils import metrics
+
+        print("=== 分阶段计时开销 ===")
+        iterations = 100000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with metrics.stage('bench'):
+                pass
+        print(f"stage(): {(time.perf_counter() - start) / iterations * 1e6:.2f} µs/次（未抽样）")
+        metrics.start_trace(force=True)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with metrics.stage('bench'):
+                pass
+        metrics.end_trace()
+        print(f"stage(): {(time.perf_counter() - start) / iterations * 1e6:.2f} µs/次（记入trace）")
+
+        # 缓存命中的 /analyze 几乎只剩框架和计时本身的开销，最能体现抽样比例的影响
+        client = app.app.test_client()
+        body = {'repo_url': 'https://github.com/bench/tinyhttp', 'enrich': False}
+        client.post('/analyze', json=body)
+        for rate in (0.0, 0.1, 1.0):
+            metrics.METRICS_TRACE_SAMPLE_RATE = rate
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                response = client.post('/analyze', json=body)
+            elapsed = time.perf_counter() - start
+            print(f"/analyze 缓存命中, 抽样 {rate:.0%}: {elapsed / args.requests * 1000:.3f} ms/请求, "
+                  f"trace={'trace' in response.get_json()}")
+
+        start = time.perf_counter()
+        text = client.get('/metrics').get_data(as_text=True)
+        print(f"/metrics: {(time.perf_counter() - start) * 1000:.1f} ms, {len(text.splitlines())} 行")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_offline.py - 完全离线的端到端压测：GitHub桩服务器 + 本地模拟LLM后端（LLM_BACKEND=fake）
+# 用法: python -m benchmarks.bench_offline [--requests 100] [--concurrency 20] [--llm-latency 0.3]
+#                                          [--tokens-per-second 200] [--error-rate 0.1] [--budget 60]
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_github import StubGitHub
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--github-latency', type=float, default=0.05, help='模拟GitHub每次调用的延迟（秒）')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='模拟LLM返回第一段内容前的等待（秒）')
+    parser.add_argument('--tokens-per-second', type=float, default=200)
+    parser.add_argument('--error-rate', type=float, default=0.1, help='模拟LLM每次调用返回429/503的概率')
+    parser.add_argument('--budget', type=float, default=60, help='/analyze 的延迟预算；足够大时每个响应都包含LLM分析')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_offline_')
+    with StubGitHub(latency=args.github_latency) as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'LLM_BACKEND': 'fake',
+            'LLM_FAKE_LATENCY': str(args.llm_latency),
+            'LLM_FAKE_TOKENS_PER_SECOND': str(args.tokens_per_second),
+            'LLM_FAKE_ERROR_RATE': str(args.error_rate),
+            'LLM_RETRY_BACKOFF': '0.05',
+            'LLM_CACHE_ENABLED': 'false',
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        })
+        import app
+
+        def call(index):
+            client = app.app.test_client()
+            start = time.time()
+            response = client.post('/analyze', json={'repo_url': f'https://github.com/offline/repo{index}',
+                                                     'latency_budget': args.budget})
+            body = response.get_json()
+            return response.status_code, body.get('analysis_tier'), time.time() - start
+
+        call('warmup')
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(call, range(args.requests)))
+        elapsed = time.time() - start
+
+        latencies = [latency for _, _, latency in results]
+        outcomes = Counter((status, tier) for status, tier, _ in results)
+        gateway = app.get_llm_gateway().stats()
+        print(f"=== 离线端到端压测 ({args.requests} 个请求, 并发 {args.concurrency}, LLM首段 {args.llm_latency}s, "
+              f"{args.tokens_per_second:.0f} tokens/s, 错误率 {args.error_rate:.0%}) ===")
+        print(f"吞吐量: {args.requests / elapsed:.1f} req/s   耗时: {elapsed:.2f}s")
+        print(f"延迟: p50 {percentile(latencies, 0.5):.3f}s  p95 {percentile(latencies, 0.95):.3f}s  "
+              f"p99 {percentile(latencies, 0.99):.3f}s  max {max(latencies):.3f}s")
+        print(f"结果: {dict(outcomes)}")
+        print(f"LLM网关: 完成 {gateway['completed']}  失败 {gateway['errors']}  重试 {gateway['retries']}  "
+              f"超时 {gateway['timeouts']}  最大排队等待 ≤{max_bucket(gateway['queue_wait'])}s")
+        assert all(status == 200 for status, _, _ in results)
+
+
+def max_bucket(histogram):
+    """直方图中覆盖全部样本的最小上界"""
+    for key, count in histogram.items():
+        if key.startswith('le_') and count == histogram['count']:
+            return key[3:]
+    return 'inf'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_rate_limit.py - 用会返回 X-RateLimit-* 头的本地桩服务器验证配额调度器
+# 用法: python -m benchmarks.bench_rate_limit
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_github import StubGitHub
+
+os.environ['GITHUB_CACHE_BACKEND'] = 'none'  # 每次调用都真实访问桩服务器
+
+from utils import http_session
+from utils.rate_limiter import GitHubRateLimiter, RateLimitExceeded
+
+
+def fire(base_url, total, threads):
+    """并发发出 total 次调用，返回 (成功数, 限流异常数, 耗时)"""
+    def call(_):
+        try:
+            return http_session.github_get(f"{base_url}/repos/octo/demo", timeout=10).status_code
+        except RateLimitExceeded:
+            return 'limited'
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(call, range(total)))
+    return results.count(200), results.count('limited'), time.time() - start
+
+
+def scenario_single_token_exhaustion():
+    print("\n[1] 单令牌: 每窗口30次、3秒后重置，并发发出60次调用")
+    with StubGitHub(rate_limit=30, reset_after=3) as stub:
+        http_session.rate_limiter = GitHubRateLimiter(['token-a'])
+        ok, limited, elapsed = fire(stub.base_url, 60, 8)
+        print(f"    成功: {ok}  调度器拒绝: {limited}  GitHub返回403: {stub.stats['rate_limited']}  耗时: {elapsed:.2f}s")
+        assert ok == 60 and stub.stats['rate_limited'] == 0
+        assert elapsed >= 2.5, "第二个窗口的调用应当排队等待重置"
+
+
+def scenario_multiple_tokens():
+    print("\n[2] 两个令牌: 每个每窗口20次，并发发出40次调用")
+    with StubGitHub(rate_limit=20, reset_after=60) as stub:
+        http_session.rate_limiter = GitHubRateLimiter(['token-a', 'token-b'])
+        ok, limited, elapsed = fire(stub.base_url, 40, 8)
+        per_token = {key: value for key, value in stub.stats.items() if key.startswith('calls:')}
+        print(f"    成功: {ok}  GitHub返回403: {stub.stats['rate_limited']}  各令牌调用数: {per_token}  耗时: {elapsed:.2f}s")
+        assert ok == 40 and stub.stats['rate_limited'] == 0
+        assert sorted(per_token.values()) == [20, 20]
+
+
+def scenario_secondary_limit():
+    print("\n[3] 二级限流: 第一个请求返回 403 + Retry-After: 1")
+    with StubGitHub(rate_limit=100) as stub:
+        http_session.rate_limiter = GitHubRateLimiter(['token-a'])
+        stub.trigger_secondary_limit(1)
+        ok, limited, elapsed = fire(stub.base_url, 1, 1)
+        print(f"    成功: {ok}  二级限流次数: {stub.stats['secondary_limited']}  耗时: {elapsed:.2f}s")
+        assert ok == 1 and elapsed >= 0.9
+
+
+def scenario_fail_fast():
+    print("\n[4] 配额耗尽且重置时间太远: 超出的调用应立即得到友好错误，而不是把403传给用户")
+    with StubGitHub(rate_limit=5, reset_after=600) as stub:
+        http_session.rate_limiter = GitHubRateLimiter(['token-a'])
+        ok, limited, elapsed = fire(stub.base_url, 8, 1)
+        print(f"    成功: {ok}  调度器拒绝: {limited}  GitHub返回403: {stub.stats['rate_limited']}  耗时: {elapsed:.2f}s")
+        print(f"    配额状态: {http_session.quota_stats()}")
+        assert ok == 5 and limited == 3 and stub.stats['rate_limited'] == 0
+
+
+def main():
+    print("=== GitHub配额调度器测试 ===")
+    scenario_single_token_exhaustion()
+    scenario_multiple_tokens()
+    scenario_secondary_limit()
+    scenario_fail_fast()
+    print("\n✅ 所有场景通过")
+
+
+if __name__ == '__main__':
+    main()
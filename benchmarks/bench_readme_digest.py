@@ -0,0 +1,102 @@
+# benchmarks/bench_readme_digest.py - 对比README截取前1000字与按token预算摘要：发送的token数、关键章节覆盖率和处理耗时
+# 用法: python -m benchmarks.bench_readme_digest [--budget 800] [--docs 40]
+import argparse
+import glob
+import random
+import time
+
+from utils.readme_digest import digest_readme, estimate_tokens
+
+# 合成README中带标记的关键章节，摘要应尽量保留这些内容
+KEY_SECTIONS = {'KEYINTRO': None, 'KEYFEATURES': 'Features', 'KEYUSAGE': 'Usage', 'KEYARCH': 'Architecture'}
+
+WORDS = ('fast scalable library framework server client plugin config cache stream async parser model data '
+         'request response build deploy test module api cli 插件 配置 缓存 数据 模型 服务 框架 部署').split()
+
+
+def sentence(rng, words=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def paragraph(rng, sentences=4):
+    return ' '.join(sentence(rng) for _ in range(sentences))
+
+
+def synthetic_readme(rng, scale):
+    """生成带有典型噪声的大README：徽章墙、HTML横幅、目录、长代码块、贡献者列表等"""
+    parts = ['<p align="center"><img src="https://example.com/logo.png" width="200"></p>',
+             '<h1 align="center">Demo Project</h1>']
+    parts += [f'[![badge{i}](https://img.shields.io/badge/b-{i}-green.svg)](https://example.com/{i})' for i in range(12)]
+    parts += ['', 'KEYINTRO ' + paragraph(rng, 3), '', '## Table of Contents']
+    parts += [f'- [Section {i}](#section-{i})' for i in range(25)]
+
+    body_sections = [('Features', 'KEYFEATURES'), ('Installation', None), ('Usage', 'KEYUSAGE'),
+                     ('Architecture', 'KEYARCH'), ('Configuration', None), ('API Reference', None),
+                     ('Benchmarks', None), ('FAQ', None), ('Changelog', None), ('Contributing', None),
+                     ('Contributors', None), ('Sponsors', None), ('License', None)]
+    rng.shuffle(body_sections[4:])
+    for title, marker in body_sections:
+        parts += ['', f'## {title}', '']
+        if marker:
+            parts.append(f'{marker} ' + paragraph(rng, 2))
+        for _ in range(scale):
+            kind = rng.random()
+            if kind < 0.4:
+                parts.append(paragraph(rng))
+            elif kind < 0.6:
+                parts += ['```bash'] + [f'demo {rng.choice(WORDS)} --{rng.choice(WORDS)}' for _ in range(20)] + ['```']
+            elif kind < 0.8:
+                parts += ['| option | default | description |', '|---|---|---|']
+                parts += [f'| {rng.choice(WORDS)} | {i} | {sentence(rng, 6)} |' for i in range(8)]
+            else:
+                parts += [f'<a href="https://github.com/u{i}"><img src="https://avatars.example/u{i}" width="50"/></a>'
+                          for i in range(10)]
+            parts.append('')
+    return '\n'.join(parts)
+
+
+def covered(text):
+    return sum(1 for marker in KEY_SECTIONS if marker in text)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type=int, default=800)
+    parser.add_argument('--docs', type=int, default=40)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    corpus = [synthetic_readme(rng, scale) for scale in [rng.randint(3, 40) for _ in range(args.docs)]]
+    local = [open(path, encoding='utf-8').read() for path in sorted(glob.glob('*.md'))]
+
+    totals = {'full': 0, 'slice': 0, 'digest': 0, 'slice_keys': 0, 'digest_keys': 0}
+    over_budget = 0
+    start = time.perf_counter()
+    digests = [digest_readme(text, args.budget) for text in corpus]
+    elapsed = time.perf_counter() - start
+
+    for text, digest in zip(corpus, digests):
+        totals['full'] += estimate_tokens(text)
+        totals['slice'] += estimate_tokens(text[:1000])
+        totals['digest'] += estimate_tokens(digest)
+        totals['slice_keys'] += covered(text[:1000])
+        totals['digest_keys'] += covered(digest)
+        over_budget += estimate_tokens(digest) > args.budget
+
+    n = len(corpus)
+    sizes = sorted(len(text) for text in corpus)
+    print(f"=== README摘要基准测试 ({n} 个合成README, {sizes[0] // 1024}-{sizes[-1] // 1024} KB, 预算 {args.budget} tokens) ===")
+    print(f"完整README平均token:     {totals['full'] / n:10.0f}")
+    print(f"截取前1000字平均token:   {totals['slice'] / n:10.0f}   关键章节覆盖 {totals['slice_keys']}/{n * len(KEY_SECTIONS)}")
+    print(f"预算摘要平均token:       {totals['digest'] / n:10.0f}   关键章节覆盖 {totals['digest_keys']}/{n * len(KEY_SECTIONS)}")
+    print(f"超出预算的摘要:          {over_budget:10d}")
+    print(f"摘要耗时:                {elapsed / n * 1000:10.2f} ms/篇 ({sum(sizes) / elapsed / 1024 / 1024:.1f} MB/s)")
+
+    for text in local:
+        digest = digest_readme(text, args.budget)
+        print(f"本项目README: {estimate_tokens(text)} tokens -> {estimate_tokens(digest)} tokens")
+    assert over_budget == 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_repo_archive.py - 深度分析的代码统计：不同规模的合成仓库归档上的耗时和内存峰值，
+# 对比一次流式读取（不保留成员）与先读出全部成员再逐个读取的方式；并通过 file:// git仓库验证浅克隆来源和磁盘缓存
+# 用法: python -m benchmarks.bench_repo_archive [--files 1000,10000,50000] [--file-size 2048]
+import argparse
+import os
+import random
+import subprocess
+import tarfile
+import tempfile
+import time
+import tracemalloc
+
+from utils.repo_archive import ArchiveCache, GitArchiveSource, RepoArchiver, archive_stats
+
+EXTENSIONS = ('.py', '.js', '.go', '.rs', '.md', '.json', '.c', '.ts')
+WORDS = ('def', 'return', 'value', 'import', 'for', 'while', 'class', 'self', 'data', 'result', '#', '//')
+
+
+def text_file(size, rng):
+    lines, total = [], 0
+    while total < size:
+        line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 10)))
+        lines.append(line)
+        total += len(line) + 1
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def make_tree(root, files, file_size, seed=0):
+    """生成合成的仓库目录：每个目录100个文件，外加依赖清单"""
+    rng = random.Random(seed)
+    for i in range(files):
+        directory = os.path.join(root, f'pkg{i // 100}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'module{i}{EXTENSIONS[i % len(EXTENSIONS)]}'), 'wb') as f:
+            f.write(text_file(file_size, rng))
+    with open(os.path.join(root, 'requirements.txt'), 'w') as f:
+        f.write('flask>=2.0\nrequests\nnumpy==1.26\n')
+    with open(os.path.join(root, 'package.json'), 'w') as f:
+        f.write('{"dependencies": {"react": "^18"}, "devDependencies": {"jest": "^29"}}')
+
+
+def make_archive(path, tree):
+    with tarfile.open(path, 'w:gz', compresslevel=1) as archive:
+        archive.add(tree, arcname='repo')
+
+
+def naive_stats(path):
+    """对比用：先读出全部成员列表，再逐个读取文件内容（TarFile会保留所有成员）"""
+    lines = 0
+    with tarfile.open(path, 'r:gz') as archive:
+        for member in archive.getmembers():
+            if member.isfile():
+                lines += archive.extractfile(member).read().count(b'\n')
+    return lines
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', default='1000,10000,50000')
+    parser.add_argument('--file-size', type=int, default=2048)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix='bench_repo_archive_')
+
+    print("=== 归档代码统计（内存为tracemalloc统计的Python分配峰值） ===")
+    for files in (int(value) for value in args.files.split(',')):
+        tree = os.path.join(workdir, f'tree{files}')
+        make_tree(tree, files, args.file_size)
+        path = os.path.join(workdir, f'repo{files}.tar.gz')
+        make_archive(path, tree)
+        with open(path, 'rb') as f:
+            stats, elapsed, peak = measure(archive_stats, f)
+        _, naive_elapsed, naive_peak = measure(naive_stats, path)
+        print(f"{files:>6} 个文件（归档 {os.path.getsize(path) / 1e6:.1f} MB）: 流式统计 {elapsed:.2f}s 峰值 {peak / 1e6:.2f} MB"
+              f" | 先读出全部成员 {naive_elapsed:.2f}s 峰值 {naive_peak / 1e6:.2f} MB"
+              f" | {stats['lines']} 行, {len(stats['languages'])} 种语言, {len(stats['manifests'])} 个依赖清单")
+
+    print("\n=== file:// git来源（浅克隆 + git archive）与磁盘缓存 ===")
+    remote = os.path.join(workdir, 'git', 'bench', 'monorepo')
+    make_tree(remote, 2000, args.file_size, seed=1)
+    for command in (['init', '-q'], ['add', '.'], ['-c', 'user.name=bench', '-c', 'user.email=bench@example.com',
+                                                   'commit', '-qm', 'init']):
+        subprocess.run(['git', '-C', remote, *command], check=True)
+    archiver = RepoArchiver(GitArchiveSource('file://' + os.path.join(workdir, 'git', '{owner}', '{repo}')),
+                            ArchiveCache(os.path.join(workdir, 'cache'), max_bytes=64 * 1024 * 1024))
+    for label in ('首次（克隆并统计）', '再次（读取统计缓存）'):
+        start = time.perf_counter()
+        stats = archiver.code_stats('bench', 'monorepo')
+        print(f"{label}: {time.perf_counter() - start:.2f}s  cache_status={stats['cache_status']}  "
+              f"{stats['files']} 个文件, {stats['lines']} 行")
+    print(f"磁盘缓存: {archiver.cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_tiered.py - 分级分析：在延迟预算内先返回模板分析，LLM分析完成后写回报告
+# 用法: python -m benchmarks.bench_tiered [--repos 20] [--llm-latency 3] [--budget 1]
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_llm import StubLLM
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repos', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=3.0, help='模拟LLM生成一次分析的耗时（秒）')
+    parser.add_argument('--budget', type=float, default=1.0, help='每个请求的延迟预算（秒）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_tiered_')
+    with StubLLM(latency=0.05, llm_latency=args.llm_latency) as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'ZHIPUAI_BASE_URL': stub.base_url,
+            'ZHIPUAI_API_KEY': 'stub.key',
+            'LLM_CACHE_ENABLED': 'false',
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        })
+        import app
+
+        def analyze(index, budget):
+            client = app.app.test_client()
+            start = time.time()
+            response = client.post('/analyze', json={'repo_url': f'https://github.com/tiered/repo{index}',
+                                                     'latency_budget': budget})
+            return response.get_json(), time.time() - start
+
+        # 预热：首次请求会初始化LLM客户端、SQLite存储等
+        app.app.test_client().post('/analyze', json={'repo_url': 'https://github.com/tiered/warmup', 'enrich': False})
+
+        print(f"=== 分级分析 ({args.repos} 个仓库, LLM耗时 {args.llm_latency}s, 预算 {args.budget}s) ===")
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=args.repos) as pool:
+            first = list(pool.map(lambda i: analyze(i, args.budget), range(args.repos)))
+        latencies = [elapsed for _, elapsed in first]
+        tiers = {report['analysis_tier'] for report, _ in first}
+        print(f"[1] 首次请求: p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms, "
+              f"分析级别 {tiers}, 补充分析 {first[0][0].get('enrichment')}")
+        assert max(latencies) < args.budget + 0.2 and tiers == {'heuristic'}
+
+        # 轮询 /report/<id>，直到所有报告都换成LLM分析
+        client = app.app.test_client()
+        waiting = {report['report_id'] for report, _ in first}
+        while waiting and time.time() - start < args.llm_latency * args.repos + 30:
+            for report_id in list(waiting):
+                result = client.get(f'/report/{report_id}').get_json()['result']
+                if result.get('enrichment', {}).get('status') != 'pending':
+                    assert result['analysis_tier'] == 'llm', result.get('enrichment')
+                    waiting.discard(report_id)
+            time.sleep(0.1)
+        print(f"[2] LLM分析全部写回: {time.time() - start:.2f}s 后，桩服务器收到LLM调用 {stub.stats['llm_calls']} 次")
+        assert not waiting
+
+        second = [analyze(i, args.budget) for i in range(args.repos)]
+        print(f"[3] 再次请求: 最长 {max(e for _, e in second) * 1000:.0f} ms, "
+              f"分析级别 {({report['analysis_tier'] for report, _ in second})}")
+        assert all(report['analysis_tier'] == 'llm' for report, _ in second)
+
+        # 预算充足时等待LLM结果并合并进同一个响应
+        report, elapsed = analyze(args.repos, args.llm_latency * 3)
+        print(f"[4] 预算 {args.llm_latency * 3:.0f}s: {elapsed:.2f}s 返回, 分析级别 {report['analysis_tier']}")
+        assert report['analysis_tier'] == 'llm'
+
+        report = app.app.test_client().post(
+            '/analyze', json={'repo_url': 'https://github.com/tiered/heuristic', 'enrich': False}).get_json()
+        print(f"[5] enrich=false: 分析级别 {report['analysis_tier']}, 补充分析 {report.get('enrichment')}")
+        print(f"\n补充分析统计: {app.enricher.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_watchlist.py - 关注列表：刷新时间点的分布（与整点定时、同时加入后按固定间隔刷新对比），
+# 有限配额下定期刷新的并发和配额保留，以及从预先生成的报告读取时的延迟和GitHub请求数
+# 用法: python -m benchmarks.bench_watchlist [--schedule-repos 3000] [--repos 200] [--rate-limit 400]
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from benchmarks.fixtures import FixtureGitHub
+
+FIXTURES = ('tinyhttp', 'datapipe', 'zh-notes', 'megaframework', 'noreadme')
+INTERVALS = (3600, 6 * 3600, 86400)
+
+
+def per_minute_peak(times, start, window):
+    """窗口内每分钟的刷新次数: (峰值, 平均值)"""
+    counts = Counter(int((t - start) // 60) for t in times if start <= t < start + window)
+    minutes = window // 60
+    return max(counts.values(), default=0), sum(counts.values()) / minutes
+
+
+def schedule_spread(repos):
+    """一天内各种调度方式每分钟的刷新次数"""
+    from utils.watchlist import next_slot  # 在设置环境变量之后导入
+    start = 1_700_000_000 // 86400 * 86400  # 从某天0点开始
+    day = 86400
+    keys = [(f'owner{i}/repo{i}', INTERVALS[i % len(INTERVALS)]) for i in range(repos)]
+
+    def occurrences(first_run):
+        times = []
+        for key, interval in keys:
+            t = first_run(key, interval)
+            while t < start + day:
+                times.append(t)
+                t += interval
+        return times
+
+    print(f"=== 刷新时间点分布（{repos} 个仓库，间隔 {'/'.join(f'{i // 3600}h' for i in INTERVALS)}，统计一天） ===")
+    for label, first_run in (
+        ("整点定时", lambda key, interval: start),
+        ("同时加入后按固定间隔", lambda key, interval: start + 1234.5),
+        ("按仓库哈希错开相位", lambda key, interval: next_slot(key, interval, start - 1)),
+    ):
+        peak, mean = per_minute_peak(occurrences(first_run), start, day)
+        print(f"{label:<12}: 每分钟峰值 {peak:5d} 次  平均 {mean:6.2f} 次  峰均比 {peak / mean:7.1f}")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--schedule-repos', type=int, default=3000)
+    parser.add_argument('--repos', type=int, default=200)
+    parser.add_argument('--rate-limit', type=int, default=400, help='桩服务器每个窗口的REST调用上限')
+    parser.add_argument('--reset-after', type=int, default=15, help='桩服务器配额窗口的长度（秒）')
+    parser.add_argument('--reserve', type=float, default=0.25, help='WATCHLIST_QUOTA_RESERVE')
+    parser.add_argument('--workers', type=int, default=8, help='WATCHLIST_WORKERS')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_watchlist_')
+    with FixtureGitHub(latency=0.02, rate_limit=args.rate_limit, reset_after=args.reset_after) as stub:
+        os.environ.update({
+            'GITHUB_API_URL': stub.base_url,
+            'GITHUB_FETCH_MODE': 'rest',
+            'LLM_BACKEND': 'fake',
+            'ZHIPUAI_API_KEY': 'stub.key',
+            'LLM_FAKE_LATENCY': '0.05',
+            'LLM_FAKE_TOKENS_PER_SECOND': '0',
+            'WATCHLIST_PATH': os.path.join(workdir, 'watchlist.sqlite3'),
+            'WATCHLIST_SCHEDULER': 'true',  # 桩服务器默认关闭定期刷新
+            'WATCHLIST_WORKERS': str(args.workers),
+            'WATCHLIST_QUOTA_RESERVE': str(args.reserve),
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+            'LOG_LEVEL': 'ERROR',
+        })
+        import app
+        from utils.http_session import rate_limiter
+
+        schedule_spread(args.schedule_repos)
+
+        client = app.app.test_client()
+        urls = [f'https://github.com/watched/{FIXTURES[i % len(FIXTURES)]}-{i}' for i in range(args.repos)]
+        print(f"\n=== 定期刷新 {args.repos} 个仓库（{args.workers} 个线程，桩服务器配额 {args.rate_limit} 次/{args.reset_after}s，"
+              f"保留 {args.reserve:.0%}） ===")
+        start = time.perf_counter()
+        client.post('/watchlist', json={'repo_urls': urls, 'interval': 86400})
+
+        # 刷新期间抽样在途刷新数和剩余配额
+        peak_running, min_remaining, done = 0, None, threading.Event()
+
+        def sample():
+            nonlocal peak_running, min_remaining
+            while not done.is_set():
+                peak_running = max(peak_running, app.watchlist.stats()['running'])
+                remaining = rate_limiter.snapshot()['tokens'][0]['remaining']
+                if remaining is not None:
+                    min_remaining = remaining if min_remaining is None else min(min_remaining, remaining)
+                time.sleep(0.05)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        while app.watchlist.stats()['refreshed'] < args.repos:
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        stats = app.watchlist.stats()
+        print(f"全部完成: {elapsed:.1f}s  GitHub请求 {stub.stats['requests']}  被限流(403) {stub.stats['rate_limited']} 次  "
+              f"配额不足暂停 {stats['quota_pauses']} 次")
+        print(f"在途刷新峰值 {peak_running}（上限 {args.workers}）  刷新期间最低剩余配额 {min_remaining}")
+
+        print(f"\n=== 读取预先生成的报告（{args.repos} 个关注仓库） ===")
+        for label, request in (
+            ("GET /watchlist/<owner>/<repo>", lambda url: client.get('/watchlist/' + url.split('github.com/', 1)[1])),
+            ("POST /analyze（报告缓存已清空）", lambda url: client.post('/analyze', json={'repo_url': url})),
+        ):
+            app.report_cache._entries.clear()
+            stub.stats.clear()
+            latencies, statuses = [], Counter()
+            for url in urls:
+                t0 = time.perf_counter()
+                response = request(url)
+                latencies.append(time.perf_counter() - t0)
+                statuses[response.get_json().get('cache_status')] += 1
+            print(f"{label}: p50 {statistics.median(latencies) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms  "
+                  f"GitHub请求 {stub.stats['requests']}  cache_status {dict(statuses)}")
+
+        cold = [f'https://github.com/unwatched/{FIXTURES[i % len(FIXTURES)]}-{i}' for i in range(50)]
+        stub.stats.clear()
+        latencies = []
+        for url in cold:
+            t0 = time.perf_counter()
+            client.post('/analyze', json={'repo_url': url, 'enrich': False})
+            latencies.append(time.perf_counter() - t0)
+        print(f"对比 未关注仓库 POST /analyze: p50 {statistics.median(latencies) * 1000:.2f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms  GitHub请求 {stub.stats['requests']}")
+        print(f"关注列表统计: {app.watchlist.stats()}")
+
+
+if __name__ == '__main__':
+    main()
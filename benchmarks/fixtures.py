@@ -0,0 +1,105 @@
+# benchmarks/fixtures.py - 录制的GitHub响应（仓库信息、README、语言统计），由本地桩服务器回放
+# 录制: GITHUB_TOKEN=... python -m benchmarks.fixtures pallets/flask psf/requests
+import glob
+import json
+import os
+import sys
+
+import requests
+
+from benchmarks.stub_github import StubGitHub
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'github_fixtures')
+
+
+def fixture_name(full_name):
+    return full_name.replace('/', '__')
+
+
+def save_fixture(full_name, repo, readme, languages, graphql=None, directory=FIXTURE_DIR):
+    """保存一个仓库的三个接口响应；readme为None表示该仓库没有README（接口返回404）
+
+    graphql为同一仓库的GraphQL查询结果节点，没有录制时回放时由REST数据生成。
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, fixture_name(full_name) + '.json')
+    fixture = {'repo': repo, 'readme': readme, 'languages': languages}
+    if graphql is not None:
+        fixture['graphql'] = graphql
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def load_fixtures(directory=FIXTURE_DIR):
+    """返回 {仓库名: 响应数据}，按文件名排序"""
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            fixture = json.load(f)
+        fixtures[fixture['repo']['name']] = fixture
+    return fixtures
+
+
+def record(full_names, api_url='https://api.github.com', token=None):
+    """从GitHub录制仓库的原始响应；提供令牌时同时录制GraphQL查询结果（GraphQL接口不接受匿名访问）"""
+    headers = {'Accept': 'application/vnd.github.v3+json'}
+    if token:
+        headers['Authorization'] = f'token {token}'
+    session = requests.Session()
+    for full_name in full_names:
+        responses = {}
+        for key, suffix in (('repo', ''), ('readme', '/readme'), ('languages', '/languages')):
+            response = session.get(f"{api_url}/repos/{full_name}{suffix}", headers=headers, timeout=30)
+            if response.status_code == 404 and key == 'readme':
+                responses[key] = None
+                continue
+            response.raise_for_status()
+            responses[key] = response.json()
+        if token:
+            # 在这里导入：utils下的模块导入时读取 GITHUB_API_URL，基准测试需要先指向桩服务器
+            from utils.github_graphql import build_query, build_variables
+            owner, name = full_name.split('/')
+            response = session.post(f"{api_url}/graphql", headers=headers, timeout=30, json={
+                'query': build_query(1), 'variables': build_variables([(owner, name)])})
+            response.raise_for_status()
+            responses['graphql'] = response.json()['data']['repo0']
+        print(f"✅ 已录制 {full_name}: {save_fixture(full_name, **responses)}")
+
+
+class FixtureGitHub(StubGitHub):
+    """按录制的响应回放GitHub接口
+
+    请求 /repos/<任意owner>/<仓库名>-<序号> 时返回对应fixture的数据，仓库名替换为请求中的名字，
+    这样可以用少量fixture模拟任意多个不同的仓库（避免命中报告缓存）。
+    """
+
+    def __init__(self, fixtures=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = fixtures or load_fixtures()
+        self.names = list(self.fixtures)
+
+    def resolve(self, repo):
+        """把请求的仓库名映射到fixture：<仓库名>-<序号> 或 <仓库名>"""
+        base = repo.rsplit('-', 1)[0] if repo not in self.fixtures else repo
+        return self.fixtures.get(base)
+
+    def repo_payloads(self, owner, repo):
+        fixture = self.resolve(repo)
+        if fixture is None:
+            return None
+        return (dict(fixture['repo'], name=repo, full_name=f'{owner}/{repo}', html_url=f'https://github.com/{owner}/{repo}'),
+                fixture['readme'], fixture['languages'])
+
+    def graphql_repository(self, owner, repo, readme_paths):
+        fixture = self.resolve(repo)
+        if fixture is None or fixture.get('graphql') is None:
+            return super().graphql_repository(owner, repo, readme_paths)
+        # 回放录制的GraphQL节点，仓库名替换为请求中的名字（录制的节点不叠加 push()/star() 模拟的变化）
+        return dict(fixture['graphql'], name=repo, nameWithOwner=f'{owner}/{repo}', url=f'https://github.com/{owner}/{repo}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("用法: python -m benchmarks.fixtures owner/repo [owner/repo ...]")
+    record(sys.argv[1:], token=os.getenv('GITHUB_TOKEN'))
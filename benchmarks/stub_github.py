@@ -0,0 +1,397 @@
+# benchmarks/stub_github.py - 本地GitHub API桩服务器（基准测试用，不访问真实网络）
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import socket
+import ssl
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+README_TEXT = """# {repo}
+
+A stub repository used by the local benchmarks.
+
+## Features
+
+- Fast
+- Reliable
+
+## Installation
+
+pip install {repo}
+"""
+
+
+def repo_payload(owner, repo):
+    """生成与GitHub /repos/{owner}/{repo} 结构一致的仓库数据"""
+    return {
+        'name': repo,
+        'full_name': f'{owner}/{repo}',
+        'description': f'Stub repository {owner}/{repo}',
+        'html_url': f'https://github.com/{owner}/{repo}',
+        'language': 'Python',
+        'stargazers_count': 12345,
+        'forks_count': 678,
+        'open_issues_count': 42,
+        'created_at': '2020-01-01T00:00:00Z',
+        'updated_at': '2024-06-01T00:00:00Z',
+        'pushed_at': '2024-06-01T00:00:00Z',
+        'default_branch': 'main',
+    }
+
+
+def readme_payload(owner, repo):
+    content = README_TEXT.format(repo=repo).encode('utf-8')
+    return {'name': 'README.md', 'encoding': 'base64', 'content': base64.b64encode(content).decode('ascii')}
+
+
+def languages_payload(owner, repo):
+    return {'Python': 80000, 'JavaScript': 15000, 'HTML': 5000}
+
+
+def head_sha(owner, repo, pushes=0):
+    return hashlib.sha1(f'{owner}/{repo}'.encode('utf-8') + (b'#%d' % pushes if pushes else b'')).hexdigest()
+
+
+def blob_sha(data):
+    """与git相同的blob SHA（GitHub /readme 的 sha 字段、GraphQL Blob 的 oid）"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def tarball_payload(owner, repo, ref=None):
+    """生成与GitHub /tarball 结构一致的小型归档（顶层目录为 owner-repo-短SHA）"""
+    files = {
+        'README.md': README_TEXT.format(repo=repo),
+        'requirements.txt': 'flask>=2.0\nrequests==2.31.0  # HTTP\n',
+        f'{repo}/__init__.py': '"""Stub package."""\n\n__version__ = "1.0"\n',
+        f'{repo}/app.py': 'from flask import Flask\n\napp = Flask(__name__)\n\n\n@app.route("/")\ndef index():\n    return "ok"\n',
+        'static/app.js': 'console.log("stub");\n',
+        'docs/logo.png': '\x89PNG\r\n\x1a\n\0\0\0\rIHDR',
+    }
+    buffer = io.BytesIO()
+    # 固定mtime，同一仓库每次生成的归档完全相同
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as compressed:
+        with tarfile.open(fileobj=compressed, mode='w') as archive:
+            top = f'{owner}-{repo}-{(ref or head_sha(owner, repo))[:7]}'
+            for name, text in files.items():
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(f'{top}/{name}')
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def graphql_node(repo, readme, languages, readme_paths, head=None):
+    """由REST结构的三份数据生成GraphQL仓库节点；README只出现在与文件名相同的 object(expression:) 别名下"""
+    node = {
+        'name': repo['name'],
+        'nameWithOwner': repo['full_name'],
+        'description': repo.get('description'),
+        'url': repo['html_url'],
+        'primaryLanguage': {'name': repo['language']} if repo.get('language') else None,
+        'stargazerCount': repo['stargazers_count'],
+        'forkCount': repo['forks_count'],
+        'issues': {'totalCount': repo['open_issues_count']},  # REST的数字已包含PR
+        'pullRequests': {'totalCount': 0},
+        'createdAt': repo['created_at'],
+        'updatedAt': repo['updated_at'],
+        'pushedAt': repo.get('pushed_at'),
+        'defaultBranchRef': {'name': repo.get('default_branch', 'main'), 'target': {'oid': head}},
+        'languages': {'edges': [{'size': size, 'node': {'name': name}}
+                                for name, size in sorted(languages.items(), key=lambda item: -item[1])]},
+    }
+    for alias, path in readme_paths.items():
+        node[alias] = None
+        if readme is not None and readme.get('name') == path:
+            text = base64.b64decode(readme['content'])
+            node[alias] = {'text': text.decode('utf-8'), 'isBinary': False, 'oid': readme.get('sha') or blob_sha(text)}
+    return node
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持keep-alive
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.stub._count('connections')
+
+    def do_GET(self):
+        status, headers, body = self.server.stub.handle('GET', self.path, self.headers, None)
+        self._reply(status, headers, body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = self.rfile.read(length) if length else b''
+        status, headers, body = self.server.stub.handle('POST', self.path, self.headers, payload)
+        self._reply(status, headers, body)
+
+    def _reply(self, status, headers, body):
+        self.send_response(status)
+        headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端已超时断开
+
+    def log_message(self, format, *args):
+        pass  # 基准测试时不输出访问日志
+
+
+# 基准测试在桩服务器运行期间使用的本地状态文件：放在临时目录中，不读写 /tmp 下服务默认的数据库，
+# 结果不受之前运行的影响；基准测试自己设置的路径优先
+STATE_FILES = (
+    ('REPORT_STORE_PATH', 'reports.sqlite3'),
+    ('JOB_QUEUE_PATH', 'jobs.sqlite3'),
+    ('WATCHLIST_PATH', 'watchlist.sqlite3'),
+    ('HISTORY_PATH', 'history.sqlite3'),
+)
+
+
+class StubGitHub:
+    """本地GitHub API桩服务器，统计连接数和请求数，可注入固定延迟
+
+    作为上下文管理器使用时同时隔离服务的本地状态（见 STATE_FILES），并默认关闭关注列表的定期刷新
+    （导入app时不启动刷新线程，需要时由基准测试设置 WATCHLIST_SCHEDULER=true）
+    """
+
+    def __init__(self, latency=0.0, tls=False, rate_limit=None, reset_after=3600):
+        self.latency = latency
+        self.tls = tls
+        self.rate_limit = rate_limit  # 每个令牌每个窗口的调用上限，None表示不限流
+        self.reset_after = reset_after
+        self.secondary_limits = []  # 待触发的二级限流（Retry-After秒数）
+        self.graphql_status = None  # 设置后 /graphql 总是返回该状态码，用于测试退回REST
+        self.revisions = {}  # (owner, repo) -> 模拟的变化: 推送次数、README修改次数、新增星标数
+        self._windows = {}
+        self.stats = Counter()
+        self.paths = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._cert_dir = None
+        self._state_dir = None
+        self._state_env = []
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def handle(self, method, path, headers, body):
+        """处理一次请求，返回 (状态码, 响应头, 响应体)"""
+        self._count('requests')
+        with self._lock:
+            self.paths[path.split('?')[0]] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if method == 'POST' and path.split('?')[0] == '/graphql':
+            status, response_headers, response_body = self.graphql(body)
+        else:
+            status, response_headers, response_body = self.route(method, path.split('?')[0], headers, body)
+        if method == 'GET' and status == 200:
+            # 模拟GitHub的条件请求：ETag匹配时返回304
+            etag = '"%s"' % hashlib.sha1(response_body).hexdigest()
+            response_headers.setdefault('ETag', etag)
+            if headers.get('If-None-Match') == etag:
+                self._count('not_modified')
+                status, response_headers, response_body = 304, {'ETag': etag}, b''
+        return self._apply_rate_limit(headers, status, response_headers, response_body)
+
+    def trigger_secondary_limit(self, retry_after):
+        """下一个请求返回二级限流（403 + Retry-After）"""
+        with self._lock:
+            self.secondary_limits.append(retry_after)
+
+    def _apply_rate_limit(self, headers, status, response_headers, response_body):
+        """模拟GitHub限流：按Authorization分别计数并返回 X-RateLimit-* 头，304不消耗额度"""
+        with self._lock:
+            if self.secondary_limits:
+                retry_after = self.secondary_limits.pop(0)
+                self.stats['secondary_limited'] += 1
+                return 403, {'Retry-After': str(retry_after)}, json.dumps(
+                    {'message': 'You have exceeded a secondary rate limit'}).encode('utf-8')
+            if self.rate_limit is None:
+                return status, response_headers, response_body
+
+            now = time.time()
+            key = headers.get('Authorization') or 'anonymous'
+            window = self._windows.get(key)
+            if window is None or now >= window['reset_at']:
+                window = self._windows[key] = {'remaining': self.rate_limit, 'reset_at': now + self.reset_after}
+            if status != 304:
+                if window['remaining'] <= 0:
+                    self.stats['rate_limited'] += 1
+                    status, response_body = 403, json.dumps({'message': 'API rate limit exceeded'}).encode('utf-8')
+                    response_headers = {}
+                else:
+                    window['remaining'] -= 1
+                    self.stats[f'calls:{key}'] += 1
+            response_headers.update({
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(window['remaining']),
+                'X-RateLimit-Reset': str(int(window['reset_at'] + 0.999)),
+            })
+            return status, response_headers, response_body
+
+    def route(self, method, path, headers, body):
+        parts = path.strip('/').split('/')
+        if len(parts) >= 3 and parts[0] == 'repos':
+            owner, repo = parts[1], parts[2]
+            payloads = self.current_payloads(owner, repo)
+            if payloads is None:
+                return self.json_response({'message': 'Not Found'}, status=404)
+            repo_data, readme, languages = payloads
+            if len(parts) == 3:
+                return self.json_response(repo_data)
+            if len(parts) == 4 and parts[3] == 'readme':
+                if readme is None:
+                    return self.json_response({'message': 'Not Found'}, status=404)
+                return self.json_response(readme)
+            if len(parts) == 4 and parts[3] == 'languages':
+                return self.json_response(languages)
+            if parts[3:] == ['commits', 'HEAD']:
+                return 200, {'Content-Type': 'application/vnd.github.sha'}, self.head(owner, repo).encode('ascii')
+            if len(parts) == 5 and parts[3] == 'tarball':
+                return 200, {'Content-Type': 'application/x-gzip'}, tarball_payload(owner, repo, parts[4])
+        return self.json_response({'message': 'Not Found'}, status=404)
+
+    def repo_payloads(self, owner, repo):
+        """返回仓库的 (/repos, /readme, /languages) REST数据，仓库不存在时返回None；readme为None表示没有README"""
+        return repo_payload(owner, repo), readme_payload(owner, repo), languages_payload(owner, repo)
+
+    def push(self, owner, repo, readme=False):
+        """模拟向默认分支推送一次提交：pushed_at和HEAD SHA随之变化；readme=True 时同时修改README"""
+        with self._lock:
+            revision = self.revisions.setdefault((owner.lower(), repo.lower()), Counter())
+            revision['pushes'] += 1
+            if readme:
+                revision['readme_edits'] += 1
+
+    def star(self, owner, repo, count=1):
+        """模拟星标数变化（不涉及代码和README）"""
+        with self._lock:
+            self.revisions.setdefault((owner.lower(), repo.lower()), Counter())['stars'] += count
+
+    def _revision(self, owner, repo):
+        with self._lock:
+            return Counter(self.revisions.get((owner.lower(), repo.lower()), ()))
+
+    def head(self, owner, repo):
+        return head_sha(owner, repo, self._revision(owner, repo)['pushes'])
+
+    def current_payloads(self, owner, repo):
+        """在 repo_payloads 的基础上叠加 push()/star() 模拟的变化；README带上与内容对应的 sha"""
+        payloads = self.repo_payloads(owner, repo)
+        if payloads is None:
+            return None
+        repo_data, readme, languages = payloads
+        revision = self._revision(owner, repo)
+        repo_data = dict(repo_data, stargazers_count=repo_data['stargazers_count'] + revision['stars'])
+        if revision['pushes']:
+            pushed_at = datetime.strptime(repo_data['pushed_at'], '%Y-%m-%dT%H:%M:%SZ') + timedelta(minutes=revision['pushes'])
+            repo_data['pushed_at'] = pushed_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        if readme is not None:
+            text = base64.b64decode(readme['content']) + b''.join(b'\nUpdate %d\n' % i for i in range(revision['readme_edits']))
+            readme = dict(readme, content=base64.b64encode(text).decode('ascii'), sha=blob_sha(text))
+        return repo_data, readme, languages
+
+    def graphql_repository(self, owner, repo, readme_paths):
+        payloads = self.current_payloads(owner, repo)
+        return None if payloads is None else graphql_node(*payloads, readme_paths, head=self.head(owner, repo))
+
+    def graphql(self, body):
+        """模拟 POST /graphql：只支持 utils.github_graphql 生成的 repository 批量查询"""
+        try:
+            request = json.loads(body or b'{}')
+            query, variables = request['query'], request.get('variables') or {}
+        except (ValueError, KeyError):
+            return self.json_response({'message': 'Problems parsing JSON'}, status=400)
+        self._count('graphql_queries')
+        if self.graphql_status is not None:
+            return self.json_response({'message': 'Server Error'}, status=self.graphql_status)
+        readme_paths = dict(re.findall(r'(\w+): object\(expression: "HEAD:([^"]+)"\)', query))
+        data, errors = {}, []
+        for alias, owner_var, name_var in re.findall(r'(\w+): repository\(owner: \$(\w+), name: \$(\w+)\)', query):
+            owner, repo = variables.get(owner_var), variables.get(name_var)
+            self._count('graphql_repos')
+            data[alias] = self.graphql_repository(owner, repo, readme_paths)
+            if data[alias] is None:
+                errors.append({'type': 'NOT_FOUND', 'path': [alias],
+                               'message': f"Could not resolve to a Repository with the name '{owner}/{repo}'."})
+        return self.json_response(dict({'data': data}, **({'errors': errors} if errors else {})))
+
+    @staticmethod
+    def json_response(data, status=200, headers=None):
+        return status, dict(headers or {}), json.dumps(data).encode('utf-8')
+
+    def _ssl_context(self):
+        """用openssl生成临时自签名证书"""
+        self._cert_dir = tempfile.mkdtemp(prefix='stub-github-')
+        cert = os.path.join(self._cert_dir, 'cert.pem')
+        key = os.path.join(self._cert_dir, 'key.pem')
+        subprocess.run(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+             '-subj', '/CN=127.0.0.1', '-keyout', key, '-out', cert],
+            check=True, capture_output=True,
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        return context
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        scheme = 'http'
+        if self.tls:
+            self._server.socket = self._ssl_context().wrap_socket(self._server.socket, server_side=True)
+            scheme = 'https'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f'{scheme}://127.0.0.1:{self._server.server_port}'
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._cert_dir:
+            for name in os.listdir(self._cert_dir):
+                os.remove(os.path.join(self._cert_dir, name))
+            os.rmdir(self._cert_dir)
+
+    def _isolate_state(self):
+        self._state_dir = tempfile.TemporaryDirectory(prefix='bench_state_')
+        defaults = [(name, os.path.join(self._state_dir.name, filename)) for name, filename in STATE_FILES]
+        for name, value in defaults + [('WATCHLIST_SCHEDULER', 'false')]:
+            if name not in os.environ:
+                os.environ[name] = value
+                self._state_env.append(name)
+
+    def _restore_state(self):
+        for name in self._state_env:
+            os.environ.pop(name, None)
+        self._state_env = []
+        self._state_dir.cleanup()
+
+    def __enter__(self):
+        self._isolate_state()
+        self.base_url = self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self._restore_state()
@@ -0,0 +1,59 @@
+# benchmarks/stub_llm.py - 本地智谱AI桩服务器：实现 /chat/completions（含流式），可注入生成延迟
+import json
+import time
+
+from benchmarks.stub_github import StubGitHub
+
+REPLY_TEXT = "1. 这是一个用于基准测试的示例项目。\n2. 技术栈主要是Python。\n3. 项目比较受欢迎。\n4. 适合初学者学习。\n"
+
+
+class StubLLM(StubGitHub):
+    """同时提供GitHub接口和OpenAI兼容的 /chat/completions 接口；把ZHIPUAI_BASE_URL指向base_url即可"""
+
+    def __init__(self, latency=0.0, llm_latency=0.5, **kwargs):
+        super().__init__(latency=latency, **kwargs)
+        self.llm_latency = llm_latency
+        self.prompts = []
+        self.failures = []  # 待返回的错误状态码，如 [429, 503]
+        self.active = 0
+
+    def route(self, method, path, headers, body):
+        if method == 'POST' and path.rstrip('/').endswith('/chat/completions'):
+            return self.chat_completion(json.loads(body or b'{}'))
+        return super().route(method, path, headers, body)
+
+    def fail_next(self, *statuses):
+        """接下来的调用依次返回这些错误状态码"""
+        with self._lock:
+            self.failures.extend(statuses)
+
+    def chat_completion(self, request):
+        self._count('llm_calls')
+        with self._lock:
+            self.prompts.append(request['messages'][-1]['content'])
+            if self.failures:
+                status = self.failures.pop(0)
+                self.stats[f'llm_failed_{status}'] += 1
+                return self.json_response({'error': {'code': str(status), 'message': 'stub failure'}}, status=status)
+            self.active += 1
+            self.stats['llm_max_active'] = max(self.stats['llm_max_active'], self.active)
+        try:
+            time.sleep(self.llm_latency)
+        finally:
+            with self._lock:
+                self.active -= 1
+        if not request.get('stream'):
+            return self.json_response({
+                'id': 'stub', 'model': request.get('model'), 'created': int(time.time()),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': REPLY_TEXT}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            })
+
+        events = []
+        for line in REPLY_TEXT.splitlines(keepends=True):
+            chunk = {'id': 'stub', 'model': request.get('model'), 'created': int(time.time()),
+                     'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': line}}]}
+            events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return 200, {'Content-Type': 'text/event-stream'}, ''.join(events).encode('utf-8')
@@ -0,0 +1,355 @@
+# benchmarks/suite.py - 离线端到端基准测试套件：用录制的GitHub响应驱动 /analyze 和 /export，
+# 分别经过Flask测试客户端（进程内）和真实的gunicorn进程，在多个并发级别下统计延迟分位数、吞吐量和内存，
+# 结果写入JSON文件，可与之前的结果对比。
+# 用法: python -m benchmarks.suite [--targets flask,gunicorn] [--scenarios analyze_cold,export_pdf]
+#                                  [--concurrency 1,8,32] [--requests 200] [--output bench_results.json]
+#                                  [--baseline 上次的结果.json]
+#       python -m benchmarks.suite --compare 旧结果.json 新结果.json
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from benchmarks.bench_async import free_port, start_server
+from benchmarks.fixtures import FixtureGitHub
+
+EXPORT_FORMATS = ('markdown', 'pdf', 'word')
+
+# 越大越好的指标，其余（延迟、内存）越小越好
+HIGHER_IS_BETTER = {'rps'}
+COMPARED_METRICS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'alloc_kb_per_request')
+
+
+class Context:
+    """一次运行中各场景共用的信息：fixture名称和预先生成的报告ID"""
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.report_ids = []
+        self.prefix = 'bench'
+
+    def fixture(self, index):
+        return self.fixtures[index % len(self.fixtures)]
+
+    def report_id(self, index):
+        return self.report_ids[index % len(self.report_ids)]
+
+
+def analyze_cold(ctx, index):
+    """每个请求一个不同的仓库：完整的 获取→分析 流程"""
+    return 'POST', '/analyze', {'repo_url': f'https://github.com/{ctx.prefix}/{ctx.fixture(index)}-{index}'}
+
+
+def analyze_cached(ctx, index):
+    """少量仓库反复请求：报告缓存命中的路径"""
+    return 'POST', '/analyze', {'repo_url': f'https://github.com/bench/{ctx.fixture(index)}'}
+
+
+def export_scenario(format_type):
+    def scenario(ctx, index):
+        return 'GET', f'/export/{ctx.report_id(index)}/{format_type}', None
+    scenario.__doc__ = f"按report_id导出{format_type}（不缓存导出文件，每次都重新渲染）"
+    return scenario
+
+
+SCENARIOS = {'analyze_cold': analyze_cold, 'analyze_cached': analyze_cached}
+SCENARIOS.update({f'export_{format_type}': export_scenario(format_type) for format_type in EXPORT_FORMATS})
+
+
+class FlaskTarget:
+    """进程内Flask测试客户端，每个线程使用自己的客户端"""
+
+    name = 'flask'
+
+    def __init__(self):
+        import app
+        self.app = app.app
+        self.pid = os.getpid()
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True) if response.is_json else None
+
+    def close(self):
+        pass
+
+
+class GunicornTarget:
+    """真实的gunicorn进程（同步worker），通过HTTP连接池访问"""
+
+    name = 'gunicorn'
+
+    def __init__(self, env, workers, threads):
+        self.port = free_port()
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+                   '--bind', f'127.0.0.1:{self.port}', 'app:app']
+        self.process = start_server(command, self.port, env)
+        self.pid = self.process.pid
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=256))
+
+    def request(self, method, path, body):
+        response = self.session.request(method, f'http://127.0.0.1:{self.port}{path}', json=body, timeout=120)
+        is_json = response.headers.get('Content-Type', '').startswith('application/json')
+        return response.status_code, response.json() if is_json else None
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def process_tree_rss_kb(pid):
+    """进程及其所有子进程的常驻内存之和（KB），读取 /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_requests(target, scenario, ctx, concurrency, indices):
+    """并发执行请求，返回 (每个请求的延迟, 失败数, 总耗时)"""
+    def call(index):
+        start = time.perf_counter()
+        try:
+            status, _ = target.request(*scenario(ctx, index))
+        except Exception:
+            status = None
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, indices))
+    elapsed = time.perf_counter() - start
+    return [latency for _, latency in results], sum(1 for status, _ in results if status != 200), elapsed
+
+
+def measure_alloc(target, scenario, ctx, concurrency, offset):
+    """进程内目标：同时执行 concurrency 个请求，按tracemalloc的峰值估计每个在途请求占用的内存（KB）"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run_requests(target, scenario, ctx, concurrency, range(offset, offset + concurrency))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round((peak - baseline) / 1024 / concurrency, 1)
+
+
+def run_level(target, name, ctx, concurrency, total):
+    scenario = SCENARIOS[name]
+    ctx.prefix = f'cold-{target.name}-{concurrency}'
+    warmup = 10 ** 6  # 预热请求使用单独的序号，不与正式请求重复
+    run_requests(target, scenario, ctx, concurrency, range(warmup, warmup + min(concurrency, 8)))
+
+    rss_before = process_tree_rss_kb(target.pid)
+    latencies, errors, elapsed = run_requests(target, scenario, ctx, concurrency, range(total))
+    rss_after = process_tree_rss_kb(target.pid)
+
+    result = {
+        'target': target.name,
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'rps': round(total / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'rss_mb': round(rss_after / 1024, 1),
+        'rss_delta_kb_per_request': round((rss_after - rss_before) / total, 2),
+    }
+    if isinstance(target, FlaskTarget):
+        result['alloc_kb_per_request'] = measure_alloc(target, scenario, ctx, concurrency, total)
+    return result
+
+
+def prepare_reports(target, ctx):
+    """导出场景需要的报告：每个fixture分析一次"""
+    ctx.report_ids = []
+    for fixture in ctx.fixtures:
+        status, body = target.request('POST', '/analyze', {'repo_url': f'https://github.com/bench/{fixture}'})
+        if status != 200:
+            raise RuntimeError(f"生成报告失败: {fixture} ({status})")
+        ctx.report_ids.append(body['report_id'])
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result):
+    alloc = f"  alloc {result['alloc_kb_per_request']:8.1f} KB/req" if 'alloc_kb_per_request' in result else ''
+    # 进程内目标运行时标准输出被重定向（应用的日志输出），结果直接写到原始的标准输出
+    print(f"{result['target']:<9} {result['scenario']:<16} c={result['concurrency']:<4} "
+          f"{result['rps']:8.1f} req/s  p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+          f"p99 {result['p99_ms']:8.2f} ms  RSS {result['rss_mb']:7.1f} MB{alloc}"
+          + (f"  ❌ 失败 {result['errors']}" if result['errors'] else ''), file=sys.__stdout__, flush=True)
+
+
+def compare(baseline, current, threshold):
+    """逐项对比两次结果，返回变差超过阈值的条目数"""
+    def index(results):
+        return {(r['target'], r['scenario'], r['concurrency']): r for r in results['results']}
+
+    old, new = index(baseline), index(current)
+    print(f"=== 对比 {baseline['meta'].get('git_revision')} ({baseline['meta']['started_at']}) -> "
+          f"{current['meta'].get('git_revision')} ({current['meta']['started_at']})，阈值 {threshold:.0%} ===")
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        changes = []
+        for metric in COMPARED_METRICS:
+            if metric not in old[key] or metric not in new[key] or not old[key][metric]:
+                continue
+            change = (new[key][metric] - old[key][metric]) / old[key][metric]
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ' ⚠️' if worse > threshold else ''
+            regressions += bool(flag)
+            changes.append(f"{metric} {old[key][metric]}→{new[key][metric]} ({change:+.0%}){flag}")
+        print(f"{key[0]:<9} {key[1]:<16} c={key[2]:<4} " + '  '.join(changes))
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:<9} {key[1]:<16} c={key[2]:<4} 只出现在{'旧' if key in old else '新'}结果中")
+    print(f"\n{'⚠️ ' + str(regressions) + ' 项指标变差超过阈值' if regressions else '✅ 没有明显退化'}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--targets', default='flask,gunicorn')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,8,32', help='逗号分隔的并发级别')
+    parser.add_argument('--requests', type=int, default=200, help='每个并发级别的请求数')
+    parser.add_argument('--github-latency', type=float, default=0.02, help='桩服务器每次调用的延迟（秒）')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker数')
+    parser.add_argument('--threads', type=int, default=1, help='每个gunicorn worker的线程数')
+    parser.add_argument('--llm', choices=('none', 'fake'), default='none',
+                        help='none: 只有模板分析；fake: 使用本地模拟LLM后端')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='运行结束后与该结果文件对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比时视为退化的变化比例')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='只对比两个结果文件，不运行')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(load_results(args.compare[0]), load_results(args.compare[1]), args.threshold) else 0)
+
+    targets = args.targets.split(',')
+    scenarios = args.scenarios.split(',')
+    levels = [int(level) for level in args.concurrency.split(',')]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"未知场景: {', '.join(sorted(unknown))}（可选 {', '.join(SCENARIOS)}）")
+
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    with FixtureGitHub(latency=args.github_latency) as stub:
+        env = {
+            'GITHUB_API_URL': stub.base_url,
+            'GITHUB_TOKEN': '', 'GITHUB_TOKENS': '',
+            'LLM_BACKEND': 'fake' if args.llm == 'fake' else 'zhipu',
+            'ZHIPUAI_API_KEY': '',
+            'REPORT_STORE_PATH': os.path.join(workdir, 'reports.sqlite3'),
+            'REPORT_STORE_ARTIFACT_MAX_BYTES': '0',  # 导出场景每次都重新渲染
+            'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+            'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.sqlite3'),
+        }
+        os.environ.update(env)
+        ctx = Context(stub.names)
+        meta = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'fixtures': stub.names,
+            'args': {key: value for key, value in vars(args).items() if key not in ('compare', 'baseline')},
+        }
+        print(f"=== 基准测试套件 ({', '.join(targets)}; 并发 {levels}; 每级 {args.requests} 个请求; "
+              f"fixture {len(stub.names)} 个) ===")
+
+        results = []
+        for target_name in targets:
+            if target_name == 'flask':
+                target = FlaskTarget()
+            elif target_name == 'gunicorn':
+                target = GunicornTarget(dict(os.environ), args.workers, args.threads)
+            else:
+                sys.exit(f"未知目标: {target_name}（可选 flask / gunicorn）")
+            # 进程内运行时丢弃应用的控制台输出，与gunicorn目标（输出重定向到/dev/null）保持一致
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                try:
+                    prepare_reports(target, ctx)
+                    for name in scenarios:
+                        for concurrency in levels:
+                            result = run_level(target, name, ctx, concurrency, args.requests)
+                            print_result(result)
+                            results.append(result)
+                finally:
+                    target.close()
+                    for handler in logging.getLogger().handlers:
+                        handler.flush()  # 应用日志由后台线程写出，离开重定向前写完
+
+    output = {'meta': meta, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=1)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.baseline:
+        print()
+        sys.exit(1 if compare(load_results(args.baseline), output, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
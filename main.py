@@ -1,5 +1,103 @@
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+
 from utils.github_client import GitHubClient
 from utils.ai_analyzer import AIAnalyzer
+from utils.batch import run_batch
+from utils.http_session import rate_limiter
+from utils.report_cache import normalize_repo_key
+from utils.watchlist import Watchlist, WATCHLIST_INTERVAL, WATCHLIST_MIN_INTERVAL
+
+def analyze_one(github_client, ai_analyzer, repo_url):
+    """获取仓库信息和README并调用AI分析，返回报告字典"""
+    if not repo_url.startswith('https://github.com/'):
+        raise ValueError("请输入正确的GitHub链接")
+    
+    repo_info = github_client.get_repo_info(repo_url)
+    if not repo_info:
+        raise ValueError("获取仓库信息失败")
+    
+    parts = repo_url.strip('/').split('/')
+    readme_content = github_client.get_readme(parts[-2], parts[-1])
+    ai_analysis = ai_analyzer.analyze_repo(repo_info, readme_content)
+    return {'repo_info': repo_info, 'ai_analysis': ai_analysis}
+
+def read_repo_urls(source):
+    """读取每行一个仓库链接的文件（- 表示标准输入），跳过空行和 # 注释"""
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    with stream:
+        urls = (line.strip() for line in stream)
+        return [url for url in urls if url and not url.startswith('#')]
+
+def batch_main(source, concurrency):
+    """批量模式: 从文件（- 表示标准输入）读取仓库链接，结果以NDJSON逐行输出到标准输出"""
+    repo_urls = read_repo_urls(source)
+    
+    out = sys.stdout
+    # 进度提示改写到标准错误，保证标准输出是干净的NDJSON
+    with redirect_stdout(sys.stderr):
+        github_client = GitHubClient()
+        ai_analyzer = AIAnalyzer()
+        print(f"🔄 批量分析 {len(repo_urls)} 个仓库 (并发: {concurrency})")
+        analyze = lambda repo_url: analyze_one(github_client, ai_analyzer, repo_url)
+        for item in run_batch(repo_urls, analyze, concurrency=concurrency, quota=rate_limiter):
+            out.write(json.dumps(item, ensure_ascii=False) + '\n')
+            out.flush()
+
+def repo_key(repo_url):
+    parts = repo_url.strip('/').split('/')
+    return normalize_repo_key(parts[-2], parts[-1])
+
+def watchlist_main(args):
+    """关注列表: 加入/取消关注、列出条目、读取预先生成的报告（只读本地存储，不访问GitHub），或在前台运行定期刷新"""
+    if args.refresher:
+        # 定期刷新使用Web服务的分析流程（增量分析、报告存储、LLM补充分析）
+        from app import watchlist
+        print(f"🔄 关注列表定期刷新已启动 ({watchlist.workers} 个线程)，按 Ctrl+C 停止", file=sys.stderr)
+        watchlist.start()
+        try:
+            while True:
+                time.sleep(60)
+                print(json.dumps(watchlist.stats(), ensure_ascii=False), file=sys.stderr)
+        except KeyboardInterrupt:
+            return 0
+    
+    watchlist = Watchlist(refresh=None)
+    if args.watch:
+        repo_urls = read_repo_urls(args.watch)
+        invalid = [url for url in repo_urls if not url.startswith('https://github.com/')]
+        if invalid:
+            print(f"❌ 不是GitHub仓库链接: {', '.join(invalid)}", file=sys.stderr)
+            return 1
+        if args.interval < WATCHLIST_MIN_INTERVAL:
+            print(f"❌ 刷新间隔不能小于 {WATCHLIST_MIN_INTERVAL} 秒", file=sys.stderr)
+            return 1
+        for repo_url in repo_urls:
+            watchlist.add(repo_key(repo_url), repo_url, args.interval, args.depth)
+        print(f"✅ 已关注 {len(repo_urls)} 个仓库，每 {args.interval} 秒刷新", file=sys.stderr)
+    elif args.unwatch:
+        if not watchlist.remove(repo_key(args.unwatch)):
+            print("❌ 仓库不在关注列表中", file=sys.stderr)
+            return 1
+    elif args.show:
+        report = watchlist.report(repo_key(args.show))
+        if report is None:
+            print("❌ 没有该仓库预先生成的报告（未关注或尚未刷新）", file=sys.stderr)
+            return 1
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        offset = 0
+        while True:
+            entries = watchlist.entries(limit=1000, offset=offset)
+            for entry in entries:
+                print(json.dumps(entry, ensure_ascii=False))
+            if len(entries) < 1000:
+                break
+            offset += 1000
+    return 0
 
 def main():
     print("=== 🚀 GitHub Repo AI分析师 ===")
@@ -56,4 +154,22 @@ def main():
         print("=" * 50)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="GitHub Repo AI分析师")
+    parser.add_argument('--batch', metavar='FILE', help="批量分析: 每行一个仓库链接的文件，- 表示标准输入")
+    parser.add_argument('--concurrency', type=int, default=4, help="批量分析的并发数")
+    watch = parser.add_argument_group("关注列表")
+    watch.add_argument('--watch', metavar='FILE', help="关注文件中的仓库（每行一个链接，- 表示标准输入）")
+    watch.add_argument('--interval', type=int, default=WATCHLIST_INTERVAL, help="关注仓库的刷新间隔（秒）")
+    watch.add_argument('--depth', choices=('metadata', 'code'), default='metadata', help="关注仓库的分析深度")
+    watch.add_argument('--unwatch', metavar='URL', help="取消关注")
+    watch.add_argument('--watchlist', action='store_true', help="以NDJSON列出关注的仓库及刷新状态")
+    watch.add_argument('--show', metavar='URL', help="输出关注仓库预先生成的报告（不访问GitHub）")
+    watch.add_argument('--refresher', action='store_true', help="在前台运行关注列表的定期刷新")
+    args = parser.parse_args()
+    
+    if args.watch or args.unwatch or args.watchlist or args.show or args.refresher:
+        sys.exit(watchlist_main(args))
+    elif args.batch:
+        batch_main(args.batch, max(1, args.concurrency))
+    else:
+        main()
\ No newline at end of file
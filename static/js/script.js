@@ -20,6 +20,11 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // 超时设置（30秒）
     const REQUEST_TIMEOUT = 30000;
+    // 流式分析的空闲超时：只要服务器还在推送内容或心跳就不会中断（60秒）
+    const STREAM_IDLE_TIMEOUT = 60000;
+    // 后台任务的轮询间隔与最长等待时间（10分钟）
+    const JOB_POLL_INTERVAL = 1000;
+    const JOB_MAX_WAIT = 600000;
     let currentRequestController = null;
 
     // 输入动画
@@ -96,14 +101,23 @@ document.addEventListener('DOMContentLoaded', function() {
         updateLoadingStatus('正在连接GitHub API...');
 
         try {
-            console.log("📡 发送请求到服务器:", repoUrl);
+            if (window.EventSource) {
+                // 流式分析：报告边生成边显示，不再受整体超时限制
+                clearTimeout(timeoutId);
+                const data = await streamAnalysis(repoUrl, currentRequestController);
+                showNotification(`分析完成！首字 ${data.time_to_first_token ?? '未知'} 秒，耗时 ${data.processing_time || '未知'} 秒`, 'success');
+                return;
+            }
+
+            // 不支持流式时提交后台任务并轮询结果，分析耗时不再受单次请求超时限制
+            console.log("📡 提交分析任务:", repoUrl);
             
             const response = await fetch('/analyze', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ repo_url: repoUrl }),
+                body: JSON.stringify({ repo_url: repoUrl, async: true }),
                 signal: currentRequestController.signal
             });
 
@@ -116,8 +130,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(errorData.error || `服务器错误: ${response.status}`);
             }
 
-            const data = await response.json();
-            console.log("✅ 收到服务器响应数据");
+            const job = await response.json();
+            console.log("📥 分析任务已提交:", job.report_id);
+            const data = await pollReport(job.report_id, currentRequestController);
+            console.log("✅ 收到分析结果");
 
             // 显示结果
             displayResult(data);
@@ -147,6 +163,93 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // 轮询后台分析任务，直到完成或失败
+    async function pollReport(reportId, controller) {
+        const deadline = Date.now() + JOB_MAX_WAIT;
+        while (Date.now() < deadline) {
+            const response = await fetch(`/report/${reportId}`, { signal: controller.signal });
+            const job = await response.json().catch(() => ({}));
+            if (!response.ok) {
+                throw new Error(job.error || `服务器错误: ${response.status}`);
+            }
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'error') {
+                throw new Error(job.error || '分析失败');
+            }
+            updateLoadingStatus(job.status === 'queued' ? `排队中（第 ${job.position} 位）...` : '正在分析仓库...');
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
+        throw new DOMException('分析超时', 'AbortError');
+    }
+
+    // 通过SSE接收流式分析结果，逐段渲染报告
+    function streamAnalysis(repoUrl, controller) {
+        return new Promise((resolve, reject) => {
+            console.log("📡 建立流式连接:", repoUrl);
+            const source = new EventSource(`/analyze/stream?repo_url=${encodeURIComponent(repoUrl)}`);
+            let reportData = null;
+            let analysisElement = null;
+            let idleTimer = null;
+
+            const finish = (error, data) => {
+                clearTimeout(idleTimer);
+                source.close();
+                error ? reject(error) : resolve(data);
+            };
+
+            // 收到任何事件（包括心跳）都重置空闲计时
+            const resetIdleTimer = () => {
+                clearTimeout(idleTimer);
+                idleTimer = setTimeout(() => controller.abort(), STREAM_IDLE_TIMEOUT);
+            };
+            resetIdleTimer();
+
+            controller.signal.addEventListener('abort', () => {
+                finish(new DOMException('分析已中止', 'AbortError'));
+            });
+
+            source.addEventListener('meta', (e) => {
+                resetIdleTimer();
+                reportData = { ...JSON.parse(e.data), ai_analysis: '' };
+                updateLoadingStatus('正在生成AI分析报告...');
+                displayResult(reportData);
+                if (loadingDiv) {
+                    loadingDiv.classList.add('hidden');
+                }
+                analysisElement = resultDiv ? resultDiv.querySelector('.analysis-content') : null;
+            });
+
+            source.addEventListener('token', (e) => {
+                resetIdleTimer();
+                const { text } = JSON.parse(e.data);
+                reportData.ai_analysis += text;
+                if (analysisElement) {
+                    analysisElement.textContent += text;
+                }
+            });
+
+            source.addEventListener('ping', resetIdleTimer);
+
+            source.addEventListener('done', (e) => {
+                const summary = JSON.parse(e.data);
+                reportData.processing_time = summary.processing_time;
+                window.currentReportData = reportData;
+                finish(null, summary);
+            });
+
+            source.addEventListener('analysis_error', (e) => {
+                finish(new Error(JSON.parse(e.data).error || '分析失败'));
+            });
+
+            // 连接层面的错误（服务器不可达、连接被中断）
+            source.onerror = () => {
+                finish(new Error('与服务器的连接中断'));
+            };
+        });
+    }
+
     function updateLoadingStatus(message) {
         console.log("📊 更新加载状态:", message);
         if (loadingStatus) {
@@ -157,7 +260,11 @@ document.addEventListener('DOMContentLoaded', function() {
     function displayResult(data) {
         console.log("🎨 开始显示分析结果");
         
-        const { repo_info, ai_analysis, analyzed_at, processing_time } = data;
+        const { repo_info, ai_analysis, analyzed_at, processing_time, trend } = data;
+        // 增长趋势：优先显示近30天的星标变化，历史不足30天时显示已有的最长窗口
+        const changes = (trend && trend.changes) || {};
+        const trendWindow = ['30d', '90d', '7d'].find((w) => changes[w]);
+        const trendChange = trendWindow ? changes[trendWindow] : null;
         
         const resultHTML = `
             <div class="repo-header">
@@ -203,6 +310,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     <span><i class="fas fa-sync-alt"></i> 更新: ${repo_info.updated_at}</span>
                     <span><i class="fas fa-clock"></i> 分析: ${analyzed_at}</span>
                     ${processing_time ? `<span><i class="fas fa-rocket"></i> 耗时: ${processing_time}s</span>` : ''}
+                    ${trendChange ? `<span><i class="fas fa-chart-line"></i> 近${parseInt(trendWindow)}天星标: ${trendChange.stars >= 0 ? '+' : ''}${trendChange.stars.toLocaleString()}（${trendChange.stars_per_day}/天）</span>` : ''}
                 </div>
             </div>
 
@@ -307,13 +415,17 @@ document.addEventListener('DOMContentLoaded', function() {
         try {
             showNotification(`正在生成${format.toUpperCase()}报告...`, 'info');
             
-            const response = await fetch(`/export/${format}`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(window.currentReportData)
-            });
+            // 优先按报告ID导出，服务器直接使用已保存的报告；报告已过期时再回传完整数据
+            let response = await fetch(`/export/${window.currentReportData.report_id}/${format}`);
+            if (response.status === 404) {
+                response = await fetch(`/export/${format}`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(window.currentReportData)
+                });
+            }
 
             if (!response.ok) {
                 throw new Error('导出失败');
@@ -1,31 +1,59 @@
+import logging
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-from zhipuai import ZhipuAI  # 确保正确导入
+
+from utils.readme_digest import digest_readme
+from utils.llm_cache import cache_key, bucket_count, create_llm_cache
+from utils.llm_gateway import get_llm_gateway
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv('LLM_MODEL', 'glm-4')
+LLM_PARAMS = {'top_p': 0.7, 'temperature': 0.9}
+
+# 进程内共享的LLM响应缓存（SQLite文件可被多个worker共享）
+_llm_cache = create_llm_cache()
+
+def llm_cache_stats():
+    """供监控使用的LLM缓存统计"""
+    return _llm_cache.stats() if _llm_cache is not None else {'enabled': False}
+
 class AIAnalyzer:
     def __init__(self):
-        # 设置智谱AI的API Key
-        self.api_key = os.getenv('ZHIPUAI_API_KEY')
-        
-        # 使用新版本的ZhipuAI客户端
+        # 所有分析器共用进程内的LLM网关（同一个后端和连接池，统一限制并发）；后端由 LLM_BACKEND 选择
         try:
-            self.client = ZhipuAI(api_key=self.api_key)
-            print("✅ AI分析器准备就绪！(使用新版本SDK)")
+            self.gateway = get_llm_gateway()
+            if self.gateway is None:
+                raise ValueError("未配置ZHIPUAI_API_KEY")
+            logger.info("AI分析器准备就绪", extra={'backend': self.gateway.backend.name})
         except ImportError:
-            print("❌ 请安装zhipuai库: pip install zhipuai")
-            self.client = None
+            logger.error("请安装zhipuai库: pip install zhipuai")
+            self.gateway = None
         except Exception as e:
-            print(f"❌ AI分析器初始化失败: {e}")
-            self.client = None
+            logger.error("AI分析器初始化失败", extra={'error': str(e)})
+            self.gateway = None
     
-    def analyze_repo(self, repo_info, readme_content):
-        """让AI分析仓库"""
-        
-        if not self.client:
-            return "AI分析器未正确初始化，请检查配置"
-        
+    def _prepare(self, repo_info, readme_content):
+        """返回 (提示词, 缓存键)；README按章节筛选后压缩到固定的token预算内，
+        缓存键中的星标/Fork数按 LLM_CACHE_DRIFT 分桶，小幅变化仍能命中"""
+        readme_digest = digest_readme(readme_content)
+        prompt = self._format_prompt(repo_info, readme_digest)
+        normalized = dict(repo_info, stars=bucket_count(repo_info['stars']), forks=bucket_count(repo_info['forks']))
+        model = self.gateway.backend.cache_prefix + LLM_MODEL
+        return prompt, cache_key(model, self._format_prompt(normalized, readme_digest), LLM_PARAMS)
+    
+    def _cache_get(self, key):
+        return _llm_cache.get(key) if _llm_cache is not None else None
+    
+    def _cache_set(self, key, response, latency):
+        if _llm_cache is not None and response:
+            _llm_cache.set(key, LLM_MODEL, response, latency)
+    
+    def _format_prompt(self, repo_info, readme_digest):
         # 准备要分析的信息
         repo_data = f"""
 仓库名称: {repo_info['full_name']}
@@ -33,11 +61,12 @@ class AIAnalyzer:
 主要语言: {repo_info['language']}
 星标数: {repo_info['stars']}
 Fork数: {repo_info['forks']}
-README内容: {readme_content[:1000]}  # 只取前1000字避免太长
+README摘要:
+{readme_digest}
 """
         
         # 让AI分析
-        prompt = f"""
+        return f"""
 请你作为一个资深技术专家，分析这个GitHub仓库：
 
 {repo_data}
@@ -50,16 +79,63 @@ README内容: {readme_content[:1000]}  # 只取前1000字避免太长
 
 请用通俗易懂的语言回答，不要太技术化。
 """
+    
+    def analyze_repo(self, repo_info, readme_content, deadline=None):
+        """让AI分析仓库；deadline 为整个调用（含排队和重试）的截止时间戳"""
+        
+        if not self.gateway:
+            return "AI分析器未正确初始化，请检查配置"
+        
+        prompt, key = self._prepare(repo_info, readme_content)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.client.chat.completions.create(
-                model="glm-4",  # 更新模型名称
-                messages=[{"role": "user", "content": prompt}],
-                top_p=0.7,
-                temperature=0.9,
-            )
-            
-            return response.choices[0].message.content
+            start_time = time.time()
+            content = self.gateway.complete([{"role": "user", "content": prompt}], deadline,
+                                            model=LLM_MODEL, **LLM_PARAMS)
+            self._cache_set(key, content, time.time() - start_time)
+            return content
                 
         except Exception as e:
             return f"调用AI时出错: {str(e)}"
+    
+    def analyze_repo_stream(self, repo_info, readme_content, deadline=None):
+        """流式分析仓库，逐段产出AI生成的文本；出错时抛出异常，由调用方处理"""
+        if not self.gateway:
+            raise RuntimeError("AI分析器未正确初始化，请检查配置")
+        
+        prompt, key = self._prepare(repo_info, readme_content)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        start_time = time.time()
+        parts = []
+        for text in self.gateway.stream([{"role": "user", "content": prompt}], deadline,
+                                        model=LLM_MODEL, **LLM_PARAMS):
+            parts.append(text)
+            yield text
+        # 只缓存完整生成的回答；调用方中途停止消费时不会执行到这里
+        self._cache_set(key, ''.join(parts), time.time() - start_time)
+    
+    async def analyze_repo_stream_async(self, repo_info, readme_content, http_client, deadline=None):
+        """异步流式分析，与同步调用共用网关的并发限制"""
+        if not self.gateway:
+            raise RuntimeError("AI分析器未正确初始化，请检查配置")
+        
+        prompt, key = self._prepare(repo_info, readme_content)
+        cached = await asyncio.to_thread(self._cache_get, key)
+        if cached is not None:
+            yield cached
+            return
+        
+        start_time = time.time()
+        parts = []
+        async for text in self.gateway.stream_async([{'role': 'user', 'content': prompt}], http_client, deadline,
+                                                    model=LLM_MODEL, **LLM_PARAMS):
+            parts.append(text)
+            yield text
+        await asyncio.to_thread(self._cache_set, key, ''.join(parts), time.time() - start_time)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from utils import http_session
+from utils.http_session import RATE_LIMIT_ATTEMPTS, HTTP_RETRY_TOTAL, GITHUB_GRAPHQL_URL, get_response_cache
+from utils.metrics import count_upstream
+from utils.rate_limiter import GITHUB_RATE_MAX_WAIT, SECONDARY_BACKOFF_MIN, RateLimitExceeded, is_rate_limited
+
+# 异步模式下单个进程可以同时保持上百个在途请求，连接数上限单独配置
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', '200'))
+
+_clients = {}
+
+
+def get_async_client():
+    """获取当前事件循环共享的httpx.AsyncClient（连接池 + keep-alive）"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS),
+            transport=httpx.AsyncHTTPTransport(retries=HTTP_RETRY_TOTAL),
+        )
+    return client
+
+
+async def close_async_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def acquire_quota(cost=1, max_wait=GITHUB_RATE_MAX_WAIT, limiter=None):
+    """异步等待配额调度器放行，返回要使用的令牌"""
+    limiter = limiter or http_session.rate_limiter
+    deadline = time.time() + max_wait
+    while True:
+        ok, token, wait = limiter.try_acquire(cost)
+        if ok:
+            return token
+        if time.time() + wait > deadline:
+            raise RateLimitExceeded(wait)
+        await asyncio.sleep(min(wait, 1.0))
+
+
+async def _fetch(url, headers, timeout, json_body=None, limiter=None, max_wait=GITHUB_RATE_MAX_WAIT):
+    """与 http_session._fetch 相同的调度逻辑，只是用异步客户端发出请求"""
+    rate_limiter = limiter or http_session.rate_limiter
+    upstream = 'github' if json_body is None else 'github_graphql'
+    for _ in range(RATE_LIMIT_ATTEMPTS):
+        token = await acquire_quota(max_wait=max_wait, limiter=rate_limiter)
+        request_headers = dict(headers or {})
+        if token:
+            request_headers['Authorization'] = f'token {token}'
+        try:
+            if json_body is None:
+                response = await get_async_client().get(url, headers=request_headers, timeout=timeout)
+            else:
+                response = await get_async_client().post(url, json=json_body, headers=request_headers,
+                                                         timeout=timeout)
+        except Exception:
+            rate_limiter.release(token)
+            count_upstream(upstream, 'error')
+            raise
+        count_upstream(upstream, response.status_code)
+        rate_limiter.complete(token, response.status_code, response.headers)
+        if not is_rate_limited(response.status_code, response.headers):
+            return response
+    raise RateLimitExceeded(float(response.headers.get('Retry-After') or SECONDARY_BACKOFF_MIN))
+
+
+async def async_github_get(url, headers=None, timeout=None):
+    """github_get 的异步版本：共享同一个配额调度器和响应缓存"""
+    async def fetch(request_url, request_headers):
+        return await _fetch(request_url, request_headers, timeout)
+
+    cache = get_response_cache()
+    if cache is None:
+        return await fetch(url, headers)
+    return await cache.aget(url, fetch, headers=headers)
+
+
+async def async_github_graphql(query, variables=None, timeout=None, max_wait=0):
+    """github_graphql 的异步版本"""
+    return await _fetch(GITHUB_GRAPHQL_URL, {'Accept': 'application/json'}, timeout,
+                        json_body={'query': query, 'variables': variables or {}},
+                        limiter=http_session.graphql_rate_limiter, max_wait=max_wait)
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 每分析一个仓库大约消耗的GitHub API调用次数（仓库信息、README、语言统计）
+CALLS_PER_REPO = 3
+
+
+def run_batch(repo_urls, analyze, concurrency=4, quota=None, max_quota_wait=None):
+    """并发执行批量分析，按完成顺序逐个产出结果
+
+    analyze(repo_url) 返回报告字典或抛出异常；quota为GitHubRateLimiter时，
+    每提交一个仓库前先确认剩余配额足够，不足则等待重置（超过 max_quota_wait 秒则跳过）。
+    单次调用的排队与限速由调度器在每个请求上完成。
+    """
+    pending = {}
+    queue = list(enumerate(repo_urls))
+    queue.reverse()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as pool:
+        while queue or pending:
+            # 补足在途任务，直到达到并发上限
+            while queue and len(pending) < concurrency:
+                index, repo_url = queue.pop()
+                if quota is not None and not quota.wait_available(CALLS_PER_REPO, max_wait=max_quota_wait):
+                    yield {'index': index, 'repo_url': repo_url, 'status': 'error',
+                           'error': 'GitHub API配额不足，请稍后重试'}
+                    continue
+                pending[pool.submit(analyze, repo_url)] = (index, repo_url)
+
+            if not pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, repo_url = pending.pop(future)
+                try:
+                    yield {'index': index, 'repo_url': repo_url, 'status': 'ok', 'report': future.result()}
+                except Exception as e:
+                    yield {'index': index, 'repo_url': repo_url, 'status': 'error', 'error': str(e)}
@@ -0,0 +1,366 @@
+import heapq
+import multiprocessing
+import os
+import posixpath
+import re
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from utils.languages import language_for
+from utils.manifests import MANIFEST_MAX_BYTES, manifest_type, parse_manifest
+
+# 加载环境变量
+load_dotenv()
+
+# 代码统计引擎配置
+def _available_cpus():
+    """本进程可用的CPU数（容器或taskset限制后的数量，而不是整机核数）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+CODE_STATS_WORKERS = int(os.getenv('CODE_STATS_WORKERS', '0')) or _available_cpus()  # 进程池大小，0表示可用CPU数；只有一个CPU时在当前进程中统计
+CODE_STATS_BATCH_BYTES = int(os.getenv('CODE_STATS_BATCH_BYTES', str(4 * 1024 * 1024)))  # 每个任务包含的文件内容大小
+CODE_STATS_MAX_FILE_BYTES = int(os.getenv('CODE_STATS_MAX_FILE_BYTES', str(2 * 1024 * 1024)))  # 超过该大小的文件只数行数，不区分注释
+BATCH_FILES = 512  # 每个任务最多包含的文件数
+LARGEST_FILES = 10  # 统计结果中列出的最大文件数
+SKIP_DIRS = {'.git', '.hg', '.svn'}
+
+# 各语言的注释语法：(行注释前缀, [(块注释开始, 块注释结束), ...])
+_C_STYLE = ((b'//',), ((b'/*', b'*/'),))
+_HASH = ((b'#',), ())
+_MARKUP = ((), ((b'<!--', b'-->'),))
+COMMENT_SYNTAX = {
+    **dict.fromkeys(('C', 'C++', 'C#', 'Java', 'JavaScript', 'TypeScript', 'Go', 'Rust', 'Kotlin', 'Scala', 'Swift',
+                     'Dart', 'Groovy', 'Objective-C', 'Objective-C++', 'Solidity', 'Protocol Buffer', 'SCSS', 'Less',
+                     'Sass'), _C_STYLE),
+    **dict.fromkeys(('Python', 'Cython', 'Shell', 'Ruby', 'Perl', 'R', 'Julia', 'Nim', 'Elixir', 'YAML', 'TOML',
+                     'Makefile', 'Dockerfile', 'CMake', 'GraphQL'), _HASH),
+    **dict.fromkeys(('HTML', 'XML', 'Vue', 'Svelte', 'Markdown'), _MARKUP),
+    'CSS': ((), ((b'/*', b'*/'),)),
+    'PHP': ((b'//', b'#'), ((b'/*', b'*/'),)),
+    'Zig': ((b'//',), ()),
+    'F#': ((b'//',), ((b'(*', b'*)'),)),
+    'OCaml': ((), ((b'(*', b'*)'),)),
+    'SQL': ((b'--',), ((b'/*', b'*/'),)),
+    'Lua': ((b'--',), ((b'--[[', b']]'),)),
+    'Haskell': ((b'--',), ((b'{-', b'-}'),)),
+    'PowerShell': ((b'#',), ((b'<#', b'#>'),)),
+    'Batchfile': ((b'REM ', b'rem ', b'::'), ()),
+    'INI': ((b';', b'#'), ()),
+    'TeX': ((b'%',), ()),
+    'Erlang': ((b'%',), ()),
+    'Clojure': ((b';',), ()),
+}
+
+# shebang中的解释器 -> 语言（没有可识别扩展名的脚本）
+SHEBANGS = {
+    'python': 'Python', 'node': 'JavaScript', 'deno': 'TypeScript', 'ts-node': 'TypeScript',
+    'sh': 'Shell', 'bash': 'Shell', 'zsh': 'Shell', 'dash': 'Shell', 'ksh': 'Shell',
+    'ruby': 'Ruby', 'perl': 'Perl', 'php': 'PHP', 'lua': 'Lua', 'Rscript': 'R', 'julia': 'Julia',
+    'pwsh': 'PowerShell', 'elixir': 'Elixir', 'escript': 'Erlang',
+}
+
+# 依赖名 -> 框架名；Go模块按路径前缀匹配
+FRAMEWORKS = {
+    'pip': {'django': 'Django', 'flask': 'Flask', 'fastapi': 'FastAPI', 'tornado': 'Tornado', 'quart': 'Quart',
+            'aiohttp': 'aiohttp', 'starlette': 'Starlette', 'celery': 'Celery', 'sqlalchemy': 'SQLAlchemy',
+            'torch': 'PyTorch', 'tensorflow': 'TensorFlow', 'jax': 'JAX', 'scikit-learn': 'scikit-learn',
+            'pandas': 'pandas', 'numpy': 'NumPy', 'transformers': 'Transformers', 'streamlit': 'Streamlit',
+            'scrapy': 'Scrapy', 'pytest': 'pytest'},
+    'npm': {'react': 'React', 'vue': 'Vue', '@angular/core': 'Angular', 'svelte': 'Svelte', 'next': 'Next.js',
+            'nuxt': 'Nuxt', 'express': 'Express', 'koa': 'Koa', '@nestjs/core': 'NestJS', 'fastify': 'Fastify',
+            'electron': 'Electron', 'react-native': 'React Native', 'vite': 'Vite', 'webpack': 'webpack',
+            'jest': 'Jest', 'typescript': 'TypeScript', 'tailwindcss': 'Tailwind CSS'},
+    'go': {'github.com/gin-gonic/gin': 'Gin', 'github.com/labstack/echo': 'Echo', 'github.com/gofiber/fiber': 'Fiber',
+           'github.com/gorilla/mux': 'Gorilla', 'google.golang.org/grpc': 'gRPC', 'gorm.io/gorm': 'GORM',
+           'github.com/spf13/cobra': 'Cobra', 'k8s.io/client-go': 'Kubernetes client-go'},
+    'cargo': {'actix-web': 'Actix Web', 'axum': 'Axum', 'rocket': 'Rocket', 'tokio': 'Tokio', 'serde': 'Serde',
+              'clap': 'clap', 'bevy': 'Bevy', 'tauri': 'Tauri', 'diesel': 'Diesel'},
+    'bundler': {'rails': 'Ruby on Rails', 'sinatra': 'Sinatra', 'rspec': 'RSpec'},
+    'composer': {'laravel/framework': 'Laravel', 'symfony/symfony': 'Symfony', 'slim/slim': 'Slim'},
+    'maven': {'org.springframework.boot:spring-boot-starter': 'Spring Boot', 'junit:junit': 'JUnit'},
+}
+FRAMEWORKS['pipenv'] = FRAMEWORKS['pip']
+FRAMEWORKS['gradle'] = FRAMEWORKS['maven']
+
+_SHEBANG_VERSION = re.compile(rb'[\d.]+$')
+
+
+def detect_language(path, head):
+    """按文件名识别语言，识别不了时读取shebang（head为文件开头的内容）"""
+    language = language_for(path)
+    if language or not head.startswith(b'#!'):
+        return language
+    parts = head[2:].split(b'\n', 1)[0].split()
+    if not parts:
+        return None
+    interpreter = posixpath.basename(parts[0])
+    if interpreter == b'env':
+        interpreter = next((part for part in parts[1:] if not part.startswith(b'-')), b'')
+    return SHEBANGS.get(_SHEBANG_VERSION.sub(b'', interpreter).decode('ascii', 'replace'))
+
+
+def count_lines(language, data):
+    """统计 (代码行, 注释行, 空行)；不识别字符串中的注释符号，块注释所在的行整行算作注释"""
+    line_prefixes, blocks = COMMENT_SYNTAX.get(language, ((), ()))
+    code = comment = blank = 0
+    block_end = None
+    for line in data.splitlines():
+        line = line.strip()
+        if block_end is not None:
+            comment += 1
+            if block_end in line:
+                block_end = None
+            continue
+        if not line:
+            blank += 1
+            continue
+        for start, end in blocks:
+            if line.startswith(start):
+                comment += 1
+                if end not in line[len(start):]:
+                    block_end = end
+                break
+        else:
+            if line_prefixes and line.startswith(line_prefixes):
+                comment += 1
+                continue
+            code += 1
+            for start, end in blocks:
+                position = line.find(start)
+                if position > 0 and end not in line[position + len(start):]:
+                    block_end = end  # 代码行末尾开始的块注释
+                    break
+    return code, comment, blank
+
+
+def _count_newlines(chunks):
+    """只数行数（超大文件）：最后一行没有换行符时也算一行"""
+    lines, last = 0, b''
+    for chunk in chunks:
+        lines += chunk.count(b'\n')
+        last = chunk
+    return lines + (1 if last and not last.endswith(b'\n') else 0)
+
+
+class StatsAccumulator:
+    """累计一批文件的统计；进程池中每个任务各自累计，最后在主进程中合并"""
+
+    def __init__(self):
+        self.files = self.bytes = self.binary_files = 0
+        self.languages = {}
+        self.largest = []  # 小顶堆，保留最大的 LARGEST_FILES 个文件
+        self.manifests = []
+
+    def _add_size(self, path, size):
+        self.files += 1
+        self.bytes += size
+        item = (size, path)
+        if len(self.largest) < LARGEST_FILES:
+            heapq.heappush(self.largest, item)
+        elif item > self.largest[0]:
+            heapq.heapreplace(self.largest, item)
+
+    def _add_lines(self, language, size, code, comment, blank):
+        entry = self.languages.setdefault(language, {'files': 0, 'code': 0, 'comment': 0, 'blank': 0, 'bytes': 0})
+        entry['files'] += 1
+        entry['code'] += code
+        entry['comment'] += comment
+        entry['blank'] += blank
+        entry['bytes'] += size
+
+    def add_file(self, path, data, size=None):
+        """统计一个文件的完整内容（bytes）"""
+        size = len(data) if size is None else size
+        self._add_size(path, size)
+        kind = manifest_type(path)
+        if kind and size <= MANIFEST_MAX_BYTES:
+            self.manifests.append({'path': path, 'type': kind, 'dependencies': parse_manifest(path, data)})
+        if b'\0' in data[:8192]:
+            self.binary_files += 1
+            return
+        language = detect_language(path, data[:256])
+        self._add_lines(language, size, *count_lines(language, data))
+
+    def add_large_file(self, path, size, head, chunks):
+        """超过 CODE_STATS_MAX_FILE_BYTES 的文件：分块读取，只数行数（都算作代码行）"""
+        self._add_size(path, size)
+        if b'\0' in head[:8192]:
+            self.binary_files += 1
+            return
+        self._add_lines(detect_language(path, head[:256]), size, _count_newlines(_prepend(head, chunks)), 0, 0)
+
+    def merge(self, other):
+        self.files += other.files
+        self.bytes += other.bytes
+        self.binary_files += other.binary_files
+        for language, counts in other.languages.items():
+            entry = self.languages.setdefault(language, {'files': 0, 'code': 0, 'comment': 0, 'blank': 0, 'bytes': 0})
+            for name, value in counts.items():
+                entry[name] += value
+        for item in other.largest:
+            if len(self.largest) < LARGEST_FILES:
+                heapq.heappush(self.largest, item)
+            elif item > self.largest[0]:
+                heapq.heapreplace(self.largest, item)
+        self.manifests += other.manifests
+
+    def result(self):
+        """汇总为报告中的 code_stats 字段；无法识别语言的文本文件计入总行数，不出现在 languages 中"""
+        totals = {name: sum(counts[name] for counts in self.languages.values()) for name in ('code', 'comment', 'blank')}
+        languages = {language: dict(counts, lines=counts['code'] + counts['comment'] + counts['blank'])
+                     for language, counts in sorted(self.languages.items(), key=lambda item: -item[1]['code'])
+                     if language is not None}
+        manifests = sorted(self.manifests, key=lambda manifest: manifest['path'])
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'lines': sum(totals.values()),
+            **totals,
+            'binary_files': self.binary_files,
+            'languages': languages,
+            'largest_files': [{'path': path, 'bytes': size} for size, path in sorted(self.largest, reverse=True)],
+            'manifests': manifests,
+            'frameworks': detect_frameworks(manifests),
+        }
+
+
+def _prepend(head, chunks):
+    yield head
+    yield from chunks
+
+
+def detect_frameworks(manifests):
+    """根据依赖清单中的依赖名识别框架，按首次出现的顺序返回框架名列表"""
+    found = {}
+    for manifest in manifests:
+        known = FRAMEWORKS.get(manifest['type'], {})
+        for dependency in manifest['dependencies']:
+            name = known.get(dependency.lower()) if manifest['type'] != 'go' else next(
+                (framework for prefix, framework in known.items() if dependency.startswith(prefix)), None)
+            if name:
+                found.setdefault(name, None)
+    return list(found)
+
+
+def count_batch(items):
+    """进程池任务：统计一批 (路径, 内容)"""
+    accumulator = StatsAccumulator()
+    for path, data in items:
+        accumulator.add_file(path, data)
+    return accumulator
+
+
+def scan_paths(root, paths):
+    """进程池任务：读取并统计目录树中的一批文件（相对路径）"""
+    accumulator = StatsAccumulator()
+    for path in paths:
+        try:
+            with open(os.path.join(root, path), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > CODE_STATS_MAX_FILE_BYTES:
+                    head = f.read(8192)
+                    accumulator.add_large_file(path, size, head, iter(lambda: f.read(1024 * 1024), b''))
+                else:
+                    accumulator.add_file(path, f.read(), size)
+        except OSError:
+            continue  # 扫描过程中被删除或无权限读取
+    return accumulator
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# 进程池在多线程的Web worker中创建，fork时其他线程持有的锁（日志队列、SQLite缓存、连接池）会原样带进子进程导致死锁，
+# 因此用forkserver（不支持时用spawn）启动子进程
+_mp_context = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def get_pool():
+    """延迟创建进程内共享的进程池（CODE_STATS_WORKERS 个进程）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=CODE_STATS_WORKERS, mp_context=_mp_context)
+    return _pool
+
+
+def _reset_pool(broken):
+    """子进程异常退出后进程池不能再用，丢弃它，下次调用时重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def run_batches(func, batches, workers=CODE_STATS_WORKERS, pool=None):
+    """把每个批次的参数元组交给进程池执行并合并结果；同时在途的任务不超过进程数的2倍，内存占用不随仓库大小增长。
+    workers 为1时在当前进程中执行；与配置不同的 workers 使用临时进程池"""
+    total = StatsAccumulator()
+    if workers <= 1:
+        for args in batches:
+            total.merge(func(*args))
+        return total
+    if pool is None and workers != CODE_STATS_WORKERS:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context) as own_pool:
+            return run_batches(func, batches, workers, own_pool)
+    pool = pool or get_pool()
+    pending = deque()
+    try:
+        for args in batches:
+            pending.append(pool.submit(func, *args))
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    total.merge(future.result())
+        for future in pending:
+            total.merge(future.result())
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+    finally:
+        for future in pending:
+            future.cancel()  # 读取出错时不再统计剩余的批次
+    return total
+
+
+def walk_files(root):
+    """按目录顺序产出仓库中所有普通文件的相对路径（跳过版本控制目录，不跟随符号链接）"""
+    stack = ['']
+    while stack:
+        relative = stack.pop()
+        try:
+            entries = sorted(os.scandir(os.path.join(root, relative)), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            path = posixpath.join(relative, entry.name) if relative else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    stack.append(path)
+            elif entry.is_file(follow_symlinks=False):
+                yield path
+
+
+def scan_tree(root, workers=CODE_STATS_WORKERS, pool=None):
+    """用进程池统计目录树中的代码：按语言统计代码/注释/空行，并从依赖清单识别框架"""
+    def batches():
+        batch = []
+        for path in walk_files(root):
+            batch.append(path)
+            if len(batch) >= BATCH_FILES:
+                yield root, batch
+                batch = []
+        if batch:
+            yield root, batch
+
+    return run_batches(scan_paths, batches(), workers, pool).result()
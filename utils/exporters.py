@@ -0,0 +1,237 @@
+import itertools
+import os
+import re
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from dotenv import load_dotenv
+
+from utils.metrics import stage
+
+# 加载环境变量
+load_dotenv()
+
+# 导出配置
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', str(1024 * 1024)))  # 超过该大小的导出文件改写到临时文件
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', str(64 * 1024)))  # 流式发送时每块的字节数
+EXPORT_PDF_FONT = os.getenv('EXPORT_PDF_FONT', '')  # 含中文字形的TTF字体路径；未设置时无法编码的字符显示为 ?
+
+
+class Exporter:
+    """一种导出格式: render(report, out) 把报告写入二进制文件对象 out"""
+
+    def __init__(self, name, render, mimetype, extension):
+        self.name = name
+        self.render = render
+        self.mimetype = mimetype
+        self.extension = extension
+
+    def filename(self, report):
+        return f"github_report_{report['repo_info']['name']}.{self.extension}"
+
+
+EXPORTERS = {}
+
+
+def register_exporter(name, mimetype, extension):
+    """注册导出格式的装饰器"""
+    def decorator(render):
+        EXPORTERS[name] = Exporter(name, render, mimetype, extension)
+        return render
+    return decorator
+
+
+def get_exporter(format_type):
+    return EXPORTERS.get(format_type)
+
+
+def render_export(report, format_type):
+    """渲染到内存缓冲区（超过 EXPORT_SPOOL_MAX_BYTES 自动转存临时文件），返回 (文件对象, 字节数)，读指针位于开头"""
+    buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    try:
+        with stage('export_render'):
+            EXPORTERS[format_type].render(report, buffer)
+        size = buffer.tell()
+        buffer.seek(0)
+        return buffer, size
+    except Exception:
+        buffer.close()
+        raise
+
+
+def iter_chunks(fileobj, chunk_size=EXPORT_CHUNK_SIZE):
+    """按块读出文件对象的内容，读完后关闭（临时文件随之删除）"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _basic_info_lines(report):
+    repo_info = report['repo_info']
+    return [
+        ('仓库名称', repo_info['full_name']),
+        ('描述', repo_info['description'] or '无描述'),
+        ('主要语言', repo_info['language']),
+        ('星标数', repo_info['stars']),
+        ('Fork数', repo_info['forks']),
+        ('未解决问题', repo_info['open_issues']),
+        ('创建时间', repo_info['created_at']),
+        ('最后更新', repo_info['updated_at']),
+    ]
+
+
+def _trend_lines(report):
+    """增长趋势各窗口的变化；历史数据不足（或报告中没有趋势）时为空"""
+    changes = (report.get('trend') or {}).get('changes') or {}
+    return [(f"近{window[:-1]}天", f"星标 {change['stars']:+d}（每天 {change['stars_per_day']}），"
+                                  f"Fork {change['forks']:+d}，问题 {change['open_issues']:+d}"
+                                  + (f"（数据覆盖 {change['span_days']} 天）" if change['span_days'] < int(window[:-1]) - 1 else ''))
+            for window, change in changes.items()]
+
+
+@register_exporter('markdown', 'text/markdown', 'md')
+def generate_markdown(data, out):
+    repo_info = data['repo_info']
+    out.write(f"# GitHub仓库分析报告 - {repo_info['full_name']}\n\n## 📊 基本信息\n\n".encode('utf-8'))
+    for label, value in _basic_info_lines(data):
+        out.write(f"- **{label}**: {value}\n".encode('utf-8'))
+    trend = _trend_lines(data)
+    if trend:
+        out.write("\n## 📈 增长趋势\n\n".encode('utf-8'))
+        for label, value in trend:
+            out.write(f"- **{label}**: {value}\n".encode('utf-8'))
+    out.write("\n## 🤖 AI分析报告\n\n".encode('utf-8'))
+    out.write(data['ai_analysis'].encode('utf-8'))
+    out.write(f"\n\n---\n\n*分析时间: {data['analyzed_at']}*\n".encode('utf-8'))
+
+
+@register_exporter('pdf', 'application/pdf', 'pdf')
+def generate_pdf(data, out):
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.add_page()
+    if EXPORT_PDF_FONT:
+        pdf.add_font('Report', '', EXPORT_PDF_FONT, uni=True)
+        font, bold = 'Report', ''
+
+        def text(value):
+            return value
+    else:
+        # 内置字体只支持latin-1
+        font, bold = 'Arial', 'B'
+
+        def text(value):
+            return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+    repo_info = data['repo_info']
+
+    pdf.set_font(font, size=16, style=bold)
+    pdf.cell(200, 10, txt=text(f"GitHub仓库分析报告 - {repo_info['full_name']}"), ln=True, align='C')
+    pdf.ln(10)
+
+    pdf.set_font(font, size=12, style=bold)
+    pdf.cell(200, 10, txt=text("基本信息"), ln=True)
+    pdf.set_font(font, size=10)
+    info_text = '\n'.join(f"{label}: {value}" for label, value in _basic_info_lines(data))
+    pdf.multi_cell(0, 8, txt=text(f"{info_text}\n分析时间: {data['analyzed_at']}"))
+    pdf.ln(5)
+
+    trend = _trend_lines(data)
+    if trend:
+        pdf.set_font(font, size=12, style=bold)
+        pdf.cell(200, 10, txt=text("增长趋势"), ln=True)
+        pdf.set_font(font, size=10)
+        pdf.multi_cell(0, 8, txt=text('\n'.join(f"{label}: {value}" for label, value in trend)))
+        pdf.ln(5)
+
+    pdf.set_font(font, size=12, style=bold)
+    pdf.cell(200, 10, txt=text("AI分析报告"), ln=True)
+    pdf.set_font(font, size=10)
+    pdf.multi_cell(0, 8, txt=text(data['ai_analysis']))
+
+    out.write(pdf.output(dest='S').encode('latin-1'))
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def _docx_paragraph(text, size=None, bold=False):
+    """一个段落: size 为字号（磅），bold 为是否加粗"""
+    props = ''
+    if bold:
+        props += '<w:b/>'
+    if size:
+        props += f'<w:sz w:val="{size * 2}"/>'
+    run_props = f'<w:rPr>{props}</w:rPr>' if props else ''
+    return f'<w:p><w:r>{run_props}<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+_EMPHASIS = re.compile(r'\*\*(.+?)\*\*|\*(.+?)\*')
+_HEADING = re.compile(r'^(#{1,6})\s+(.*)')
+_LIST_ITEM = re.compile(r'^\s*[-*]\s+')
+
+
+def _strip_emphasis(match):
+    return match.group(1) or match.group(2)
+
+
+def _markdown_to_docx(markdown_text):
+    """把分析报告中的Markdown转换成段落：标题加大加粗，列表项加圆点，去掉强调标记"""
+    for line in markdown_text.splitlines():
+        if '*' in line:
+            line = _EMPHASIS.sub(_strip_emphasis, line)
+        line = line.rstrip()
+        heading = _HEADING.match(line) if line.startswith('#') else None
+        list_item = _LIST_ITEM.match(line)
+        if heading:
+            yield _docx_paragraph(heading.group(2), size=max(18 - 2 * len(heading.group(1)), 11), bold=True)
+        elif list_item:
+            yield _docx_paragraph('• ' + line[list_item.end():])
+        elif line.strip() != '---':
+            yield _docx_paragraph(line)
+
+
+@register_exporter('word', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx')
+def generate_word(data, out):
+    repo_info = data['repo_info']
+    body = [_docx_paragraph(f"GitHub仓库分析报告 - {repo_info['full_name']}", size=18, bold=True),
+            _docx_paragraph("📊 基本信息", size=14, bold=True)]
+    body += [_docx_paragraph(f"{label}: {value}") for label, value in _basic_info_lines(data)]
+    trend = _trend_lines(data)
+    if trend:
+        body.append(_docx_paragraph("📈 增长趋势", size=14, bold=True))
+        body += [_docx_paragraph(f"{label}: {value}") for label, value in trend]
+    body.append(_docx_paragraph("🤖 AI分析报告", size=14, bold=True))
+    body = itertools.chain(body, _markdown_to_docx(data['ai_analysis']),
+                           [_docx_paragraph(f"分析时间: {data['analyzed_at']}")])
+
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        docx.writestr('_rels/.rels', _DOCX_RELS)
+        # 分批写入压缩流，不在内存中拼接整份XML
+        with docx.open('word/document.xml', 'w') as document:
+            document.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+            while True:
+                batch = ''.join(itertools.islice(body, 256))
+                if not batch:
+                    break
+                document.write(batch.encode('utf-8'))
+            document.write(b'</w:body></w:document>')
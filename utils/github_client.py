@@ -1,19 +1,14 @@
-import os
-import requests
 import base64
 from dotenv import load_dotenv
+from utils.http_session import github_get, GITHUB_API_URL
 
 # 加载环境变量
 load_dotenv()
 
 class GitHubClient:
     def __init__(self):
-        # 从.env文件读取令牌
-        self.token = os.getenv('GITHUB_TOKEN')
-        
-        # 设置请求头
+        # 设置请求头（令牌由配额调度器从 GITHUB_TOKENS / GITHUB_TOKEN 中选择并添加）
         self.headers = {
-            'Authorization': f'token {self.token}',
             'Accept': 'application/vnd.github.v3+json'
         }
         
@@ -28,12 +23,12 @@ class GitHubClient:
             owner = parts[-2]  # vuejs
             repo_name = parts[-1]  # vue
             
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}"
             
             print(f"🔍 正在获取 {owner}/{repo_name} 的信息...")
             
             # 发送请求到GitHub
-            response = requests.get(api_url, headers=self.headers)
+            response = github_get(api_url, headers=self.headers)
             
             # 检查响应
             if response.status_code == 200:
@@ -62,8 +57,8 @@ class GitHubClient:
     def get_readme(self, owner, repo_name):
         """获取仓库的README内容"""
         try:
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}/readme"
-            response = requests.get(api_url, headers=self.headers)
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/readme"
+            response = github_get(api_url, headers=self.headers)
             
             if response.status_code == 200:
                 # GitHub返回的README是Base64编码的，需要解码
@@ -80,8 +75,8 @@ class GitHubClient:
     def get_languages(self, owner, repo_name):
         """获取仓库使用的编程语言"""
         try:
-            api_url = f"https://api.github.com/repos/{owner}/{repo_name}/languages"
-            response = requests.get(api_url, headers=self.headers)
+            api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/languages"
+            response = github_get(api_url, headers=self.headers)
             
             if response.status_code == 200:
                 return response.json()
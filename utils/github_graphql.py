@@ -0,0 +1,239 @@
+import asyncio
+import os
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from utils.async_http import async_github_graphql
+from utils.http_session import github_graphql
+from utils.rate_limiter import RateLimitExceeded, load_tokens
+
+# 加载环境变量
+load_dotenv()
+
+# 获取方式：auto 在配置了令牌时使用GraphQL（GitHub的GraphQL接口不接受匿名访问），否则使用REST；
+# graphql / rest 强制使用其中一种。GraphQL查询失败或配额不足时总是退回REST接口。
+GITHUB_FETCH_MODE = os.getenv('GITHUB_FETCH_MODE', 'auto')
+GRAPHQL_BATCH_SIZE = int(os.getenv('GRAPHQL_BATCH_SIZE', '20'))  # 批量分析时每个查询包含的仓库数
+
+# GraphQL只能按路径读取文件，依次尝试常见的README文件名；都不存在时由调用方用REST /readme 接口补取
+README_CANDIDATES = ('README.md', 'readme.md', 'Readme.md', 'README.rst', 'README.markdown', 'README.txt', 'README')
+
+_README_FIELDS = '\n'.join(
+    f'  readme{i}: object(expression: "HEAD:{path}") {{ ... on Blob {{ text isBinary oid }} }}'
+    for i, path in enumerate(README_CANDIDATES)
+)
+
+# 一次取回REST三个接口（/repos、/readme、/languages）所需的全部字段，README直接是文本，不需要Base64解码；
+# 同时取回默认分支HEAD提交和README的SHA，用于增量分析判断输入是否变化
+REPO_FRAGMENT = """
+fragment RepoFields on Repository {
+  name
+  nameWithOwner
+  description
+  url
+  primaryLanguage { name }
+  stargazerCount
+  forkCount
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+  createdAt
+  updatedAt
+  pushedAt
+  defaultBranchRef { name target { oid } }
+  languages(first: 100, orderBy: {field: SIZE, direction: DESC}) { edges { size node { name } } }
+%s
+}
+""" % _README_FIELDS
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class GraphQLError(Exception):
+    """整个GraphQL查询失败（网络错误、非200响应或没有返回数据），调用方应退回REST接口"""
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def graphql_enabled(mode=None):
+    """是否优先使用GraphQL获取仓库数据"""
+    mode = mode or GITHUB_FETCH_MODE
+    if mode == 'graphql':
+        return True
+    return mode == 'auto' and any(load_tokens())
+
+
+def build_query(count):
+    """生成一次查询 count 个仓库的GraphQL查询，仓库依次使用别名 repo0、repo1 ..."""
+    params = ', '.join(f'$owner{i}: String!, $name{i}: String!' for i in range(count))
+    fields = '\n'.join(f'  repo{i}: repository(owner: $owner{i}, name: $name{i}) {{ ...RepoFields }}'
+                       for i in range(count))
+    return f'query Repos({params}) {{\n{fields}\n}}\n{REPO_FRAGMENT}'
+
+
+def build_variables(repos):
+    variables = {}
+    for i, (owner, name) in enumerate(repos):
+        variables[f'owner{i}'] = owner
+        variables[f'name{i}'] = name
+    return variables
+
+
+def to_rest_payloads(node):
+    """把GraphQL返回的仓库节点转换成与REST接口相同结构的数据
+
+    返回 {'repo': /repos 结构, 'readme': README文本（没找到时为None）, 'languages': /languages 结构,
+    'head_sha': 默认分支HEAD提交SHA, 'readme_sha': README的blob SHA}。
+    REST的 open_issues_count 包含打开的PR，这里同样相加。
+    """
+    repo = {
+        'name': node['name'],
+        'full_name': node['nameWithOwner'],
+        'description': node['description'],
+        'html_url': node['url'],
+        'language': (node.get('primaryLanguage') or {}).get('name'),
+        'stargazers_count': node['stargazerCount'],
+        'forks_count': node['forkCount'],
+        'open_issues_count': node['issues']['totalCount'] + node['pullRequests']['totalCount'],
+        'created_at': node['createdAt'],
+        'updated_at': node['updatedAt'],
+        'pushed_at': node['pushedAt'],
+        'default_branch': (node.get('defaultBranchRef') or {}).get('name'),
+    }
+    readme = readme_sha = None
+    for i in range(len(README_CANDIDATES)):
+        blob = node.get(f'readme{i}')
+        if blob and not blob.get('isBinary') and blob.get('text') is not None:
+            readme, readme_sha = blob['text'], blob.get('oid')
+            break
+    languages = {edge['node']['name']: edge['size'] for edge in (node.get('languages') or {}).get('edges', [])}
+    head_sha = (((node.get('defaultBranchRef') or {}).get('target')) or {}).get('oid')
+    return {'repo': repo, 'readme': readme, 'languages': languages, 'head_sha': head_sha, 'readme_sha': readme_sha}
+
+
+def parse_response(repos, status_code, payload):
+    """解析一次批量查询的响应，返回 {(owner, name): 转换后的数据或 {'error': 错误信息}}"""
+    if status_code != 200:
+        message = payload.get('message') if isinstance(payload, dict) else None
+        raise GraphQLError(f"GraphQL接口错误: {status_code} - {message or ''}".rstrip(' -'))
+    data = payload.get('data')
+    errors = payload.get('errors') or []
+    if not data:
+        raise GraphQLError(f"GraphQL查询失败: {errors[0].get('message') if errors else '没有返回数据'}")
+
+    messages = {}
+    for error in errors:
+        path = error.get('path') or []
+        if path:
+            messages.setdefault(path[0], f"GitHub API错误: 404 - {error.get('message', 'Not Found')}"
+                                if error.get('type') == 'NOT_FOUND' else f"GraphQL错误: {error.get('message')}")
+
+    results = {}
+    for i, repo in enumerate(repos):
+        node = data.get(f'repo{i}')
+        if node is None:
+            results[repo] = {'error': messages.get(f'repo{i}', 'GitHub API错误: 404 - Not Found')}
+        else:
+            results[repo] = to_rest_payloads(node)
+    return results
+
+
+def _decode(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {'message': response.text[:200]}
+
+
+def fetch_repos(repos, timeout=None):
+    """用一个GraphQL查询获取多个仓库的信息、README和语言统计；整个查询失败时抛出GraphQLError
+
+    GraphQL配额不足时抛出 RateLimitExceeded，调用方同样应退回REST接口。
+    """
+    repos = list(repos)
+    try:
+        response = github_graphql(build_query(len(repos)), build_variables(repos), timeout=timeout)
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        raise GraphQLError(f"GraphQL请求失败: {str(e)}") from e
+    _count('queries')
+    _count('repos', len(repos))
+    return parse_response(repos, response.status_code, _decode(response))
+
+
+async def afetch_repos(repos, timeout=None):
+    """fetch_repos 的异步版本"""
+    repos = list(repos)
+    try:
+        response = await async_github_graphql(build_query(len(repos)), build_variables(repos), timeout=timeout)
+    except RateLimitExceeded:
+        raise
+    except Exception as e:
+        raise GraphQLError(f"GraphQL请求失败: {str(e)}") from e
+    _count('queries')
+    _count('repos', len(repos))
+    return parse_response(repos, response.status_code, _decode(response))
+
+
+class RepoBatchLoader:
+    """批量分析时按提交顺序把仓库每 batch_size 个分成一组，组内第一个仓库需要数据时
+    用一个查询取回整组，组内其他仓库直接使用取回的结果（命中报告缓存的仓库不会触发查询）"""
+
+    def __init__(self, repos, batch_size=GRAPHQL_BATCH_SIZE):
+        repos = list(dict.fromkeys(repos))
+        self._groups = [repos[i:i + batch_size] for i in range(0, len(repos), max(1, batch_size))]
+        self._index = {repo: n for n, group in enumerate(self._groups) for repo in group}
+        self._results = [None] * len(self._groups)
+        self._locks = [threading.Lock() for _ in self._groups]
+        self._async_locks = [asyncio.Lock() for _ in self._groups]
+
+    def _take(self, n, repo):
+        result = self._results[n]
+        if isinstance(result, Exception):
+            raise result
+        return result.pop(repo, None)  # 取出后释放，README文本不在内存中保留到整批结束
+
+    def load(self, owner, name, timeout=None):
+        """返回该仓库转换后的数据；不在本批中时返回None"""
+        n = self._index.get((owner, name))
+        if n is None:
+            return None
+        with self._locks[n]:
+            if self._results[n] is None:
+                try:
+                    self._results[n] = fetch_repos(self._groups[n], timeout=timeout)
+                except Exception as e:
+                    self._results[n] = e
+        return self._take(n, (owner, name))
+
+    async def aload(self, owner, name, timeout=None):
+        """load 的异步版本"""
+        n = self._index.get((owner, name))
+        if n is None:
+            return None
+        async with self._async_locks[n]:
+            if self._results[n] is None:
+                try:
+                    self._results[n] = await afetch_repos(self._groups[n], timeout=timeout)
+                except Exception as e:
+                    self._results[n] = e
+        return self._take(n, (owner, name))
+
+
+def record_fallback(kind):
+    """记录退回REST的次数：query 整个查询失败，readme 常见文件名中没有README"""
+    _count(f'{kind}_fallbacks')
+
+
+def graphql_stats():
+    """GraphQL查询次数、覆盖的仓库数和退回REST的次数"""
+    with _stats_lock:
+        stats = {name: _stats[name] for name in ('queries', 'repos', 'query_fallbacks', 'readme_fallbacks')}
+    stats['mode'] = 'graphql' if graphql_enabled() else 'rest'
+    return stats
@@ -0,0 +1,215 @@
+import math
+import os
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+# 历史指标配置
+HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+HISTORY_PATH = os.getenv('HISTORY_PATH', os.path.join(tempfile.gettempdir(), 'repo_history.sqlite3'))
+HISTORY_RAW_RETENTION = int(os.getenv('HISTORY_RAW_RETENTION', str(7 * 86400)))  # 原始数据点保留多久后降采样为每小时一个（秒）
+HISTORY_HOURLY_RETENTION = int(os.getenv('HISTORY_HOURLY_RETENTION', str(90 * 86400)))  # 每小时的数据点保留多久后降采样为每天一个（秒）
+HISTORY_CHUNK_POINTS = 256  # 每个数据块最多的数据点数
+HISTORY_COMPACT_INTERVAL = 60  # 两次降采样之间的最短间隔（秒）
+HISTORY_COMPACT_BATCH = 64  # 每次降采样最多处理的数据块数，避免拖慢触发它的写入
+TREND_WINDOWS = (7, 30, 90)  # 报告中增长趋势的统计窗口（天）
+
+COLUMNS = ('stars', 'forks', 'open_issues')
+# 各级数据的时间分辨率（秒）和保留时间；超过保留时间的数据块降采样到下一级，最后一级一直保留
+TIERS = ((0, HISTORY_RAW_RETENTION), (3600, HISTORY_HOURLY_RETENTION), (86400, None))
+
+
+def _pack(values):
+    return array('q', values).tobytes()
+
+
+def _unpack(blob, sealed):
+    """读出一列：未封存的数据块是原始的int64数组，封存后是差分再zlib压缩的数组"""
+    values = array('q')
+    if sealed:
+        values.frombytes(zlib.decompress(blob))
+        return list(accumulate(values))
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def _seal(values):
+    """封存一列：相邻数据点差分后压缩（时间间隔和星标增量都很小，压缩率高）"""
+    return zlib.compress(_pack([b - a for a, b in zip([0] + values[:-1], values)]))
+
+
+def downsample(points, resolution):
+    """每个时间段只保留最后一个数据点（星标等累计值取段内最新的一次观察）"""
+    result = []
+    for point in points:
+        if result and result[-1][0] // resolution == point[0] // resolution:
+            result[-1] = point
+        else:
+            result.append(point)
+    return result
+
+
+class MetricHistory:
+    """仓库的星标/Fork/问题数历史：按仓库和时间分块的列式存储
+
+    每个数据块的时间戳和各项指标分别保存为一列int64数组。最新的数据块（head）保持未压缩，
+    追加数据点只需在SQLite中拼接各列的字节；写满 HISTORY_CHUNK_POINTS 个点后差分压缩封存。
+    封存的旧数据块按 TIERS 逐级降采样为每小时、每天一个点。范围查询按 (仓库, 起始时间) 索引读出
+    相关的数据块并解码，不逐行扫描。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS history_chunks (
+        id INTEGER PRIMARY KEY,
+        repo TEXT NOT NULL,
+        tier INTEGER NOT NULL,
+        sealed INTEGER NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        ts BLOB NOT NULL,
+        stars BLOB NOT NULL,
+        forks BLOB NOT NULL,
+        open_issues BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS history_repo_start ON history_chunks (repo, start_ts);
+    CREATE INDEX IF NOT EXISTS history_tier_end ON history_chunks (tier, sealed, end_ts);
+    """
+
+    def __init__(self, path=HISTORY_PATH, tiers=TIERS, chunk_points=HISTORY_CHUNK_POINTS):
+        self.tiers = tiers
+        self.chunk_points = chunk_points
+        self._db = SQLiteDatabase(path, self.SCHEMA)
+        self._last_compact = 0.0
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def append(self, repo_key, ts, repo_info):
+        """追加一次观察到的 repo_info 中的各项指标；时间戳早于已有数据时按最后一个时间戳记录，保持有序"""
+        values = [int(repo_info.get(column) or 0) for column in COLUMNS]
+        with self._db.transaction() as conn:
+            head = conn.execute('SELECT id, points, end_ts FROM history_chunks WHERE repo = ? AND tier = 0 AND sealed = 0',
+                                (repo_key,)).fetchone()
+            ts = int(ts) if head is None else max(int(ts), head['end_ts'])
+            if head is not None and head['points'] < self.chunk_points:
+                # || 的结果是TEXT，转回BLOB（字节不变）
+                conn.execute('UPDATE history_chunks SET ts = CAST(ts || ? AS BLOB), stars = CAST(stars || ? AS BLOB), '
+                             'forks = CAST(forks || ? AS BLOB), open_issues = CAST(open_issues || ? AS BLOB), '
+                             'points = points + 1, end_ts = ? WHERE id = ?',
+                             (_pack([ts]), *(_pack([value]) for value in values), ts, head['id']))
+            else:
+                if head is not None:
+                    full = conn.execute('SELECT ts, stars, forks, open_issues FROM history_chunks WHERE id = ?',
+                                        (head['id'],)).fetchone()
+                    conn.execute('UPDATE history_chunks SET sealed = 1, ts = ?, stars = ?, forks = ?, open_issues = ? '
+                                 'WHERE id = ?', (*(_seal(_unpack(full[name], False)) for name in ('ts',) + COLUMNS),
+                                                  head['id']))
+                conn.execute('INSERT INTO history_chunks (repo, tier, sealed, start_ts, end_ts, points, ts, stars, '
+                             'forks, open_issues) VALUES (?, 0, 0, ?, ?, 1, ?, ?, ?, ?)',
+                             (repo_key, ts, ts, _pack([ts]), *(_pack([value]) for value in values)))
+        with self._lock:
+            self._stats['appends'] += 1
+        self._compact()
+
+    def range(self, repo_key, start=None, end=None, max_points=None):
+        """返回 [start, end] 内的数据点（列式）: {'ts': [...], 'stars': [...], 'forks': [...], 'open_issues': [...]}
+
+        max_points 限制返回的点数（用于绘图）：等间隔抽取，始终保留最新的一个点
+        """
+        start = 0 if start is None else math.ceil(start)
+        end = 2 ** 62 if end is None else math.floor(end)
+        result = {name: [] for name in ('ts',) + COLUMNS}
+        rows = self._db.execute('SELECT sealed, ts, stars, forks, open_issues FROM history_chunks '
+                                'WHERE repo = ? AND start_ts <= ? AND end_ts >= ? ORDER BY start_ts',
+                                (repo_key, end, start))
+        for row in rows:
+            for name in result:
+                result[name].extend(_unpack(row[name], row['sealed']))
+        # 只有首尾两个数据块可能超出范围
+        lo, hi = bisect_left(result['ts'], start), bisect_right(result['ts'], end)
+        if lo > 0 or hi < len(result['ts']):
+            result = {name: values[lo:hi] for name, values in result.items()}
+        if max_points and len(result['ts']) > max_points:
+            step = math.ceil(len(result['ts']) / max_points)
+            keep = range(len(result['ts']) - 1, -1, -step)[::-1]
+            result = {name: [values[i] for i in keep] for name, values in result.items()}
+        return result
+
+    def trend(self, repo_key, now=None, windows=TREND_WINDOWS):
+        """报告中的增长趋势：各窗口内（以窗口内最早的一次观察为基准）各项指标的变化和每天的星标增长"""
+        now = time.time() if now is None else now
+        series = self.range(repo_key, now - max(windows) * 86400, now)
+        first = self._db.execute('SELECT MIN(start_ts) FROM history_chunks WHERE repo = ?', (repo_key,)).fetchone()[0]
+        trend = {'observations': len(series['ts']), 'first_seen': first, 'changes': {}}
+        if len(series['ts']) < 2:
+            return trend
+        for days in windows:
+            base = bisect_left(series['ts'], now - days * 86400)
+            span = series['ts'][-1] - series['ts'][base]
+            if span <= 0:
+                continue
+            change = {column: series[column][-1] - series[column][base] for column in COLUMNS}
+            change['span_days'] = round(span / 86400, 2)
+            change['stars_per_day'] = round(change['stars'] / max(span / 86400, 1), 2)  # 不足一天按一天计，避免放大
+            trend['changes'][f'{days}d'] = change
+        return trend
+
+    def _compact(self):
+        """把超过保留时间的封存数据块降采样到下一级（限制频率和每次处理的数据块数）"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_compact < HISTORY_COMPACT_INTERVAL:
+                return
+            self._last_compact = now
+        for tier, (_, retention) in enumerate(self.tiers[:-1]):
+            resolution = self.tiers[tier + 1][0]
+            with self._db.transaction() as conn:
+                rows = conn.execute('SELECT * FROM history_chunks WHERE tier = ? AND sealed = 1 AND end_ts < ? '
+                                    'ORDER BY repo, start_ts LIMIT ?',
+                                    (tier, now - retention, HISTORY_COMPACT_BATCH)).fetchall()
+                by_repo = {}
+                for row in rows:
+                    by_repo.setdefault(row['repo'], []).append(row)
+                for repo_key, chunks in by_repo.items():
+                    points = []
+                    for row in chunks:
+                        points += zip(*(_unpack(row[name], True) for name in ('ts',) + COLUMNS))
+                    self._write_sealed(conn, repo_key, tier + 1, downsample(points, resolution))
+                    conn.executemany('DELETE FROM history_chunks WHERE id = ?', [(row['id'],) for row in chunks])
+            with self._lock:
+                self._stats['compacted_chunks'] += len(rows)
+
+    def _write_sealed(self, conn, repo_key, tier, points):
+        """把降采样后的数据点写入该级的封存数据块；该级最后一个数据块未满时先补满它"""
+        last = conn.execute('SELECT * FROM history_chunks WHERE repo = ? AND tier = ? ORDER BY start_ts DESC LIMIT 1',
+                            (repo_key, tier)).fetchone()
+        if last is not None and last['points'] < self.chunk_points:
+            points = list(zip(*(_unpack(last[name], True) for name in ('ts',) + COLUMNS))) + points
+            points = downsample(points, self.tiers[tier][0])
+            conn.execute('DELETE FROM history_chunks WHERE id = ?', (last['id'],))
+        for i in range(0, len(points), self.chunk_points):
+            chunk = points[i:i + self.chunk_points]
+            columns = [list(column) for column in zip(*chunk)]
+            conn.execute('INSERT INTO history_chunks (repo, tier, sealed, start_ts, end_ts, points, ts, stars, forks, '
+                         'open_issues) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?)',
+                         (repo_key, tier, chunk[0][0], chunk[-1][0], len(chunk), *(_seal(column) for column in columns)))
+
+    def stats(self):
+        chunks, points, size = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(points), 0), COALESCE(SUM(LENGTH(ts) + LENGTH(stars) + LENGTH(forks) + '
+            'LENGTH(open_issues)), 0) FROM history_chunks').fetchone()
+        with self._lock:
+            return {'chunks': chunks, 'points': points, 'bytes': size, 'appends': self._stats['appends'],
+                    'compacted_chunks': self._stats['compacted_chunks']}
@@ -0,0 +1,135 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from utils.metrics import count_upstream
+from utils.response_cache import create_response_cache
+from utils.rate_limiter import (GitHubRateLimiter, RateLimitExceeded, GITHUB_RATE_MAX_WAIT, SECONDARY_BACKOFF_MIN,
+                                is_rate_limited, load_tokens)
+
+# 加载环境变量
+load_dotenv()
+
+# GitHub API地址（测试时可指向本地桩服务器）
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GITHUB_GRAPHQL_URL = os.getenv('GITHUB_GRAPHQL_URL', f'{GITHUB_API_URL}/graphql')
+
+# 连接池与重试策略配置
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+HTTP_RETRY_TOTAL = int(os.getenv('HTTP_RETRY_TOTAL', '3'))
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.5'))
+HTTP_RETRY_STATUSES = (500, 502, 503, 504)
+RATE_LIMIT_ATTEMPTS = 3  # 被限流后最多重新排队的次数
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = create_response_cache()
+
+# 进程内共享的GitHub调用调度器（由每次响应的 X-RateLimit-* 头更新配额）
+rate_limiter = GitHubRateLimiter(load_tokens())
+# GraphQL接口按查询点数单独计算配额（X-RateLimit-Resource: graphql），使用独立的调度器
+graphql_rate_limiter = GitHubRateLimiter(load_tokens(), resource='graphql')
+
+
+def create_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRY_TOTAL, backoff=HTTP_RETRY_BACKOFF):
+    """创建带连接池、keep-alive和重试退避策略的Session"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+def get_session():
+    """获取进程内共享的Session（所有工作线程共用同一个连接池）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def _fetch(url, headers, timeout, json_body=None, limiter=None, max_wait=GITHUB_RATE_MAX_WAIT, stream=False):
+    """经过调度器排队后发出真实请求，由调度器选择使用哪个令牌；被限流时按退避时间重新排队
+
+    json_body 不为None时发出POST请求（GraphQL查询），默认使用REST接口的调度器；
+    stream为真时不预先读取响应体，由调用方逐块读取后关闭响应。
+    """
+    limiter = limiter or rate_limiter
+    upstream = 'github' if json_body is None else 'github_graphql'
+    for _ in range(RATE_LIMIT_ATTEMPTS):
+        # 等待时间超过 max_wait 时抛出 RateLimitExceeded
+        token = limiter.acquire(max_wait=max_wait)
+        request_headers = dict(headers or {})
+        if token:
+            request_headers['Authorization'] = f'token {token}'
+        try:
+            if json_body is None:
+                response = get_session().get(url, headers=request_headers, timeout=timeout, stream=stream)
+            else:
+                response = get_session().post(url, json=json_body, headers=request_headers, timeout=timeout)
+        except Exception:
+            limiter.release(token)
+            count_upstream(upstream, 'error')
+            raise
+        count_upstream(upstream, response.status_code)
+        limiter.complete(token, response.status_code, response.headers)
+        if not is_rate_limited(response.status_code, response.headers):
+            return response
+    raise RateLimitExceeded(float(response.headers.get('Retry-After') or SECONDARY_BACKOFF_MIN))
+
+
+def github_get(url, headers=None, timeout=None):
+    """发送GitHub API GET请求：排队限速、自动认证，启用缓存时自动带上条件请求头"""
+    fetch = lambda request_url, request_headers: _fetch(request_url, request_headers, timeout)
+    if _response_cache is None:
+        return fetch(url, headers)
+    return _response_cache.get(url, fetch, headers=headers)
+
+
+def github_graphql(query, variables=None, timeout=None, max_wait=0):
+    """发送GitHub GraphQL查询：POST请求不经过响应缓存；GraphQL配额在 max_wait 秒内无法满足时
+    抛出 RateLimitExceeded，由调用方改用REST接口（两者的配额互不影响）"""
+    return _fetch(GITHUB_GRAPHQL_URL, {'Accept': 'application/json'}, timeout,
+                  json_body={'query': query, 'variables': variables or {}},
+                  limiter=graphql_rate_limiter, max_wait=max_wait)
+
+
+def github_download(url, headers=None, timeout=None):
+    """下载较大的GitHub响应（如仓库tarball）：经过配额调度，不经过响应缓存，返回未读取响应体的流式响应"""
+    return _fetch(url, headers, timeout, stream=True)
+
+
+def get_response_cache():
+    """返回进程内共享的响应缓存（未启用时为None）"""
+    return _response_cache
+
+
+def cache_stats():
+    """返回响应缓存的命中、未命中和304计数"""
+    if _response_cache is None:
+        return {'backend': 'none'}
+    return _response_cache.stats()
+
+
+def quota_stats():
+    """返回GitHub配额调度器的状态"""
+    return rate_limiter.snapshot()
+
+
+def graphql_quota_stats():
+    """返回GraphQL配额调度器的状态"""
+    return graphql_rate_limiter.snapshot()
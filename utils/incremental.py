@@ -0,0 +1,42 @@
+import os
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 增量分析：报告记录输入的指纹（pushed_at、默认分支HEAD提交SHA、README的SHA），
+# 报告缓存过期后再次分析同一仓库时先做低成本的新鲜度检查，只重新获取和计算输入有变化的部分
+INCREMENTAL_ANALYSIS = os.getenv('INCREMENTAL_ANALYSIS', 'true').lower() in ('1', 'true', 'yes')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def source_fingerprint(repo_info, head_sha=None, readme_sha=None):
+    """报告的输入指纹；REST获取时不额外请求HEAD提交，head_sha 留空，在下一次新鲜度检查时补上"""
+    return {'pushed_at': (repo_info or {}).get('pushed_at'), 'head_sha': head_sha, 'readme_sha': readme_sha}
+
+
+def code_unchanged(previous, current):
+    """默认分支的代码是否没有变化：pushed_at相同（仓库没有任何推送），或HEAD提交相同（推送的是其他分支）"""
+    if previous.get('pushed_at') and previous['pushed_at'] == current.get('pushed_at'):
+        return True
+    return bool(previous.get('head_sha')) and previous['head_sha'] == current.get('head_sha')
+
+
+def readme_unchanged(previous, current):
+    return bool(previous.get('readme_sha')) and previous['readme_sha'] == current.get('readme_sha')
+
+
+def record_refresh(kind):
+    """记录一次增量分析的结果: unchanged（只更新数字）/ code（代码变化，README未变）/ readme（README变化）/ full（没有可用的基线）"""
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def incremental_stats():
+    with _stats_lock:
+        return {name: _stats[name] for name in ('unchanged', 'code', 'readme', 'full')}
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 任务队列配置
+JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', os.path.join(tempfile.gettempdir(), 'analysis_jobs.sqlite3'))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))  # 每个进程同时执行的分析任务数，也是LLM并发调用的上限
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))  # 已完成任务的保留时间（秒）
+JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', '600'))  # 运行超过该时间仍未完成的任务视为worker已退出，重新排队
+JOB_POLL_INTERVAL = 1.0  # 空闲worker检查其他进程提交的任务的间隔（秒）
+
+
+class JobQueue:
+    """基于SQLite的后台任务队列：提交后立即返回任务ID，由固定数量的工作线程依次执行"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, handler, path=JOB_QUEUE_PATH, workers=JOB_WORKERS,
+                 result_ttl=JOB_RESULT_TTL, stale_after=JOB_STALE_AFTER):
+        self.handler = handler
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self._db = SQLiteDatabase(path, self.SCHEMA)
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._started_pid = None
+
+    def start(self):
+        """启动工作线程；按进程启动，兼容gunicorn fork出的worker"""
+        with self._wakeup:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._threads = [threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, payload):
+        """加入队列并返回任务ID"""
+        self.start()
+        now = time.time()
+        while True:
+            job_id = str(uuid.uuid4())[:8]
+            try:
+                self._db.execute('INSERT INTO jobs VALUES (?, ?, ?, NULL, NULL, ?, ?)',
+                                 (job_id, json.dumps(payload, ensure_ascii=False), 'queued', now, now))
+                break
+            except sqlite3.IntegrityError:
+                continue  # 短ID碰撞，重新生成
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """返回任务状态字典，不存在时返回None"""
+        row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {'report_id': row['id'], 'status': row['status'],
+               'created_at': row['created_at'], 'updated_at': row['updated_at']}
+        if row['status'] == 'queued':
+            job['position'] = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?", (row['created_at'],)
+            ).fetchone()[0]
+        elif row['status'] == 'done':
+            job['result'] = json.loads(row['result'])
+        elif row['status'] == 'error':
+            job['error'] = row['error']
+        return job
+
+    def _claim(self):
+        """取出最早的排队任务并标记为运行中；同时回收超时的运行中任务和过期结果"""
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+                         (now, now - self.stale_after))
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'error') AND updated_at < ?",
+                         (now - self.result_ttl,))
+            row = conn.execute("SELECT id, payload FROM jobs WHERE status = 'queued' "
+                               "ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None, None
+            conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, row['id']))
+        return row['id'], json.loads(row['payload'])
+
+    def _finish(self, job_id, status, result=None, error=None):
+        self._db.execute('UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?',
+                         (status, None if result is None else json.dumps(result, ensure_ascii=False),
+                          error, time.time(), job_id))
+
+    def _work(self):
+        while True:
+            try:
+                job_id, payload = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("读取任务队列失败", extra={'error': str(e)})
+                job_id = None
+            if job_id is None:
+                with self._wakeup:
+                    self._wakeup.wait(JOB_POLL_INTERVAL)
+                continue
+            try:
+                self._finish(job_id, 'done', result=self.handler(job_id, payload))
+            except Exception as e:
+                logger.exception("后台分析任务失败", extra={'report_id': job_id})
+                self._finish(job_id, 'error', error=str(e))
+
+    def stats(self):
+        counts = dict(self._db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {'workers': self.workers, 'queued': counts.get('queued', 0), 'running': counts.get('running', 0),
+                'done': counts.get('done', 0), 'error': counts.get('error', 0)}
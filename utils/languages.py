@@ -0,0 +1,41 @@
+import posixpath
+
+# 按扩展名（小写）识别文件的语言，名称与GitHub语言统计一致
+EXTENSIONS = {
+    '.py': 'Python', '.pyi': 'Python', '.pyx': 'Cython',
+    '.js': 'JavaScript', '.mjs': 'JavaScript', '.cjs': 'JavaScript', '.jsx': 'JavaScript',
+    '.ts': 'TypeScript', '.tsx': 'TypeScript', '.mts': 'TypeScript', '.cts': 'TypeScript',
+    '.vue': 'Vue', '.svelte': 'Svelte',
+    '.html': 'HTML', '.htm': 'HTML', '.css': 'CSS', '.scss': 'SCSS', '.sass': 'Sass', '.less': 'Less',
+    '.java': 'Java', '.kt': 'Kotlin', '.kts': 'Kotlin', '.scala': 'Scala', '.groovy': 'Groovy', '.gradle': 'Groovy',
+    '.go': 'Go', '.rs': 'Rust', '.c': 'C', '.h': 'C',
+    '.cc': 'C++', '.cpp': 'C++', '.cxx': 'C++', '.hpp': 'C++', '.hh': 'C++', '.hxx': 'C++',
+    '.cs': 'C#', '.fs': 'F#', '.m': 'Objective-C', '.mm': 'Objective-C++', '.swift': 'Swift',
+    '.rb': 'Ruby', '.php': 'PHP', '.pl': 'Perl', '.pm': 'Perl', '.lua': 'Lua', '.r': 'R', '.jl': 'Julia',
+    '.dart': 'Dart', '.ex': 'Elixir', '.exs': 'Elixir', '.erl': 'Erlang', '.hs': 'Haskell', '.clj': 'Clojure',
+    '.ml': 'OCaml', '.zig': 'Zig', '.nim': 'Nim', '.sol': 'Solidity',
+    '.sh': 'Shell', '.bash': 'Shell', '.zsh': 'Shell', '.ps1': 'PowerShell', '.bat': 'Batchfile',
+    '.sql': 'SQL', '.proto': 'Protocol Buffer', '.graphql': 'GraphQL',
+    '.md': 'Markdown', '.markdown': 'Markdown', '.rst': 'reStructuredText', '.tex': 'TeX',
+    '.json': 'JSON', '.yaml': 'YAML', '.yml': 'YAML', '.toml': 'TOML', '.xml': 'XML', '.ini': 'INI',
+    '.ipynb': 'Jupyter Notebook',
+}
+
+# 没有扩展名或扩展名不能说明语言的文件
+FILENAMES = {
+    'Makefile': 'Makefile', 'GNUmakefile': 'Makefile', 'Dockerfile': 'Dockerfile', 'CMakeLists.txt': 'CMake',
+    'Rakefile': 'Ruby', 'Gemfile': 'Ruby', 'Jenkinsfile': 'Groovy', 'Vagrantfile': 'Ruby',
+}
+
+# 不计入代码统计的“语言”（文档与配置）
+NON_CODE = {'Markdown', 'reStructuredText', 'TeX', 'JSON', 'YAML', 'TOML', 'XML', 'INI'}
+
+
+def language_for(path):
+    """根据文件名识别语言，无法识别时返回None"""
+    name = posixpath.basename(path)
+    if name in FILENAMES:
+        return FILENAMES[name]
+    if name.startswith('Dockerfile.'):
+        return 'Dockerfile'
+    return EXTENSIONS.get(posixpath.splitext(name)[1].lower())
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# LLM后端配置
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'zhipu').lower()  # zhipu: 智谱AI；fake: 本地模拟，用于离线压测
+ZHIPUAI_BASE_URL = os.getenv('ZHIPUAI_BASE_URL', 'https://open.bigmodel.cn/api/paas/v4').rstrip('/')
+
+# 本地模拟后端的行为
+LLM_FAKE_LATENCY = float(os.getenv('LLM_FAKE_LATENCY', '0.5'))  # 返回第一段内容前的等待（秒）
+LLM_FAKE_TOKENS_PER_SECOND = float(os.getenv('LLM_FAKE_TOKENS_PER_SECOND', '50'))  # 0表示不限速
+LLM_FAKE_ERROR_RATE = float(os.getenv('LLM_FAKE_ERROR_RATE', '0'))  # 每次调用返回错误的概率
+LLM_FAKE_ERROR_STATUSES = [int(status) for status in os.getenv('LLM_FAKE_ERROR_STATUSES', '429,503').split(',') if status]
+LLM_FAKE_SEED = int(os.getenv('LLM_FAKE_SEED', '0'))
+
+
+class LLMStatusError(RuntimeError):
+    """后端返回的HTTP错误状态"""
+
+    def __init__(self, status_code, message='', retry_after=None):
+        super().__init__(f"{status_code} - {message}" if message else str(status_code))
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMBackend:
+    """LLM后端接口：负责一次调用本身；排队、重试和截止时间由 LLMGateway 统一处理
+
+    timeout 为 httpx.Timeout（read 为两段内容之间的最长间隔，connect 为建立连接的时限）。
+    """
+
+    name = ''
+    cache_prefix = ''  # 不同后端的回答不能混用同一条缓存
+
+    def complete(self, messages, timeout, **params):
+        """返回完整回答"""
+        raise NotImplementedError
+
+    def stream(self, messages, timeout, **params):
+        """逐段产出回答；调用方提前停止时应释放连接"""
+        raise NotImplementedError
+
+    async def stream_async(self, messages, timeout, http_client, **params):
+        """异步逐段产出回答"""
+        raise NotImplementedError
+        yield
+
+    def close(self):
+        pass
+
+    def is_retryable(self, error):
+        """429、5xx和网络错误值得重试"""
+        if isinstance(error, LLMStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, (httpx.TransportError, TimeoutError))
+
+    def retry_after(self, error):
+        """服务端要求的重试等待（秒），没有时返回None"""
+        return getattr(error, 'retry_after', None)
+
+
+class ZhipuBackend(LLMBackend):
+    """智谱AI：同步调用使用SDK（共享一个httpx连接池，SDK自身不重试），异步调用直接请求OpenAI兼容接口"""
+
+    name = 'zhipu'
+
+    def __init__(self, api_key, base_url=ZHIPUAI_BASE_URL, max_connections=8):
+        from zhipuai import ZhipuAI
+
+        self.api_key = api_key
+        self.base_url = base_url
+        self.http_client = httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                            max_keepalive_connections=max_connections))
+        self.client = ZhipuAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=self.http_client)
+
+    def complete(self, messages, timeout, **params):
+        response = self.client.chat.completions.create(messages=messages, timeout=timeout, **params)
+        return response.choices[0].message.content
+
+    def stream(self, messages, timeout, **params):
+        response = self.client.chat.completions.create(messages=messages, stream=True, timeout=timeout, **params)
+        try:
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            response.response.close()  # 提前结束时释放连接
+
+    async def stream_async(self, messages, timeout, http_client, **params):
+        """SDK没有asyncio客户端，这里用httpx请求并解析SSE"""
+        payload = dict(params, messages=messages, stream=True)
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        async with http_client.stream('POST', f"{self.base_url}/chat/completions", json=payload,
+                                      headers=headers, timeout=timeout) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode('utf-8', 'replace')[:200]
+                retry_after = response.headers.get('Retry-After')
+                raise LLMStatusError(response.status_code, body,
+                                     float(retry_after) if retry_after and retry_after.isdigit() else None)
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                content = choices[0].get('delta', {}).get('content')
+                if content:
+                    yield content
+
+    def close(self):
+        self.http_client.close()
+
+    def is_retryable(self, error):
+        from zhipuai import APIConnectionError, APIStatusError, APITimeoutError
+
+        if isinstance(error, APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, (APIConnectionError, APITimeoutError)) or super().is_retryable(error)
+
+    def retry_after(self, error):
+        response = getattr(error, 'response', None)
+        value = response.headers.get('Retry-After') if response is not None else None
+        try:
+            return float(value) if value is not None else super().retry_after(error)
+        except ValueError:
+            return None
+
+
+class FakeBackend(LLMBackend):
+    """本地模拟后端：不联网，回答由提示词决定；可配置首段延迟、生成速度和按概率注入的错误
+
+    错误按固定种子的随机序列注入，同样的调用顺序得到同样的结果，便于重复压测。
+    """
+
+    name = 'fake'
+    cache_prefix = 'fake:'
+
+    def __init__(self, latency=LLM_FAKE_LATENCY, tokens_per_second=LLM_FAKE_TOKENS_PER_SECOND,
+                 error_rate=LLM_FAKE_ERROR_RATE, error_statuses=LLM_FAKE_ERROR_STATUSES, seed=LLM_FAKE_SEED):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses or [503]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def reply(messages):
+        """按提示词生成固定的回答（格式与真实分析相同）"""
+        prompt = messages[-1]['content']
+        fields = dict(line.split(': ', 1) for line in prompt.splitlines() if ': ' in line)
+        digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        name = fields.get('仓库名称', '这个项目')
+        language = fields.get('主要语言', '未知')
+        adjective = ('实用', '轻量', '完善', '活跃')[digest % 4]
+        return (f"1. {name} 是一个{adjective}的{language}项目：{fields.get('描述', '暂无描述')}\n"
+                f"2. 技术栈主要基于{language}，README中还提到了常见的构建和测试工具。\n"
+                f"3. 星标数 {fields.get('星标数', '0')}、Fork数 {fields.get('Fork数', '0')}，"
+                f"{'受到了不少关注' if digest % 3 else '关注度一般'}。\n"
+                f"4. {'适合初学者阅读源码和动手实践' if digest % 2 else '更适合有一定基础的开发者学习'}。\n")
+
+    @staticmethod
+    def tokens(text):
+        """按约2个字符一个token切分，模拟逐段返回"""
+        return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            status = self._random.choice(self.error_statuses)
+        if failed:
+            raise LLMStatusError(status, 'fake backend injected error', retry_after=None)
+
+    def _plan(self, messages, timeout):
+        """返回 (切分后的回答, 每段间隔, 读取超时)"""
+        pieces = self.tokens(self.reply(messages))
+        interval = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        read_timeout = timeout.read if isinstance(timeout, httpx.Timeout) else timeout
+        return pieces, interval, read_timeout
+
+    def complete(self, messages, timeout, **params):
+        for _ in self.stream(messages, timeout, **params):
+            pass
+        return self.reply(messages)
+
+    def stream(self, messages, timeout, **params):
+        pieces, interval, read_timeout = self._plan(messages, timeout)
+        if read_timeout is not None and self.latency > read_timeout:
+            time.sleep(read_timeout)
+            raise httpx.ReadTimeout("fake backend read timeout")
+        time.sleep(self.latency)
+        self._maybe_fail()
+        for piece in pieces:
+            if interval:
+                time.sleep(interval)
+            yield piece
+
+    async def stream_async(self, messages, timeout, http_client, **params):
+        pieces, interval, read_timeout = self._plan(messages, timeout)
+        if read_timeout is not None and self.latency > read_timeout:
+            await asyncio.sleep(read_timeout)
+            raise httpx.ReadTimeout("fake backend read timeout")
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        for piece in pieces:
+            if interval:
+                await asyncio.sleep(interval)
+            yield piece
+
+
+def create_backend(name=LLM_BACKEND, max_connections=8):
+    """按名称创建后端；zhipu 未配置ZHIPUAI_API_KEY时返回None"""
+    if name == 'fake':
+        return FakeBackend()
+    if name != 'zhipu':
+        raise ValueError(f"未知的LLM后端: {name}（可选 zhipu / fake）")
+    api_key = os.getenv('ZHIPUAI_API_KEY')
+    return ZhipuBackend(api_key, max_connections=max_connections) if api_key else None
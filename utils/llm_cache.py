@@ -0,0 +1,121 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+# LLM响应缓存配置
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'llm_cache.sqlite3'))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(20 * 1024 * 1024)))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 86400)))  # 条目最长保留时间（秒）
+LLM_CACHE_DRIFT = float(os.getenv('LLM_CACHE_DRIFT', '0'))  # 星标/Fork数在该比例内的变化视为相同，如0.1；0表示精确匹配
+
+
+def cache_key(model, prompt, params):
+    """按 (模型, 提示词, 采样参数) 计算内容地址"""
+    material = json.dumps({'model': model, 'prompt': prompt, 'params': params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def bucket_count(value, drift=LLM_CACHE_DRIFT):
+    """把计数归到对数刻度的桶里，相邻桶相差 drift 比例；用于让小幅变化的星标/Fork数得到同一个缓存键"""
+    if not drift or not isinstance(value, (int, float)) or value <= 0:
+        return value
+    step = math.log1p(drift)
+    return round(math.expm1(round(math.log1p(value) / step) * step))
+
+
+class LLMCache:
+    """LLM补全结果的持久缓存（SQLite，多个worker共享），超过容量时按最近使用时间淘汰"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS completions (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        latency REAL NOT NULL,
+        hit_count INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._db = SQLiteDatabase(path, self.SCHEMA)
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def get(self, key):
+        """命中时返回缓存的回答，否则返回None"""
+        now = time.time()
+        row = self._db.execute('SELECT response, latency, created_at FROM completions WHERE key = ?',
+                               (key,)).fetchone()
+        if row is not None and now - row['created_at'] > self.ttl:
+            self._db.execute('DELETE FROM completions WHERE key = ?', (key,))
+            row = None
+        with self._lock:
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            self._stats['saved_seconds'] += row['latency']
+        self._db.execute('UPDATE completions SET hit_count = hit_count + 1, last_used = ? WHERE key = ?', (now, key))
+        return row['response']
+
+    def set(self, key, model, response, latency):
+        """保存一次成功的调用及其耗时（命中时据此统计节省的时间）"""
+        size = len(response.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, 0, ?, ?)',
+                         (key, model, response, size, latency, now, now))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM completions').fetchone()[0]
+            if total > self.max_bytes:
+                # 按最近使用时间从旧到新删除，直到回到容量以内
+                freed = 0
+                for old_key, old_size in conn.execute('SELECT key, size FROM completions ORDER BY last_used').fetchall():
+                    if total - freed <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM completions WHERE key = ?', (old_key,))
+                    freed += old_size
+
+    def stats(self):
+        entries, size, shared_hits, shared_saved = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hit_count), 0), '
+            'COALESCE(SUM(hit_count * latency), 0) FROM completions'
+        ).fetchone()
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else None,
+                'saved_seconds': round(self._stats['saved_seconds'], 2),
+                'entries': entries,
+                'bytes': size,
+                # 所有worker合计（按当前仍在缓存中的条目统计）
+                'total_hits': shared_hits,
+                'total_saved_seconds': round(shared_saved, 2),
+            }
+
+
+def create_llm_cache():
+    """按 LLM_CACHE_ENABLED 创建缓存；关闭时返回None"""
+    return LLMCache() if LLM_CACHE_ENABLED else None
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.llm_backends import LLM_BACKEND, create_backend
+from utils.metrics import LatencyHistogram, count_upstream
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# LLM网关配置
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))  # 每个进程同时进行的LLM调用上限
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '120'))  # 单次调用（含排队和重试）的默认总时限（秒）
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '60'))  # 流式生成时两段内容之间的最长间隔（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '10'))
+LLM_RETRIES = int(os.getenv('LLM_RETRIES', '3'))  # 429/5xx/连接错误的最大重试次数
+LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', '0.5'))  # 重试退避基数（秒），实际等待为 [0, 基数×2^n] 内的随机值
+LLM_RETRY_BACKOFF_MAX = 10.0
+
+LATENCY_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+class LLMError(RuntimeError):
+    """LLM调用失败"""
+
+
+class LLMTimeout(LLMError):
+    """超过调用时限（排队、重试与生成的总时间）"""
+
+
+class LLMGateway:
+    """进程内共享的LLM调用入口：所有调用经过同一个后端（及其连接池），限制并发，传递截止时间，对429/5xx带抖动重试"""
+
+    def __init__(self, backend, max_concurrency=LLM_MAX_CONCURRENCY,
+                 timeout=LLM_TIMEOUT, retries=LLM_RETRIES, backoff=LLM_RETRY_BACKOFF):
+        self.backend = backend
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._stats = Counter()
+        self.latency = LatencyHistogram(LATENCY_BUCKETS)
+        self.queue_wait = LatencyHistogram(LATENCY_BUCKETS)
+
+    def deadline(self, timeout=None):
+        """计算截止时间，供调用方在多个步骤间传递"""
+        return time.time() + (self.timeout if timeout is None else timeout)
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise LLMTimeout("AI分析超时，请稍后重试")
+        return remaining
+
+    def _raise_if_expired(self, deadline, error):
+        """请求因到达截止时间而超时时，统一抛出LLMTimeout"""
+        if time.time() >= deadline - 0.05:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise LLMTimeout("AI分析超时，请稍后重试") from error
+
+    def _call_timeout(self, deadline):
+        """单次HTTP请求的超时：不超过剩余时间"""
+        remaining = self._remaining(deadline)
+        return httpx.Timeout(min(LLM_READ_TIMEOUT, remaining), connect=min(LLM_CONNECT_TIMEOUT, remaining))
+
+    def _retry_delay(self, error, attempt, deadline, started=False):
+        """可以重试时返回等待秒数，否则返回None；流式调用收到内容后不再重试"""
+        count_upstream('llm', getattr(error, 'status_code', None) or 'error')
+        if started or attempt >= self.retries or not self.backend.is_retryable(error):
+            return None
+        return self._backoff(attempt, deadline, self.backend.retry_after(error))
+
+    def _backoff(self, attempt, deadline, retry_after=None):
+        """带完全抖动的指数退避；服务端给出Retry-After时以其为准；等待不会越过截止时间"""
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            delay = random.uniform(0, min(LLM_RETRY_BACKOFF_MAX, self.backoff * 2 ** attempt))
+        if time.time() + delay >= deadline:
+            return None
+        with self._lock:
+            self._stats['retries'] += 1
+        return delay
+
+    # ---- 并发槽位 ----
+
+    def _acquire(self, deadline):
+        start = time.time()
+        with self._lock:
+            self._waiting += 1
+        try:
+            if not self._slots.acquire(timeout=max(0.0, deadline - start)):
+                self._remaining(deadline)
+                raise LLMTimeout("AI分析排队超时，请稍后重试")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        self._on_acquired(time.time() - start)
+
+    async def _acquire_async(self, deadline):
+        """异步等待槽位：与同步调用共用同一个信号量，不阻塞事件循环"""
+        start = time.time()
+        with self._lock:
+            self._waiting += 1
+        try:
+            while not self._slots.acquire(blocking=False):
+                self._remaining(deadline)
+                await asyncio.sleep(0.05)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        self._on_acquired(time.time() - start)
+
+    def _on_acquired(self, waited):
+        self.queue_wait.observe(waited)
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self, start, outcome):
+        self.latency.observe(time.time() - start)
+        with self._lock:
+            self._in_flight -= 1
+            self._stats[outcome] += 1
+        self._slots.release()
+
+    # ---- 调用 ----
+
+    def complete(self, messages, deadline=None, **params):
+        """一次性返回完整回答"""
+        deadline = deadline or self.deadline()
+        self._acquire(deadline)
+        start, outcome = time.time(), 'errors'
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    content = self.backend.complete(messages, self._call_timeout(deadline), **params)
+                    count_upstream('llm', 200)
+                    outcome = 'completed'
+                    return content
+                except LLMError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        self._raise_if_expired(deadline, e)
+                        raise
+                    time.sleep(delay)
+        finally:
+            self._release(start, outcome)
+
+    def stream(self, messages, deadline=None, **params):
+        """流式返回回答；只在收到第一段内容之前重试，之后出错直接抛出"""
+        deadline = deadline or self.deadline()
+        self._acquire(deadline)
+        start, outcome = time.time(), 'errors'
+        try:
+            for attempt in range(self.retries + 1):
+                started = False
+                chunks = self.backend.stream(messages, self._call_timeout(deadline), **params)
+                try:
+                    for text in chunks:
+                        self._remaining(deadline)
+                        started = True
+                        yield text
+                    count_upstream('llm', 200)
+                    outcome = 'completed'
+                    return
+                except GeneratorExit:
+                    outcome = 'cancelled'
+                    raise
+                except LLMError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, deadline, started)
+                    if delay is None:
+                        self._raise_if_expired(deadline, e)
+                        raise
+                    time.sleep(delay)
+                finally:
+                    chunks.close()  # 提前结束时由后端释放连接
+        finally:
+            self._release(start, outcome)
+
+    async def stream_async(self, messages, http_client, deadline=None, **params):
+        """异步流式调用，与同步调用共用并发槽位；http_client 为事件循环内共享的httpx.AsyncClient"""
+        deadline = deadline or self.deadline()
+        await self._acquire_async(deadline)
+        start, outcome = time.time(), 'errors'
+        try:
+            for attempt in range(self.retries + 1):
+                started = False
+                chunks = self.backend.stream_async(messages, self._call_timeout(deadline), http_client, **params)
+                try:
+                    async for text in chunks:
+                        self._remaining(deadline)
+                        started = True
+                        yield text
+                    count_upstream('llm', 200)
+                    outcome = 'completed'
+                    return
+                except (GeneratorExit, asyncio.CancelledError):
+                    outcome = 'cancelled'
+                    raise
+                except LLMError:
+                    raise
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, deadline, started)
+                    if delay is None:
+                        self._raise_if_expired(deadline, e)
+                        raise
+                    await asyncio.sleep(delay)
+                finally:
+                    await chunks.aclose()
+        finally:
+            self._release(start, outcome)
+
+    def stats(self):
+        """供监控使用：排队数、在途数、结果计数和耗时直方图"""
+        with self._lock:
+            counters = {
+                'max_concurrency': self.max_concurrency,
+                'queue_depth': self._waiting,
+                'in_flight': self._in_flight,
+                'completed': self._stats['completed'],
+                'errors': self._stats['errors'],
+                'cancelled': self._stats['cancelled'],
+                'retries': self._stats['retries'],
+                'timeouts': self._stats['timeouts'],
+            }
+        return dict(counters, backend=self.backend.name, latency=self.latency.snapshot(), queue_wait=self.queue_wait.snapshot())
+
+
+_gateway = None
+_gateway_unavailable = False
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """获取进程内共享的LLM网关，后端由 LLM_BACKEND 选择；LLM_BACKEND 无效或智谱AI后端未配置ZHIPUAI_API_KEY时返回None"""
+    global _gateway, _gateway_unavailable
+    if _gateway is None and not _gateway_unavailable:
+        with _gateway_lock:
+            if _gateway is None and not _gateway_unavailable:
+                try:
+                    backend = create_backend(LLM_BACKEND, max_connections=LLM_MAX_CONCURRENCY)
+                except ImportError:
+                    logger.error("请安装zhipuai库: pip install zhipuai")
+                    backend = None
+                except ValueError as e:
+                    # LLM_BACKEND 配置错误时与未配置LLM一样退回模板分析
+                    logger.error(str(e))
+                    backend = None
+                if backend is None:
+                    _gateway_unavailable = True
+                    return None
+                _gateway = LLMGateway(backend)
+    return _gateway
+
+
+def llm_gateway_stats():
+    return _gateway.stats() if _gateway is not None else {'enabled': False}
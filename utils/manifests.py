@@ -0,0 +1,112 @@
+import json
+import posixpath
+import re
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10及以下没有tomllib，TOML格式的清单只记录文件，不解析依赖
+    tomllib = None
+
+# 依赖清单文件名 -> 包管理器
+MANIFESTS = {
+    'package.json': 'npm',
+    'requirements.txt': 'pip',
+    'pyproject.toml': 'pip',
+    'Pipfile': 'pipenv',
+    'go.mod': 'go',
+    'Cargo.toml': 'cargo',
+    'Gemfile': 'bundler',
+    'composer.json': 'composer',
+    'pom.xml': 'maven',
+    'build.gradle': 'gradle',
+    'build.gradle.kts': 'gradle',
+}
+
+MANIFEST_MAX_BYTES = 256 * 1024  # 超过该大小的清单不解析（只读取这么多内容到内存）
+MAX_DEPENDENCIES = 200  # 每个清单最多记录的依赖数
+
+_REQUIREMENT_NAME = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+_GO_REQUIRE = re.compile(r'^\s*(?:require\s+)?([^\s()]+\.[^\s()]+/\S+)\s+v\S+', re.MULTILINE)
+_GEM = re.compile(r'''^\s*gem\s+['"]([^'"]+)['"]''', re.MULTILINE)
+_MAVEN_DEPENDENCY = re.compile(r'<dependency>.*?<groupId>\s*([^<\s]+)\s*</groupId>.*?<artifactId>\s*([^<\s]+)\s*</artifactId>',
+                               re.DOTALL)
+_GRADLE_DEPENDENCY = re.compile(r'''\b(?:implementation|api|compile|compileOnly|runtimeOnly|testImplementation|kapt)\s*\(?\s*['"]([^'":]+:[^'":]+)''')
+
+
+def manifest_type(path):
+    """返回依赖清单的包管理器名称，不是依赖清单时返回None（requirements-dev.txt、requirements/*.txt 也算pip清单）"""
+    name = posixpath.basename(path)
+    if name in MANIFESTS:
+        return MANIFESTS[name]
+    if name.endswith('.txt') and (name.startswith('requirements') or posixpath.basename(posixpath.dirname(path)) == 'requirements'):
+        return 'pip'
+    return None
+
+
+def _requirement_names(lines):
+    names = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        match = _REQUIREMENT_NAME.match(line)
+        if match:
+            names.append(match.group(1))
+    return names
+
+
+def _parse_pyproject(data):
+    names = _requirement_names((data.get('project') or {}).get('dependencies') or [])
+    for extra in ((data.get('project') or {}).get('optional-dependencies') or {}).values():
+        names += _requirement_names(extra)
+    poetry = (data.get('tool') or {}).get('poetry') or {}
+    for section in ('dependencies', 'dev-dependencies'):
+        names += [name for name in (poetry.get(section) or {}) if name != 'python']
+    return names
+
+
+def _parse_cargo(data):
+    names = []
+    for section in ('dependencies', 'dev-dependencies', 'build-dependencies'):
+        names += list(data.get(section) or {})
+    names += list(((data.get('workspace') or {}).get('dependencies')) or {})
+    return names
+
+
+def parse_manifest(path, content):
+    """解析依赖清单（bytes），返回依赖名列表；格式错误时返回空列表"""
+    kind = manifest_type(path)
+    name = posixpath.basename(path)
+    text = content.decode('utf-8', 'replace')
+    try:
+        if kind == 'npm':
+            data = json.loads(text)
+            names = [dep for section in ('dependencies', 'devDependencies', 'peerDependencies')
+                     for dep in (data.get(section) or {})]
+        elif kind == 'composer':
+            data = json.loads(text)
+            names = [dep for section in ('require', 'require-dev') for dep in (data.get(section) or {})
+                     if dep != 'php' and not dep.startswith('ext-')]
+        elif kind == 'pip' and name == 'pyproject.toml':
+            names = _parse_pyproject(tomllib.loads(text)) if tomllib else []
+        elif kind == 'pip':
+            names = _requirement_names(text.splitlines())
+        elif kind == 'pipenv':
+            data = tomllib.loads(text) if tomllib else {}
+            names = [dep for section in ('packages', 'dev-packages') for dep in (data.get(section) or {})]
+        elif kind == 'cargo':
+            names = _parse_cargo(tomllib.loads(text)) if tomllib else []
+        elif kind == 'go':
+            names = _GO_REQUIRE.findall(text)
+        elif kind == 'bundler':
+            names = _GEM.findall(text)
+        elif kind == 'maven':
+            names = [f'{group}:{artifact}' for group, artifact in _MAVEN_DEPENDENCY.findall(text)]
+        elif kind == 'gradle':
+            names = _GRADLE_DEPENDENCY.findall(text)
+        else:
+            names = []
+    except (ValueError, AttributeError, TypeError):
+        # json.JSONDecodeError 和 tomllib.TOMLDecodeError 都是 ValueError 的子类
+        return []
+    return list(dict.fromkeys(names))[:MAX_DEPENDENCIES]
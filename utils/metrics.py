@@ -0,0 +1,252 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 每个请求记录分阶段耗时（trace）的抽样比例；请求头 X-Trace: 1 时总是记录
+METRICS_TRACE_SAMPLE_RATE = float(os.getenv('METRICS_TRACE_SAMPLE_RATE', '1.0'))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class LatencyHistogram:
+    """累积直方图：每个桶统计耗时不超过上界的次数"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f'le_{bound}': count for bound, count in zip(self.buckets, self.counts)}
+            return dict(buckets, count=self.count, sum=round(self.sum, 3))
+
+
+def histogram_samples(name, labels, snapshot):
+    """把 LatencyHistogram.snapshot() 转成Prometheus的 _bucket / _sum / _count 样本"""
+    for key, count in snapshot.items():
+        if key.startswith('le_'):
+            yield f'{name}_bucket', dict(labels, le=key[3:]), count
+    yield f'{name}_bucket', dict(labels, le='+Inf'), snapshot['count']
+    yield f'{name}_sum', labels, snapshot['sum']
+    yield f'{name}_count', labels, snapshot['count']
+
+
+class Counter:
+    """带标签的计数器：同一指标名下按标签值分别累加"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    """带标签的仪表：在途数等可增可减的数值"""
+
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Counter):
+    """带标签的耗时直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+
+    def observe(self, seconds, **labels):
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = LatencyHistogram(self.buckets)
+        histogram.observe(seconds)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, histogram in items:
+            yield from histogram_samples(self.name, dict(zip(self.labelnames, key)), histogram.snapshot())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Registry:
+    """进程内的指标登记处，按Prometheus文本格式输出
+
+    除了直接登记的 Counter/Gauge/Histogram，还可以登记各组件已有的 stats() 函数，
+    输出时读取其中的数值字段（缓存命中数、队列长度等），组件本身不需要改动。
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def register_stats(self, prefix, stats, counters=(), gauges=(), histograms=()):
+        """登记一个 stats() 函数；同名前缀重复登记时以最后一次为准（异步服务模式替换同步模式的组件）"""
+        with self._lock:
+            self._stats[prefix] = (stats, counters, gauges, histograms)
+
+    def _collect_stats(self, prefix, stats, counters, gauges, histograms):
+        try:
+            values = stats()
+        except Exception as e:
+            logger.warning("读取指标失败", extra={'prefix': prefix, 'error': str(e)})
+            return
+        for field in counters:
+            if isinstance(values.get(field), (int, float)):
+                yield f'{prefix}_{field}_total', 'counter', f'{prefix} {field}', [(f'{prefix}_{field}_total', {}, values[field])]
+        for field in gauges:
+            if isinstance(values.get(field), (int, float)):
+                yield f'{prefix}_{field}', 'gauge', f'{prefix} {field}', [(f'{prefix}_{field}', {}, values[field])]
+        for field in histograms:
+            if isinstance(values.get(field), dict):
+                name = f'{prefix}_{field}_seconds'
+                yield name, 'histogram', f'{prefix} {field}', list(histogram_samples(name, {}, values[field]))
+
+    def collect(self):
+        """逐个产出 (指标名, 类型, 说明, [(样本名, 标签, 值)])"""
+        with self._lock:
+            metrics = list(self._metrics)
+            stats = list(self._stats.items())
+        for metric in metrics:
+            yield metric.name, metric.kind, metric.help, list(metric.samples())
+        for prefix, entry in stats:
+            yield from self._collect_stats(prefix, *entry)
+
+    def render(self):
+        lines = []
+        for name, kind, help_text, samples in self.collect():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内共享的指标（gunicorn多worker时每个进程各自统计）
+registry = Registry()
+stage_duration = registry.histogram('stage_duration_seconds', '分析流程各阶段的耗时', ('stage',))
+stage_in_flight = registry.gauge('stage_in_flight', '正在执行的阶段数', ('stage',))
+http_requests = registry.counter('http_requests_total', '处理的HTTP请求数', ('endpoint', 'method', 'status'))
+http_duration = registry.histogram('http_request_duration_seconds', 'HTTP请求的处理耗时（流式响应只计到开始返回）',
+                                   ('endpoint',))
+http_in_flight = registry.gauge('http_requests_in_flight', '正在处理的HTTP请求数', ('endpoint',))
+upstream_responses = registry.counter('upstream_responses_total', '上游接口（GitHub、LLM）返回的状态码',
+                                      ('upstream', 'status'))
+
+_trace = contextvars.ContextVar('metrics_trace', default=None)
+
+
+def start_trace(force=False):
+    """开始记录本次请求的分阶段耗时；按 METRICS_TRACE_SAMPLE_RATE 抽样，未抽中时返回None"""
+    trace = {} if force or random.random() < METRICS_TRACE_SAMPLE_RATE else None
+    _trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+def end_trace():
+    _trace.set(None)
+
+
+def trace_requested(headers):
+    """请求头 X-Trace: 1 时强制记录本次请求"""
+    return headers.get('X-Trace', '').lower() in ('1', 'true', 'yes')
+
+
+def endpoint_label(request):
+    """指标中的路由标签使用路由规则（如 /report/<report_id>），避免每个ID各成一组"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@contextmanager
+def stage(name):
+    """统计一个阶段的耗时：写入耗时直方图和在途数；本次请求被抽中时同时记入trace（同名阶段累加）"""
+    stage_in_flight.inc(stage=name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_in_flight.dec(stage=name)
+        stage_duration.observe(elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = round(trace.get(name, 0) + elapsed, 4)
+
+
+def count_upstream(upstream, status):
+    upstream_responses.inc(upstream=upstream, status=status)
+
+
+def server_timing(trace):
+    """把trace格式化为 Server-Timing 响应头（毫秒），浏览器开发者工具可直接展示"""
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in trace.items())
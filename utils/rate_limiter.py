@@ -0,0 +1,272 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+# 调度器配置
+GITHUB_RATE_BURST = int(os.getenv('GITHUB_RATE_BURST', '50'))  # 令牌桶容量，允许的瞬时突发调用数
+GITHUB_RATE_MAX_WAIT = float(os.getenv('GITHUB_RATE_MAX_WAIT', '30'))  # 单次调用最多排队等待的秒数
+GITHUB_RATE_STATE_PATH = os.getenv('GITHUB_RATE_STATE_PATH', '')  # 设置后多个worker通过SQLite共享配额状态
+SECONDARY_BACKOFF_MIN = 60  # 没有Retry-After时的二级限流退避起点（秒）
+SECONDARY_BACKOFF_MAX = 900
+
+
+class RateLimitExceeded(Exception):
+    """配额耗尽或被二级限流，且等待时间超过允许范围"""
+
+    def __init__(self, retry_after):
+        self.retry_after = max(0, int(retry_after + 0.999))
+        resume_at = datetime.fromtimestamp(time.time() + self.retry_after).strftime('%H:%M:%S')
+        super().__init__(f"GitHub API配额已用尽或请求过于频繁，请在 {resume_at} 之后重试")
+
+
+def is_rate_limited(status_code, headers):
+    """判断响应是否为GitHub的限流响应（主限额耗尽或二级限流）"""
+    if status_code == 429:
+        return True
+    return status_code == 403 and (headers.get('Retry-After') is not None
+                                   or headers.get('X-RateLimit-Remaining') == '0')
+
+
+class TokenQuota:
+    """单个令牌的配额状态：响应头中的剩余额度 + 按剩余额度均匀分配到重置前的令牌桶"""
+
+    def __init__(self, token, burst=GITHUB_RATE_BURST):
+        self.token = token
+        self.key = hashlib.sha256(token.encode('utf-8')).hexdigest()[:12] if token else 'anonymous'
+        self.burst = burst
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = 0.0
+        self.secondary_backoff = 0
+        self.reserved = 0
+        self.bucket = float(burst)
+        self.bucket_updated = time.time()
+        self.updated_at = 0.0
+
+    def _rate(self, now):
+        """令牌桶补充速率：剩余额度平均分配到重置时刻之前"""
+        if self.remaining is None or self.reset_at is None:
+            return None
+        return max(self.remaining - self.reserved, 0) / max(self.reset_at - now, 1.0)
+
+    def _refill(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            # 已过重置时间，视为配额恢复，等待下一次响应头校准
+            self.remaining = self.limit
+            self.reset_at = None
+        rate = self._rate(now)
+        if rate is None:
+            self.bucket = float(self.burst)
+        else:
+            self.bucket = min(float(self.burst), self.bucket + rate * (now - self.bucket_updated))
+        self.bucket_updated = now
+
+    def wait_time(self, cost, now):
+        """返回可以发出 cost 次调用前需要等待的秒数"""
+        self._refill(now)
+        waits = [self.blocked_until - now]
+        if self.remaining is not None and self.remaining - self.reserved < cost:
+            if self.remaining < cost and self.reset_at is not None:
+                waits.append(self.reset_at - now)
+            elif self.reserved:
+                # 响应头可能已经计入了部分在途调用，等它们返回后再按准确的剩余额度判断
+                waits.append(1.0)
+        if self.bucket < cost:
+            rate = self._rate(now)
+            waits.append((cost - self.bucket) / rate if rate else 1.0)
+        return max(0.0, max(waits))
+
+    def take(self, cost):
+        self.reserved += cost
+        self.bucket -= cost
+
+    def update(self, status_code, headers, now):
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            reset_at = float(headers['X-RateLimit-Reset']) if headers.get('X-RateLimit-Reset') else self.reset_at
+            if reset_at == self.reset_at and self.remaining is not None:
+                # 并发请求的响应可能乱序到达，同一窗口内剩余额度只减不增
+                self.remaining = min(self.remaining, int(remaining))
+            else:
+                self.remaining = int(remaining)
+            self.reset_at = reset_at
+            if headers.get('X-RateLimit-Limit'):
+                self.limit = int(headers['X-RateLimit-Limit'])
+            self.updated_at = now
+
+        if is_rate_limited(status_code, headers):
+            retry_after = headers.get('Retry-After')
+            if retry_after is not None:
+                self.blocked_until = now + float(retry_after)
+            elif self.remaining == 0 and self.reset_at:
+                self.blocked_until = self.reset_at
+            else:
+                # 二级限流且没有Retry-After：指数退避
+                self.secondary_backoff = min(max(self.secondary_backoff * 2, SECONDARY_BACKOFF_MIN),
+                                             SECONDARY_BACKOFF_MAX)
+                self.blocked_until = now + self.secondary_backoff
+            self.updated_at = now
+        elif status_code < 400:
+            self.secondary_backoff = 0
+
+    def snapshot(self, now):
+        self._refill(now)
+        return {
+            'token': self.key,
+            'limit': self.limit,
+            'remaining': self.remaining,
+            'reset_at': self.reset_at,
+            'reserved': self.reserved,
+            'blocked_for': round(max(0.0, self.blocked_until - now), 1),
+            'bucket': round(self.bucket, 1),
+        }
+
+
+class GitHubRateLimiter:
+    """GitHub调用调度器：根据 X-RateLimit-* 响应头跟踪每个令牌的配额，排队、限速并在多个令牌间分摊负载"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS quota (
+        token_key TEXT PRIMARY KEY,
+        quota_limit INTEGER,
+        remaining INTEGER,
+        reset_at REAL,
+        blocked_until REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, tokens=None, burst=GITHUB_RATE_BURST, state_path=GITHUB_RATE_STATE_PATH, resource='core'):
+        self.resource = resource  # GitHub按资源分别计算配额：core（REST）、graphql 等
+        self.quotas = [TokenQuota(token, burst) for token in (tokens or [None])]
+        self._by_token = {quota.token: quota for quota in self.quotas}
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._db = SQLiteDatabase(state_path, self.SCHEMA) if state_path else None
+        self._last_sync = 0.0
+
+    def _sync(self, now):
+        """从共享存储读取其他worker写入的更新的配额状态"""
+        if self._db is None or now - self._last_sync < 1.0:
+            return
+        self._last_sync = now
+        for row in self._db.execute('SELECT * FROM quota'):
+            for quota in self.quotas:
+                if self._row_key(quota) == row['token_key'] and row['updated_at'] > quota.updated_at:
+                    quota.limit = row['quota_limit']
+                    quota.remaining = row['remaining']
+                    quota.reset_at = row['reset_at']
+                    quota.blocked_until = max(quota.blocked_until, row['blocked_until'])
+                    quota.updated_at = row['updated_at']
+
+    def _row_key(self, quota):
+        """共享存储中的行键；core 以外的资源加上资源名前缀，与REST配额分开保存"""
+        return quota.key if self.resource == 'core' else f'{self.resource}:{quota.key}'
+
+    def _persist(self, quota):
+        if self._db is None:
+            return
+        self._db.execute(
+            'INSERT OR REPLACE INTO quota VALUES (?, ?, ?, ?, ?, ?)',
+            (self._row_key(quota), quota.limit, quota.remaining, quota.reset_at, quota.blocked_until, quota.updated_at),
+        )
+
+    def _best(self, cost, now):
+        """选出等待时间最短（相同时剩余额度最多）的令牌"""
+        def rank(quota):
+            remaining = quota.remaining if quota.remaining is not None else float('inf')
+            return quota.wait_time(cost, now), -(remaining - quota.reserved)
+        return min(self.quotas, key=rank)
+
+    def acquire(self, cost=1, max_wait=GITHUB_RATE_MAX_WAIT):
+        """排队等待可用配额，返回要使用的令牌（匿名访问时为None）；等待超过 max_wait 秒则抛出RateLimitExceeded"""
+        deadline = None if max_wait is None else time.time() + max_wait
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.time()
+                    self._sync(now)
+                    quota = self._best(cost, now)
+                    wait = quota.wait_time(cost, now)
+                    if wait <= 0:
+                        quota.take(cost)
+                        return quota.token
+                    if deadline is not None and now + wait > deadline:
+                        raise RateLimitExceeded(wait)
+                    self._cond.wait(min(wait, 1.0))
+            finally:
+                self._waiting -= 1
+
+    def try_acquire(self, cost=1):
+        """不阻塞地尝试预留配额，返回 (是否成功, 令牌, 还需等待的秒数)；供异步调用方自行 await 等待"""
+        with self._cond:
+            now = time.time()
+            self._sync(now)
+            quota = self._best(cost, now)
+            wait = quota.wait_time(cost, now)
+            if wait <= 0:
+                quota.take(cost)
+                return True, quota.token, 0.0
+            return False, None, wait
+
+    def release(self, token, cost=1):
+        """调用失败（没有响应）时归还预留的额度"""
+        with self._cond:
+            quota = self._by_token[token]
+            quota.reserved = max(0, quota.reserved - cost)
+            self._cond.notify_all()
+
+    def complete(self, token, status_code, headers, cost=1):
+        """调用返回后归还预留额度，并用响应头更新配额状态"""
+        now = time.time()
+        with self._cond:
+            quota = self._by_token[token]
+            quota.reserved = max(0, quota.reserved - cost)
+            quota.update(status_code, headers, now)
+            self._persist(quota)
+            self._cond.notify_all()
+
+    def wait_available(self, cost, max_wait=None):
+        """等待所有令牌的剩余额度合计至少为 cost（不预留），超时返回False；用于批量任务提交前的检查"""
+        deadline = None if max_wait is None else time.time() + max_wait
+        with self._cond:
+            while True:
+                now = time.time()
+                self._sync(now)
+                waits = [quota.wait_time(cost, now) for quota in self.quotas]
+                available = sum(
+                    float('inf') if quota.remaining is None else quota.remaining - quota.reserved
+                    for quota in self.quotas
+                )
+                if available >= cost or min(waits) <= 0:
+                    return True
+                wait = min(waits)
+                if deadline is not None and now + wait > deadline:
+                    return False
+                self._cond.wait(min(wait, 1.0))
+
+    def snapshot(self):
+        """供监控使用的配额状态"""
+        now = time.time()
+        with self._cond:
+            self._sync(now)
+            return {'waiting': self._waiting, 'tokens': [quota.snapshot(now) for quota in self.quotas]}
+
+
+def load_tokens():
+    """读取配置的GitHub令牌：GITHUB_TOKENS（逗号分隔）优先，其次GITHUB_TOKEN"""
+    tokens = [token.strip() for token in os.getenv('GITHUB_TOKENS', '').split(',') if token.strip()]
+    if not tokens and os.getenv('GITHUB_TOKEN'):
+        tokens = [os.getenv('GITHUB_TOKEN')]
+    return tokens
@@ -0,0 +1,197 @@
+import math
+import os
+import re
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# README预处理配置
+README_TOKEN_BUDGET = int(os.getenv('README_TOKEN_BUDGET', '800'))  # 发给LLM的README内容的token上限
+README_CODE_BLOCK_LINES = 6  # 代码块最多保留的行数
+
+# 章节标题关键词的权重：介绍和功能最有价值，许可证、贡献者等几乎不影响分析
+SECTION_WEIGHTS = [
+    (re.compile(r'intro|overview|about|what is|description|简介|介绍|概述|关于'), 3.0),
+    (re.compile(r'feature|highlight|why|特性|功能|亮点|优势'), 2.5),
+    (re.compile(r'architecture|design|how it works|concept|架构|设计|原理'), 2.0),
+    (re.compile(r'usage|quick ?start|getting started|example|demo|使用|快速开始|示例|用法'), 1.5),
+    (re.compile(r'install|setup|requirement|安装|依赖|环境'), 1.0),
+    (re.compile(r'faq|roadmap|常见问题|路线'), 0.6),
+    (re.compile(r'table of contents|contents|toc|目录'), 0.0),
+    (re.compile(r'licen[cs]e|contribut|changelog|release|acknowledg|thank|sponsor|backer|citation|cite|author|'
+                r'contact|support|star history|许可|贡献|致谢|更新日志|赞助|联系'), 0.1),
+]
+
+_CJK = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+_FENCE = re.compile(r'^\s*(```|~~~)')
+_ATX_HEADING = re.compile(r'^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$')
+_SETEXT_UNDERLINE = re.compile(r'^\s{0,3}(=+|-+)\s*$')
+_HTML_COMMENT = re.compile(r'<!--.*?-->', re.S)
+_BADGE_LINK = re.compile(r'\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)')
+_IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)|!\[[^\]]*\]\[[^\]]*\]')
+_LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+_REF_DEFINITION = re.compile(r'^\s*\[[^\]]+\]:\s*\S+.*$', re.M)
+_HTML_TAG = re.compile(r'</?[a-zA-Z][^>]*>')
+_BARE_URL = re.compile(r'https?://\S+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def estimate_tokens(text):
+    """本地估算token数：中日韩字符约1个token，其余文本约4个字符1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class Section:
+    def __init__(self, level, title, lines, index):
+        self.level = level
+        self.title = title
+        self.index = index
+        self.body = clean_markdown('\n'.join(lines))
+        self.score = 0.0
+
+    def render(self, body=None):
+        body = self.body if body is None else body
+        if not self.title:
+            return body
+        return f"{'#' * self.level} {self.title}\n{body}".rstrip()
+
+
+def parse_sections(markdown):
+    """按标题把README拆成章节；代码块中的 # 不当作标题"""
+    sections, lines = [], []
+    level, title = 0, ''
+    in_fence = False
+    for line in markdown.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _ATX_HEADING.match(line)
+        if heading:
+            sections.append(Section(level, title, lines, len(sections)))
+            level, title, lines = len(heading.group(1)), clean_markdown(heading.group(2)), []
+            continue
+        # Setext标题：文本行下面紧跟 === 或 ---
+        if (not in_fence and lines and lines[-1].strip() and _SETEXT_UNDERLINE.match(line)
+                and not _SETEXT_UNDERLINE.match(lines[-1])):
+            previous = lines.pop()
+            sections.append(Section(level, title, lines, len(sections)))
+            level, title, lines = (1 if line.strip()[0] == '=' else 2), clean_markdown(previous), []
+            continue
+        lines.append(line)
+    sections.append(Section(level, title, lines, len(sections)))
+    return [section for section in sections if section.title or section.body]
+
+
+def clean_markdown(text):
+    """去掉徽章、图片、HTML标签和注释、链接地址，只保留有信息量的文字；过长的代码块只保留开头几行"""
+    text = _HTML_COMMENT.sub('', text)
+    text = _BADGE_LINK.sub('', text)
+    text = _IMAGE.sub('', text)
+    text = _LINK.sub(r'\1', text)
+    text = _REF_DEFINITION.sub('', text)
+    text = _HTML_TAG.sub('', text)
+    text = _BARE_URL.sub('', text)
+
+    lines, code_lines, in_fence = [], 0, False
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            if in_fence and code_lines > README_CODE_BLOCK_LINES:
+                lines.append('...')
+            in_fence, code_lines = not in_fence, 0
+            lines.append(line.strip())
+            continue
+        if in_fence:
+            code_lines += 1
+            if code_lines > README_CODE_BLOCK_LINES:
+                continue
+        elif not line.strip(' |-:'):
+            line = ''  # 只有表格分隔符等符号的行
+        lines.append(line.rstrip())
+    return _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def score_section(section, total):
+    """章节得分 = 标题关键词权重 × 位置系数 × 内容质量"""
+    if not section.body:
+        return 0.0
+    title = section.title.lower()
+    weight = 1.0
+    if not section.title:
+        weight = 3.0  # 第一个标题之前的内容通常就是项目简介
+    else:
+        for pattern, pattern_weight in SECTION_WEIGHTS:
+            if pattern.search(title):
+                weight = pattern_weight
+                break
+
+    position = 1.0 - 0.5 * section.index / max(total, 1)  # 越靠前越重要
+    lines = [line for line in section.body.splitlines() if line.strip()]
+    prose = [line for line in lines if not line.lstrip().startswith(('```', '~~~', '|', '$', '>'))]
+    quality = 0.3 + 0.7 * (len(prose) / len(lines)) if lines else 0.0  # 以代码或表格为主的章节降权
+    return weight * position * quality
+
+
+def _truncate(text, budget):
+    """按行截断到 budget 个token以内，单行过长时按估算比例截断"""
+    kept, used = [], 0
+    in_fence = False
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            remaining = budget - used - 1
+            if remaining > 10 and not in_fence:
+                kept.append(line[:int(len(line) * remaining / cost)] + '…')
+            break
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        kept.append(line)
+        used += cost
+    if in_fence:
+        kept.append('```')
+    return '\n'.join(kept).strip()
+
+
+def digest_readme(readme_content, token_budget=README_TOKEN_BUDGET):
+    """把README压缩成不超过 token_budget 个token的摘要：清理噪声、按相关性挑选章节，并保持原有顺序"""
+    if not readme_content or readme_content == "无README":
+        return readme_content or ''
+
+    sections = parse_sections(readme_content)
+    for section in sections:
+        section.score = score_section(section, len(sections))
+
+    # 第一轮：按得分从高到低，每个章节最多分到预算的 1/4，保证多个重要章节都能入选
+    # 第二轮：剩余预算再按得分顺序分给被截断的章节
+    ranked = [section for section in sorted(sections, key=lambda s: (-s.score, s.index)) if section.score > 0]
+    allowance = {}
+    remaining = token_budget
+    for cap in (max(token_budget // 4, 50), token_budget):
+        for section in ranked:
+            if remaining <= 20:
+                break
+            full_cost = estimate_tokens(section.render()) + 1
+            current = allowance.get(section.index, 0)
+            extra = min(full_cost, cap) - current
+            if extra > 0:
+                extra = min(extra, remaining)
+                allowance[section.index] = current + extra
+                remaining -= extra
+
+    chosen = {}
+    for section in sections:
+        budget = allowance.get(section.index, 0)
+        if budget <= 0:
+            continue
+        text = section.render()
+        if estimate_tokens(text) + 1 > budget:
+            heading_cost = estimate_tokens(section.render('')) + 1
+            if budget - heading_cost <= 10:
+                continue
+            text = section.render(_truncate(section.body, budget - heading_cost - 1))
+        chosen[section.index] = text
+
+    return '\n\n'.join(chosen[index] for index in sorted(chosen))
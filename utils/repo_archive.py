@@ -0,0 +1,326 @@
+import glob
+import json
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from utils.code_stats import (BATCH_FILES, CODE_STATS_BATCH_BYTES, CODE_STATS_MAX_FILE_BYTES, CODE_STATS_WORKERS,
+                              StatsAccumulator, count_batch, run_batches)
+
+# 加载环境变量
+load_dotenv()
+
+# 仓库归档配置
+# 归档来源：为空时通过GitHub REST接口下载tarball；否则为包含 {owner}、{repo} 的git地址模板，
+# 如 file:///srv/mirrors/{owner}/{repo}.git 或 https://github.com/{owner}/{repo}.git，用浅克隆获取
+REPO_ARCHIVE_SOURCE = os.getenv('REPO_ARCHIVE_SOURCE', '')
+REPO_ARCHIVE_DIR = os.getenv('REPO_ARCHIVE_DIR', os.path.join(tempfile.gettempdir(), 'repo_archives'))
+REPO_ARCHIVE_MAX_BYTES = int(os.getenv('REPO_ARCHIVE_MAX_BYTES', str(1024 * 1024 * 1024)))  # 磁盘缓存总大小上限，超出后按最近使用时间淘汰
+REPO_ARCHIVE_MAX_SIZE = int(os.getenv('REPO_ARCHIVE_MAX_SIZE', str(256 * 1024 * 1024)))  # 单个归档（压缩后）的大小上限
+REPO_ARCHIVE_TIMEOUT = int(os.getenv('REPO_ARCHIVE_TIMEOUT', '300'))  # 下载或克隆一个仓库的时限（秒）
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+STATS_VERSION = 2  # 统计结果的格式版本，缓存中旧格式的结果会重新计算
+
+
+class ArchiveError(Exception):
+    """无法获取或读取仓库归档"""
+
+
+class TeeReader:
+    """从数据块迭代器读取，同时把读到的内容写入 sink；总大小超过 limit 时抛出ArchiveError"""
+
+    def __init__(self, chunks, sink, limit=REPO_ARCHIVE_MAX_SIZE):
+        self._chunks = chunks
+        self._sink = sink
+        self._limit = limit
+        self._buffer = b''
+        self.size = 0
+
+    def read(self, size=-1):
+        while not self._buffer:
+            chunk = next(self._chunks, b'')
+            if not chunk:
+                return b''
+            self.size += len(chunk)
+            if self.size > self._limit:
+                raise ArchiveError(f"仓库归档超过大小上限 {self._limit // (1024 * 1024)} MB")
+            self._sink.write(chunk)
+            self._buffer = chunk
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def drain(self):
+        """读完剩余的数据（tar流末尾的填充块），保证缓存的归档完整"""
+        while self.read(ARCHIVE_CHUNK_SIZE):
+            pass
+
+
+def archive_stats(fileobj, workers=CODE_STATS_WORKERS):
+    """一次顺序读取 .tar.gz 归档流，统计文件数、各语言的代码/注释/空行、最大的文件、依赖清单和框架
+
+    使用tarfile的流模式逐个读取成员，不解压到磁盘，也不保留已读过的成员；读出的文件按批交给代码统计进程池，
+    在途的批次有上限，超大文件在当前进程中分块数行，内存占用与仓库大小无关。
+    """
+    large_files = StatsAccumulator()
+
+    def batches():
+        batch, batch_bytes = [], 0
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            for member in archive:
+                archive.members = []  # 流模式下tarfile会记住所有成员，清空以保持内存平稳
+                if not member.isfile():
+                    continue
+                # GitHub的tarball和git archive --prefix 都把文件放在一个顶层目录下
+                path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+                stream = archive.extractfile(member)
+                if member.size > CODE_STATS_MAX_FILE_BYTES:
+                    large_files.add_large_file(path, member.size, stream.read(ARCHIVE_CHUNK_SIZE),
+                                               iter(lambda: stream.read(ARCHIVE_CHUNK_SIZE), b''))
+                    continue
+                batch.append((path, stream.read()))
+                batch_bytes += member.size
+                if batch_bytes >= CODE_STATS_BATCH_BYTES or len(batch) >= BATCH_FILES:
+                    yield (batch,)
+                    batch, batch_bytes = [], 0
+        if batch:
+            yield (batch,)
+
+    try:
+        totals = run_batches(count_batch, batches(), workers)
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"读取仓库归档失败: {str(e)}") from e
+    except BrokenProcessPool as e:
+        raise ArchiveError("代码统计进程异常退出") from e
+    totals.merge(large_files)
+    return totals.result()
+
+
+class ArchiveCache:
+    """磁盘上的仓库归档缓存：按 (仓库, 提交SHA) 保存 .tar.gz 和统计结果，
+    总大小超过 max_bytes 时按最近使用时间淘汰；同一仓库有新提交时删除旧版本"""
+
+    def __init__(self, directory=REPO_ARCHIVE_DIR, max_bytes=REPO_ARCHIVE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._stats = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _prefix(self, owner, repo):
+        return re.sub(r'[^A-Za-z0-9._-]', '_', f'{owner}__{repo}'.lower())
+
+    def path(self, owner, repo, ref):
+        return os.path.join(self.directory, f"{self._prefix(owner, repo)}@{re.sub(r'[^A-Za-z0-9]', '', ref)[:40]}.tar.gz")
+
+    def load_stats(self, owner, repo, ref):
+        """读取已计算的统计结果，没有时返回None"""
+        path = self.path(owner, repo, ref)
+        try:
+            with open(path + '.json', encoding='utf-8') as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stats.get('stats_version') != STATS_VERSION:
+            return None
+        self._touch(path)
+        self._count('hits')
+        return stats
+
+    def save_stats(self, owner, repo, ref, stats):
+        path = self.path(owner, repo, ref) + '.json'
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def open(self, owner, repo, ref):
+        """打开已缓存的归档，没有时返回None"""
+        path = self.path(owner, repo, ref)
+        try:
+            fileobj = open(path, 'rb')
+        except OSError:
+            return None
+        self._touch(path)
+        self._count('archive_hits')
+        return fileobj
+
+    def store(self, owner, repo, ref, chunks, consume):
+        """把下载的数据块写入缓存，同时交给 consume(可读对象) 处理，返回consume的结果（只读取一遍数据）"""
+        path = self.path(owner, repo, ref)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        try:
+            with open(tmp, 'wb') as sink:
+                reader = TeeReader(chunks, sink)
+                result = consume(reader)
+                reader.drain()
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()  # 提前结束时关闭下载连接或git进程
+        self._count('downloads')
+        self._remove_old_refs(owner, repo, path)
+        self.evict()
+        return result
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _remove_old_refs(self, owner, repo, keep):
+        for path in glob.glob(os.path.join(self.directory, glob.escape(self._prefix(owner, repo)) + '@*.tar.gz')):
+            if path != keep:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        for name in (path, path + '.json'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.tar.gz')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # 其他进程刚刚淘汰
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """按最近使用时间淘汰归档，直到总大小不超过上限"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self._count('evictions')
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            stats = {name: self._stats[name] for name in ('hits', 'archive_hits', 'downloads', 'evictions')}
+        stats.update(entries=len(entries), bytes=sum(size for _, size, _ in entries))
+        return stats
+
+
+class GitHubArchiveSource:
+    """通过GitHub REST接口获取：HEAD提交SHA（可用ETag重新验证，未变化时不消耗配额）和该提交的tarball"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def head_sha(self, owner, repo):
+        sha, error = self.client.get_head_sha(owner, repo)
+        if error:
+            raise ArchiveError(error)
+        return sha
+
+    def chunks(self, owner, repo, ref):
+        response, error = self.client.open_tarball(owner, repo, ref)
+        if error:
+            raise ArchiveError(error)
+        try:
+            yield from response.iter_content(ARCHIVE_CHUNK_SIZE)
+        finally:
+            response.close()
+
+
+class GitArchiveSource:
+    """从git远程仓库获取：ls-remote 读取HEAD，--depth 1 浅克隆后用 git archive 输出 .tar.gz"""
+
+    def __init__(self, url_template):
+        self.url_template = url_template
+
+    def url(self, owner, repo):
+        return self.url_template.format(owner=owner, repo=repo)
+
+    def _git(self, *args):
+        try:
+            result = subprocess.run(['git', *args], capture_output=True, timeout=REPO_ARCHIVE_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise ArchiveError(f"执行git失败: {str(e)}") from e
+        if result.returncode != 0:
+            raise ArchiveError(f"git {args[0]} 失败: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout.decode('utf-8', 'replace')
+
+    def head_sha(self, owner, repo):
+        output = self._git('ls-remote', self.url(owner, repo), 'HEAD').split()
+        if not output:
+            raise ArchiveError(f"仓库没有提交: {owner}/{repo}")
+        return output[0]
+
+    def chunks(self, owner, repo, ref):
+        workdir = tempfile.mkdtemp(prefix='repo-clone-')
+        process = None
+        try:
+            self._git('clone', '--quiet', '--bare', '--depth', '1', self.url(owner, repo), workdir)
+            process = subprocess.Popen(['git', '-C', workdir, 'archive', '--format=tar.gz', f'--prefix={repo}/', 'HEAD'],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            yield from iter(lambda: process.stdout.read(ARCHIVE_CHUNK_SIZE), b'')
+            if process.wait(timeout=REPO_ARCHIVE_TIMEOUT) != 0:
+                raise ArchiveError(f"git archive 失败: {owner}/{repo}")
+        finally:
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def create_archive_source(client, source=REPO_ARCHIVE_SOURCE):
+    """按配置创建归档来源：为空时使用GitHub tarball，否则为git地址模板"""
+    return GitArchiveSource(source) if source else GitHubArchiveSource(client)
+
+
+class RepoArchiver:
+    """深度分析：获取仓库归档（每个提交只下载一次）并计算代码统计"""
+
+    def __init__(self, source, cache=None):
+        self.source = source
+        self.cache = cache or ArchiveCache()
+
+    def code_stats(self, owner, repo):
+        """返回仓库HEAD提交的代码统计；同一提交的统计结果和归档都从磁盘缓存读取"""
+        start = time.time()
+        ref = self.source.head_sha(owner, repo)
+        stats = self.cache.load_stats(owner, repo, ref)
+        if stats is not None:
+            return dict(stats, cache_status='hit')
+
+        cached = self.cache.open(owner, repo, ref)
+        if cached is not None:
+            with cached:
+                stats = archive_stats(cached)
+            cache_status = 'archive_hit'
+        else:
+            stats = self.cache.store(owner, repo, ref, self.source.chunks(owner, repo, ref), archive_stats)
+            cache_status = 'miss'
+        stats = dict(stats, ref=ref, stats_version=STATS_VERSION, computed_in=round(time.time() - start, 3))
+        self.cache.save_stats(owner, repo, ref, stats)
+        return dict(stats, cache_status=cache_status)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+def normalize_repo_key(owner, repo_name):
+    """统一仓库键: 小写 owner/repo，去掉 .git 后缀"""
+    repo_name = repo_name[:-4] if repo_name.endswith('.git') else repo_name
+    return f"{owner.strip().lower()}/{repo_name.strip().lower()}"
+
+
+class ReportCache:
+    """完整分析报告的TTL缓存，超出条目上限时按LRU淘汰"""
+
+    def __init__(self, ttl=300, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or time.time() - item[0] > self.ttl:
+                self._entries.pop(key, None)
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self._stats['hits'], 'misses': self._stats['misses'], 'entries': len(self._entries)}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """请求合并: 同一个key同时只执行一次，其余调用方等待并共享结果（或异常）"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def do(self, key, func):
+        """返回 (结果, 是否为共享结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+            else:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self._stats['executed'], 'coalesced': self._stats['coalesced'],
+                    'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """SingleFlight 的asyncio版本，供异步服务模式在同一事件循环内合并请求"""
+
+    def __init__(self):
+        self._calls = {}
+        self._stats = Counter()
+
+    async def do(self, key, func):
+        """func 为协程函数，返回 (结果, 是否为共享结果)"""
+        future = self._calls.get(key)
+        if future is not None:
+            self._stats['coalesced'] += 1
+            return await asyncio.shield(future), True
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        self._stats['executed'] += 1
+        try:
+            result = await func()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # 标记为已读取，避免没有等待者时asyncio告警
+            raise
+        finally:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        return {'executed': self._stats['executed'], 'coalesced': self._stats['coalesced'],
+                'in_flight': len(self._calls)}
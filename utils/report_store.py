@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from utils.report_cache import normalize_repo_key
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+# 报告存储配置
+REPORT_STORE_PATH = os.getenv('REPORT_STORE_PATH', os.path.join(tempfile.gettempdir(), 'report_store.sqlite3'))
+REPORT_STORE_TTL = int(os.getenv('REPORT_STORE_TTL', '86400'))  # 报告及导出文件的保留时间（秒）
+REPORT_STORE_BASELINE_TTL = int(os.getenv('REPORT_STORE_BASELINE_TTL', str(7 * 86400)))  # 每个仓库最新一份报告作为增量分析基线的保留时间（秒）
+REPORT_STORE_ARTIFACT_MAX_BYTES = int(os.getenv('REPORT_STORE_ARTIFACT_MAX_BYTES', str(8 * 1024 * 1024)))  # 超过该大小的导出文件不缓存
+REPORT_STORE_PURGE_INTERVAL = 60  # 两次清理过期数据之间的最短间隔（秒）
+
+
+class ReportStore:
+    """按 report_id 保存报告（zlib压缩的JSON），并按 (report_id, 格式) 缓存已渲染的导出文件，过期后自动清理
+
+    另外记录每个仓库最新的一份报告，作为增量分析的基线；基线报告保留 REPORT_STORE_BASELINE_TTL，
+    超过 ttl 后不能再按 report_id 读取，但仍可由 latest() 取得。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS reports (
+        id TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        stored_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS artifacts (
+        report_id TEXT NOT NULL,
+        format TEXT NOT NULL,
+        body BLOB NOT NULL,
+        stored_at REAL NOT NULL,
+        PRIMARY KEY (report_id, format)
+    );
+    CREATE TABLE IF NOT EXISTS latest_reports (
+        repo TEXT PRIMARY KEY,
+        report_id TEXT NOT NULL,
+        analyzed_at TEXT NOT NULL,
+        stored_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS reports_stored_at ON reports (stored_at);
+    """
+
+    def __init__(self, path=REPORT_STORE_PATH, ttl=REPORT_STORE_TTL, baseline_ttl=REPORT_STORE_BASELINE_TTL):
+        self.ttl = ttl
+        self.baseline_ttl = max(baseline_ttl, ttl)
+        self._db = SQLiteDatabase(path, self.SCHEMA)
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def put(self, report):
+        """保存报告；同一 report_id 重复保存时覆盖旧内容并丢弃旧的导出文件。
+        按 analyzed_at 更新仓库的最新报告，旧报告的补充分析晚于新报告写回时不会替换基线"""
+        body = zlib.compress(json.dumps(report, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        with self._db.transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?)', (report['report_id'], body, now))
+            conn.execute('DELETE FROM artifacts WHERE report_id = ?', (report['report_id'],))
+            full_name = (report.get('repo_info') or {}).get('full_name')
+            if full_name and report.get('analyzed_at'):
+                conn.execute(
+                    'INSERT INTO latest_reports VALUES (?, ?, ?, ?) ON CONFLICT (repo) DO UPDATE SET '
+                    'report_id = excluded.report_id, analyzed_at = excluded.analyzed_at, stored_at = excluded.stored_at '
+                    'WHERE excluded.report_id = latest_reports.report_id OR excluded.analyzed_at >= latest_reports.analyzed_at',
+                    (normalize_repo_key(*full_name.split('/', 1)), report['report_id'], report['analyzed_at'], now))
+        self._purge()
+
+    def get(self, report_id):
+        row = self._db.execute('SELECT body, stored_at FROM reports WHERE id = ?', (report_id,)).fetchone()
+        if row is None or time.time() - row['stored_at'] > self.ttl:
+            return None
+        return json.loads(zlib.decompress(row['body']).decode('utf-8'))
+
+    def latest(self, repo_key):
+        """返回仓库（normalize_repo_key 的结果）最新的一份报告，没有或超过基线保留时间时返回None"""
+        row = self._db.execute('SELECT r.body, r.stored_at FROM latest_reports l JOIN reports r ON r.id = l.report_id '
+                               'WHERE l.repo = ?', (repo_key,)).fetchone()
+        if row is None or time.time() - row['stored_at'] > self.baseline_ttl:
+            return None
+        return json.loads(zlib.decompress(row['body']).decode('utf-8'))
+
+    def get_artifact(self, report_id, format_type):
+        """返回已渲染的导出文件内容，没有时返回None"""
+        row = self._db.execute('SELECT body FROM artifacts WHERE report_id = ? AND format = ?',
+                               (report_id, format_type)).fetchone()
+        with self._lock:
+            self._stats['artifact_hits' if row else 'artifact_misses'] += 1
+        return None if row is None else bytes(row['body'])
+
+    def put_artifact(self, report_id, format_type, content):
+        self._db.execute('INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)',
+                         (report_id, format_type, content, time.time()))
+
+    def _purge(self):
+        """删除过期的报告及其导出文件（限制频率，避免每次写入都扫描）"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < REPORT_STORE_PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        cutoff = now - self.ttl
+        with self._db.transaction() as conn:
+            conn.execute('DELETE FROM artifacts WHERE report_id IN (SELECT id FROM reports WHERE stored_at < ?)',
+                         (cutoff,))
+            conn.execute('DELETE FROM artifacts WHERE stored_at < ?', (cutoff,))
+            conn.execute('DELETE FROM latest_reports WHERE stored_at < ?', (now - self.baseline_ttl,))
+            conn.execute('DELETE FROM reports WHERE stored_at < ? AND id NOT IN (SELECT report_id FROM latest_reports)',
+                         (cutoff,))
+
+    def stats(self):
+        reports, report_bytes = self._db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM reports').fetchone()
+        artifacts, artifact_bytes = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM artifacts').fetchone()
+        with self._lock:
+            return {'reports': reports, 'report_bytes': report_bytes, 'artifacts': artifacts,
+                    'artifact_bytes': artifact_bytes, 'artifact_hits': self._stats['artifact_hits'],
+                    'artifact_misses': self._stats['artifact_misses']}
@@ -0,0 +1,239 @@
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from dotenv import load_dotenv
+
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+# 缓存配置
+GITHUB_CACHE_BACKEND = os.getenv('GITHUB_CACHE_BACKEND', 'memory')  # memory / sqlite / none
+GITHUB_CACHE_PATH = os.getenv('GITHUB_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'github_response_cache.sqlite3'))
+GITHUB_CACHE_MAX_BYTES = int(os.getenv('GITHUB_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+GITHUB_CACHE_TTL = int(os.getenv('GITHUB_CACHE_TTL', '86400'))  # 条目最长保留时间（秒）
+GITHUB_CACHE_FRESH = int(os.getenv('GITHUB_CACHE_FRESH', '60'))  # 在此时间内直接命中，不再向GitHub验证
+
+
+class MemoryCacheBackend:
+    """单进程内存缓存，按字节数做LRU淘汰"""
+
+    def __init__(self, max_bytes=GITHUB_CACHE_MAX_BYTES, ttl=GITHUB_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['stored_at'] > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def set(self, key, entry):
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = dict(entry)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def touch(self, key, validated_at):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['validated_at'] = validated_at
+                entry['stored_at'] = validated_at
+                self._entries.move_to_end(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry['body'])
+
+    def size(self):
+        return {'entries': len(self._entries), 'bytes': self._size}
+
+
+class SQLiteCacheBackend:
+    """基于SQLite文件的缓存，多个gunicorn worker可共享命中"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        content_type TEXT,
+        size INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        validated_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+    """
+
+    def __init__(self, path=GITHUB_CACHE_PATH, max_bytes=GITHUB_CACHE_MAX_BYTES, ttl=GITHUB_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db = SQLiteDatabase(path, self.SCHEMA)
+
+    def get(self, key):
+        now = time.time()
+        row = self.db.execute('SELECT * FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if now - row['stored_at'] > self.ttl:
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            return None
+        self.db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        return dict(row)
+
+    def set(self, key, entry):
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+        with self.db.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, entry['body'], entry['etag'], entry['last_modified'], entry['content_type'],
+                 size, entry['stored_at'], entry['validated_at'], entry['stored_at']),
+            )
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn, excess):
+        """按最近访问时间从旧到新删除，直到腾出足够空间"""
+        victims = []
+        for row in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            victims.append((row['key'],))
+            excess -= row['size']
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM responses WHERE key = ?', victims)
+
+    def touch(self, key, validated_at):
+        self.db.execute(
+            'UPDATE responses SET validated_at = ?, stored_at = ?, accessed_at = ? WHERE key = ?',
+            (validated_at, validated_at, validated_at, key),
+        )
+
+    def size(self):
+        row = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'entries': row[0], 'bytes': row[1]}
+
+
+class ResponseCache:
+    """按API URL缓存GitHub响应，过期后通过 If-None-Match / If-Modified-Since 重新验证"""
+
+    def __init__(self, backend, fresh_for=GITHUB_CACHE_FRESH):
+        self.backend = backend
+        self.fresh_for = fresh_for
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, url, fetch, headers=None):
+        """读取缓存；需要访问GitHub时调用 fetch(url, headers) 发出真实请求"""
+        entry, cached, request_headers = self._lookup(url, headers)
+        if cached is not None:
+            return cached
+        return self._store(url, entry, fetch(url, request_headers))
+
+    async def aget(self, url, fetch, headers=None):
+        """get 的异步版本，fetch 为返回响应的协程函数"""
+        entry, cached, request_headers = self._lookup(url, headers)
+        if cached is not None:
+            return cached
+        return self._store(url, entry, await fetch(url, request_headers))
+
+    def _lookup(self, url, headers):
+        """返回 (缓存条目, 可直接使用的缓存响应, 需要发出的请求头)"""
+        entry = self.backend.get(url)
+        now = time.time()
+        if entry and now - entry['validated_at'] < self.fresh_for:
+            self._count('hits')
+            return entry, self._build_response(url, entry), None
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        return entry, None, request_headers
+
+    def _store(self, url, entry, response):
+        """处理GitHub的响应：304时返回缓存内容，200时写入缓存"""
+        if response.status_code == 304 and entry:
+            # 304不消耗GitHub主限额，直接使用缓存内容
+            self._count('not_modified')
+            self.backend.touch(url, time.time())
+            cached = self._build_response(url, entry)
+            for key, value in response.headers.items():
+                if key.lower().startswith('x-ratelimit-'):
+                    cached.headers[key] = value
+            return cached
+
+        self._count('misses')
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code == 200 and (etag or last_modified):
+            stored_at = time.time()
+            self.backend.set(url, {
+                'body': response.content,
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_type': response.headers.get('Content-Type'),
+                'stored_at': stored_at,
+                'validated_at': stored_at,
+            })
+        return response
+
+    @staticmethod
+    def _build_response(url, entry):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = entry['body']
+        response.headers = CaseInsensitiveDict({'X-Cache': 'HIT'})
+        if entry['content_type']:
+            response.headers['Content-Type'] = entry['content_type']
+        if entry['etag']:
+            response.headers['ETag'] = entry['etag']
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = {name: self._stats[name] for name in ('hits', 'misses', 'not_modified')}
+        stats['backend'] = type(self.backend).__name__
+        stats.update(self.backend.size())
+        return stats
+
+
+def create_response_cache(backend=GITHUB_CACHE_BACKEND):
+    """根据配置创建响应缓存，backend为none时返回None"""
+    if backend == 'memory':
+        return ResponseCache(MemoryCacheBackend())
+    if backend == 'sqlite':
+        return ResponseCache(SQLiteCacheBackend())
+    return None
@@ -0,0 +1,240 @@
+import atexit
+import collections
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 日志配置
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json: 每行一个JSON对象；text: 便于本地阅读
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0'))  # 输出DEBUG日志的请求比例；请求头 X-Trace: 1 时总是输出
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 队列满时丢弃新日志，不阻塞请求
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '0.1'))  # 写线程两次写出之间的间隔（秒）
+LOG_BATCH_SIZE = 256  # 写线程每次最多合并写出的条数
+
+_context = contextvars.ContextVar('log_context', default=None)
+_debug = contextvars.ContextVar('log_debug', default=False)
+
+# LogRecord自带的属性，其余属性（extra=...）作为结构化字段输出
+_RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime', 'context', 'taskName'}
+
+
+def start_request(request_id=None, debug=False, **fields):
+    """开始一个请求（或后台任务）的日志上下文，之后的日志都带上 request_id 和这些字段
+
+    按 LOG_DEBUG_SAMPLE_RATE 抽样决定本次是否输出DEBUG日志，debug为真时总是输出。
+    """
+    request_id = request_id or f'{random.getrandbits(32):08x}'
+    _context.set(dict(fields, request_id=request_id))
+    _debug.set(debug or random.random() < LOG_DEBUG_SAMPLE_RATE)
+    return request_id
+
+
+def bind(**fields):
+    """为当前上下文的后续日志追加字段，如得到报告后追加 report_id（线程池中复制的上下文共用同一组字段）"""
+    context = _context.get()
+    if context is None:
+        _context.set(dict(fields))
+    else:
+        context.update(fields)
+
+
+def log_debug(logger, msg, **fields):
+    """按请求抽样的DEBUG日志：LOG_LEVEL 高于DEBUG且本次请求未被抽中时直接返回，不创建日志记录"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, extra=fields)
+    elif _debug.get():
+        logger.handle(logger.makeRecord(logger.name, logging.DEBUG, '(sampled)', 0, msg, (), None, extra=fields))
+
+
+def current_request_id():
+    context = _context.get()
+    return context.get('request_id') if context else None
+
+
+def _extra_fields(record):
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行JSON：时间、级别、日志器、消息、请求上下文和 extra 字段"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """本地开发用的单行文本格式"""
+
+    def format(self, record):
+        fields = dict(getattr(record, 'context', None) or {}, **_extra_fields(record))
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.getMessage()}"
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+class SampledDebugFilter(logging.Filter):
+    """低于 LOG_LEVEL 的日志（由 log_debug 生成）只在被抽中的请求中输出"""
+
+    def __init__(self, level):
+        super().__init__()
+        self.level = level
+
+    def filter(self, record):
+        return record.levelno >= self.level or _debug.get()
+
+
+class AsyncLogHandler(logging.Handler):
+    """把日志放进内存队列后立即返回，由后台线程定期批量格式化并写出
+
+    请求线程只做很少的工作（合并消息参数、记下请求上下文、追加到deque），不加锁、不唤醒写线程，
+    也不会因为写stdout而阻塞或互相争用；队列超过上限时丢弃新日志并计数。
+    gunicorn预加载后fork出的worker在第一次写日志时重新启动写线程。
+    """
+
+    def __init__(self, stream=None, maxsize=LOG_QUEUE_SIZE, interval=LOG_FLUSH_INTERVAL):
+        super().__init__()
+        self.stream = stream  # None表示写到当前的 sys.stdout
+        self.maxsize = maxsize
+        self.interval = interval
+        self.dropped = 0
+        self._records = collections.deque()
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._pid = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._records = collections.deque()
+                self._wakeup = threading.Event()
+                self._thread = threading.Thread(target=self._write_loop, name='log-writer', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def handle(self, record):
+        # 队列本身是线程安全的，不需要 Handler 默认的全局锁
+        if self.filter(record):
+            self.emit(record)
+            return True
+        return False
+
+    def emit(self, record):
+        try:
+            self._ensure_writer()
+            if len(self._records) >= self.maxsize:
+                self.dropped += 1
+                return
+            context = _context.get()
+            record.context = dict(context) if context else None
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+                record.exc_info = None
+            self._records.append(record)
+            if len(self._records) == LOG_BATCH_SIZE:
+                self._wakeup.set()  # 积压较多时提前写出
+        except Exception:
+            self.handleError(record)
+
+    def _drain(self):
+        records = self._records
+        while records:
+            lines = []
+            while records and len(lines) < LOG_BATCH_SIZE:
+                record = records.popleft()
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            if lines:
+                try:
+                    stream = self.stream or sys.stdout
+                    stream.write('\n'.join(lines) + '\n')
+                    stream.flush()
+                except Exception:
+                    pass
+
+    def _write_loop(self):
+        while not self._closing:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self):
+        """等待队列中的日志全部写出"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            while self._records:
+                self._wakeup.set()
+                time.sleep(0.01)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._closing = True
+            self._wakeup.set()
+            self._thread.join(timeout=5)
+        super().close()
+
+    def stats(self):
+        return {'queued': len(self._records), 'dropped': self.dropped}
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    """配置根日志器（重复调用无效果）：所有日志经过异步队列按 LOG_FORMAT 输出"""
+    global _handler
+    with _handler_lock:
+        if _handler is not None:
+            return _handler
+        threshold = logging.getLevelName(level)
+        if not isinstance(threshold, int):
+            raise ValueError(f"未知的日志级别: {level}")
+        handler = AsyncLogHandler(stream)
+        handler.setFormatter(TextFormatter() if fmt == 'text' else JsonFormatter())
+        handler.addFilter(SampledDebugFilter(threshold))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(threshold)
+        if threshold > logging.DEBUG:
+            logging.getLogger('httpx').setLevel(logging.WARNING)  # httpx每个请求都会输出一条INFO
+        atexit.register(handler.close)
+        _handler = handler
+    return handler
+
+
+def log_stats():
+    """供监控使用：队列中等待写出的条数和因队列满丢弃的条数"""
+    return _handler.stats() if _handler is not None else {'enabled': False}
@@ -0,0 +1,92 @@
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 分级分析配置
+ANALYSIS_LATENCY_BUDGET = float(os.getenv('ANALYSIS_LATENCY_BUDGET', '1.0'))  # /analyze 默认的响应时间预算（秒）
+LLM_EXPECTED_LATENCY = float(os.getenv('LLM_EXPECTED_LATENCY', '8'))  # 还没有调用记录时假定的LLM耗时（秒）
+ENRICH_MAX_WORKERS = int(os.getenv('ENRICH_MAX_WORKERS', '8'))  # 后台补充分析的线程数（LLM并发另由网关限制）
+
+
+def expected_llm_latency(gateway, default=LLM_EXPECTED_LATENCY):
+    """按网关记录的平均调用耗时估计下一次LLM分析需要的时间"""
+    snapshot = gateway.latency.snapshot() if gateway is not None else {'count': 0}
+    return snapshot['sum'] / snapshot['count'] if snapshot['count'] else default
+
+
+def plan_tiers(remaining, llm_available, expected):
+    """决定LLM分析怎么运行：
+
+    - None: 只有模板分析（未配置LLM或调用方关闭了补充分析）
+    - 'inline': 预计能在剩余预算内完成，等待结果并合并进本次响应
+    - 'background': 预算不够，先返回模板分析，LLM分析在后台完成后写回报告
+    """
+    if not llm_available:
+        return None
+    return 'inline' if 0 < expected <= remaining else 'background'
+
+
+class Enricher:
+    """后台补充分析：同一份报告同时只运行一次，调用方可以在预算内等待返回的Future
+
+    enrich(report) 返回补充后的报告；失败时可以抛出异常，或返回 enrichment.status 为 failed 的报告
+    """
+
+    def __init__(self, enrich, max_workers=ENRICH_MAX_WORKERS):
+        self._enrich = enrich
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-enrich')
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def submit(self, key, report):
+        """提交补充分析并返回Future；同一个key正在进行时直接返回已有的Future"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return future
+            # 持有锁时提交：任务结束时的清理要等登记完成后才能执行
+            future = self._pending[key] = self._executor.submit(self._run, key, report)
+            self._stats['submitted'] += 1
+            return future
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def _run(self, key, report):
+        outcome = 'failed'
+        try:
+            result = self._enrich(report)
+            if (result.get('enrichment') or {}).get('status') != 'failed':
+                outcome = 'completed'
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._stats[outcome] += 1
+
+    def record(self, plan):
+        """记录本次请求的分级结果：inline（合并进响应）/ deferred（转入后台）/ heuristic_only（只有模板分析）"""
+        with self._lock:
+            self._stats[plan] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'submitted': self._stats['submitted'],
+                'coalesced': self._stats['coalesced'],
+                'completed': self._stats['completed'],
+                'failed': self._stats['failed'],
+                'inline': self._stats['inline'],
+                'deferred': self._stats['deferred'],
+                'heuristic_only': self._stats['heuristic_only'],
+            }
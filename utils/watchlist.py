@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from utils.rate_limiter import RateLimitExceeded
+from utils.sqlite_db import SQLiteDatabase
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 关注列表配置
+WATCHLIST_PATH = os.getenv('WATCHLIST_PATH', os.path.join(tempfile.gettempdir(), 'watchlist.sqlite3'))
+WATCHLIST_INTERVAL = int(os.getenv('WATCHLIST_INTERVAL', '86400'))  # 默认的刷新间隔（秒）
+WATCHLIST_MIN_INTERVAL = int(os.getenv('WATCHLIST_MIN_INTERVAL', '300'))  # 允许设置的最短刷新间隔（秒）
+WATCHLIST_WORKERS = int(os.getenv('WATCHLIST_WORKERS', '4'))  # 每个进程同时刷新的仓库数
+WATCHLIST_SCHEDULER = os.getenv('WATCHLIST_SCHEDULER', 'true').lower() in ('1', 'true', 'yes')  # 本进程是否运行刷新调度
+WATCHLIST_QUOTA_RESERVE = float(os.getenv('WATCHLIST_QUOTA_RESERVE', '0.1'))  # 剩余配额低于上限的该比例时暂停刷新，留给交互请求
+WATCHLIST_RETRY_AFTER = int(os.getenv('WATCHLIST_RETRY_AFTER', '300'))  # 刷新失败后首次重试的间隔（秒），之后逐次翻倍
+WATCHLIST_LEASE = 600  # 领取的刷新超过该时间仍未完成视为进程已退出，可被重新领取（秒）
+WATCHLIST_STALE_FACTOR = 2  # 报告超过 刷新间隔×该倍数 仍未刷新时不再直接返回（调度停止运行时退回正常分析）
+WATCHLIST_MAX_IDLE = 30.0  # 空闲时检查其他进程新增条目的最长间隔（秒）
+WATCHLIST_QUOTA_BACKOFF = 30.0  # 配额不足时暂停刷新的时间（秒）
+
+
+def next_slot(repo_key, interval, now):
+    """仓库的下一个刷新时间点：按仓库键的哈希把相位均匀分布在整个间隔内，
+    同样间隔的仓库错开刷新，不会集中在整点；相位固定，进程重启后时间点不变"""
+    phase = zlib.crc32(repo_key.encode('utf-8')) / 2 ** 32 * interval
+    return phase + (int((now - phase) // interval) + 1) * interval
+
+
+def _encode(report):
+    return zlib.compress(json.dumps(report, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+class Watchlist:
+    """关注列表：持久保存需要定期刷新的仓库及其刷新间隔，按各自的时间点在后台刷新，并保存最新报告供直接读取
+
+    多个进程共用同一个SQLite文件时，到期的仓库由任意一个进程的空闲线程领取，不会重复刷新。
+    refresh(entry) 返回新报告；quota() 返回False时暂停领取新的刷新。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS watchlist (
+        repo TEXT PRIMARY KEY,
+        repo_url TEXT NOT NULL,
+        interval INTEGER NOT NULL,
+        depth TEXT NOT NULL,
+        next_run_at REAL NOT NULL,
+        leased_until REAL NOT NULL DEFAULT 0,
+        failures INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        report_id TEXT,
+        report BLOB,
+        refreshed_at REAL,
+        added_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS watchlist_next_run ON watchlist (next_run_at);
+    """
+
+    def __init__(self, refresh, path=WATCHLIST_PATH, workers=WATCHLIST_WORKERS, quota=None):
+        self.refresh = refresh
+        self.workers = workers
+        self.quota = quota
+        self._db = SQLiteDatabase(path, self.SCHEMA)
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._started_pid = None
+        self._running = 0
+        self._stats = Counter()
+
+    def start(self):
+        """启动刷新线程；按进程启动，兼容gunicorn fork出的worker"""
+        with self._wakeup:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._threads = [threading.Thread(target=self._work, name=f'watchlist-{i}', daemon=True)
+                             for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def add(self, repo_key, repo_url, interval=WATCHLIST_INTERVAL, depth='metadata'):
+        """加入关注列表或修改已有条目的间隔和深度，返回条目；还没有报告的仓库立即排队刷新"""
+        now = time.time()
+        with self._db.transaction() as conn:
+            row = conn.execute('SELECT report FROM watchlist WHERE repo = ?', (repo_key,)).fetchone()
+            next_run_at = next_slot(repo_key, interval, now) if row is not None and row['report'] else now
+            conn.execute(
+                'INSERT INTO watchlist (repo, repo_url, interval, depth, next_run_at, added_at) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (repo) DO UPDATE SET repo_url = excluded.repo_url, interval = excluded.interval, '
+                'depth = excluded.depth, next_run_at = excluded.next_run_at',
+                (repo_key, repo_url, interval, depth, next_run_at, now))
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return self.get(repo_key)
+
+    def remove(self, repo_key):
+        return self._db.execute('DELETE FROM watchlist WHERE repo = ?', (repo_key,)).rowcount > 0
+
+    def get(self, repo_key):
+        """返回条目的状态（不含报告），不在列表中时返回None"""
+        row = self._db.execute('SELECT * FROM watchlist WHERE repo = ?', (repo_key,)).fetchone()
+        return None if row is None else self._entry(row)
+
+    def entries(self, limit=100, offset=0):
+        rows = self._db.execute('SELECT * FROM watchlist ORDER BY repo LIMIT ? OFFSET ?', (limit, offset))
+        return [self._entry(row) for row in rows]
+
+    def _entry(self, row):
+        return {'repo': row['repo'], 'repo_url': row['repo_url'], 'interval': row['interval'], 'depth': row['depth'],
+                'next_refresh_at': row['next_run_at'], 'refreshed_at': row['refreshed_at'],
+                'report_id': row['report_id'], 'failures': row['failures'], 'last_error': row['last_error']}
+
+    def report(self, repo_key):
+        """返回关注仓库预先生成的最新报告（附带刷新时间），没有报告或已经太久没有刷新时返回None"""
+        row = self._db.execute('SELECT interval, report, refreshed_at, next_run_at FROM watchlist WHERE repo = ?',
+                               (repo_key,)).fetchone()
+        if row is None or not row['report'] or time.time() - row['refreshed_at'] > row['interval'] * WATCHLIST_STALE_FACTOR:
+            return None
+        with self._wakeup:
+            self._stats['served'] += 1
+        report = json.loads(zlib.decompress(row['report']).decode('utf-8'))
+        return dict(report, watchlist={'refreshed_at': row['refreshed_at'], 'next_refresh_at': row['next_run_at']})
+
+    def store(self, repo_key, report):
+        """更新关注仓库保存的报告（补充分析、代码统计写回时调用），不改变刷新时间；不在列表中时什么也不做"""
+        self._db.execute('UPDATE watchlist SET report = ?, report_id = ?, refreshed_at = ? WHERE repo = ?',
+                         (_encode(report), report['report_id'], time.time(), repo_key))
+
+    def _claim(self):
+        """领取最早到期的一个仓库，返回 (条目, 0)；没有到期的仓库时返回 (None, 距下一个到期的秒数)"""
+        now = time.time()
+        with self._db.transaction() as conn:
+            row = conn.execute('SELECT repo, repo_url, interval, depth, failures FROM watchlist '
+                               'WHERE next_run_at <= ? AND leased_until < ? ORDER BY next_run_at LIMIT 1',
+                               (now, now)).fetchone()
+            if row is None:
+                upcoming = conn.execute('SELECT MIN(next_run_at) FROM watchlist WHERE leased_until < ?',
+                                        (now,)).fetchone()[0]
+                return None, WATCHLIST_MAX_IDLE if upcoming is None else upcoming - now
+            conn.execute('UPDATE watchlist SET leased_until = ? WHERE repo = ?', (now + WATCHLIST_LEASE, row['repo']))
+        return dict(row), 0
+
+    def _finish(self, entry, report=None, error=None, retry_after=None):
+        now = time.time()
+        if report is not None:
+            self._db.execute('UPDATE watchlist SET report = ?, report_id = ?, refreshed_at = ?, next_run_at = ?, '
+                             'leased_until = 0, failures = 0, last_error = NULL WHERE repo = ?',
+                             (_encode(report), report['report_id'], now,
+                              next_slot(entry['repo'], entry['interval'], now), entry['repo']))
+            return
+        # 失败后按指数退避重试，但不晚于下一个正常的刷新时间点
+        if retry_after is None:
+            retry_after = WATCHLIST_RETRY_AFTER * 2 ** min(entry['failures'], 10)
+        next_run_at = min(now + retry_after, next_slot(entry['repo'], entry['interval'], now))
+        self._db.execute('UPDATE watchlist SET next_run_at = ?, leased_until = 0, failures = failures + 1, '
+                         'last_error = ? WHERE repo = ?', (next_run_at, error, entry['repo']))
+
+    def _run(self, entry):
+        with self._wakeup:
+            self._running += 1
+        try:
+            report = self.refresh(entry)
+        except RateLimitExceeded as e:
+            logger.warning("关注仓库刷新受配额限制，稍后重试", extra={'repo': entry['repo'], 'retry_after': e.retry_after})
+            self._finish(entry, error=str(e), retry_after=e.retry_after)
+            self._record('failed')
+        except Exception as e:
+            logger.warning("关注仓库刷新失败", extra={'repo': entry['repo'], 'error': str(e)})
+            self._finish(entry, error=str(e))
+            self._record('failed')
+        else:
+            self._finish(entry, report=report)
+            self._record('refreshed')
+        finally:
+            with self._wakeup:
+                self._running -= 1
+
+    def _record(self, name):
+        with self._wakeup:
+            self._stats[name] += 1
+
+    def _sleep(self, seconds):
+        with self._wakeup:
+            self._wakeup.wait(max(0.01, min(seconds, WATCHLIST_MAX_IDLE)))
+
+    def _work(self):
+        while True:
+            if self.quota is not None and not self.quota():
+                self._record('quota_pauses')
+                self._sleep(WATCHLIST_QUOTA_BACKOFF)
+                continue
+            try:
+                entry, wait = self._claim()
+            except sqlite3.Error as e:
+                logger.warning("读取关注列表失败", extra={'error': str(e)})
+                entry, wait = None, WATCHLIST_MAX_IDLE
+            if entry is None:
+                self._sleep(wait)
+                continue
+            self._run(entry)
+
+    def stats(self):
+        now = time.time()
+        entries, due, oldest = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(next_run_at <= ?), 0), MIN(next_run_at) FROM watchlist', (now,)).fetchone()
+        with self._wakeup:
+            return {'workers': self.workers if self._started_pid == os.getpid() else 0, 'entries': entries, 'due': due,
+                    'running': self._running, 'lag': round(max(0.0, now - oldest), 1) if oldest else 0.0,
+                    'refreshed': self._stats['refreshed'], 'failed': self._stats['failed'],
+                    'quota_pauses': self._stats['quota_pauses'], 'served': self._stats['served']}